@@ -2,17 +2,35 @@
 Ellora Freelance Escrow Smart Contract
 
 This contract manages the escrow system for freelance jobs:
-- Clients deposit ALGO/USDC for a job
+- Clients deposit ALGO/USDC for a job (the app opts in to one ASA once)
 - Funds are held until work is completed
 - Automatic release to freelancer on approval
+- Optional milestones, approved and released one at a time
 - Dispute resolution system with juror voting
+- Optional atomic settlement with the reputation SBT mint
+- Code updates and job migration to a new app, by the creator (platform)
 """
 
 from pyteal import (
-    Bytes, Int, Seq, Assert, App, Txn, Global, Gtxn, TxnType, Btoi, Or, If,
-    InnerTxnBuilder, TxnField, Cond, Subroutine, TealType, compileTeal, Mode
+    Bytes, Int, Seq, Assert, App, Txn, Global, Gtxn, TxnType, Btoi, Or, If, Not,
+    Concat, Extract, InnerTxnBuilder, TxnField, Cond, Subroutine, TealType,
+    OnComplete, Len, For, ScratchVar, ExtractUint64, GetByte, SetByte, Expr, AppParam,
+    BytesZero, compileTeal, Mode
 )
 
+MAX_JURORS = 5
+
+# Milestones are packed into one global byte slice as 9-byte records:
+# uint64 amount (big-endian) followed by a one byte milestone status.
+# 12 records keep "milestones" within the 128 byte key + value limit.
+MILESTONE_SIZE = 9
+MAX_MILESTONES = 12
+
+# import_job arguments: the uint globals as packed uint64s, then the parties
+# and the voter slots as 32-byte addresses (zero bytes for an empty slot)
+IMPORT_UINT_KEYS = ("amount", "status", "created", "deadline", "votes_for", "votes_against",
+                    "jurors", "released", "sbt_app")
+
 def escrow_contract():
     """
     Main escrow contract for Ellora freelance marketplace
@@ -27,6 +45,11 @@ def escrow_contract():
     - dispute_votes_for: Number of juror votes for freelancer
     - dispute_votes_against: Number of juror votes for client
     - total_jurors: Total number of jurors assigned
+    - voter0..voter4: Jurors that have voted on the current dispute
+    - milestones: Packed milestone records (empty for single-payout jobs)
+    - released: Amount already paid out through approved milestones
+    - asset: ASA the job is paid in (0 for ALGO), set once by opt_in_asset
+    - sbt_app: Reputation SBT app minted to on settlement (0 if not linked)
     """
     
     # Application state keys
@@ -39,6 +62,11 @@ def escrow_contract():
     votes_for_key = Bytes("votes_for")
     votes_against_key = Bytes("votes_against")
     jurors_key = Bytes("jurors")
+    voter_key_prefix = Bytes("voter")
+    milestones_key = Bytes("milestones")
+    released_key = Bytes("released")
+    asset_key = Bytes("asset")
+    sbt_app_key = Bytes("sbt_app")
     
     # Job statuses
     STATUS_CREATED = Int(0)
@@ -47,6 +75,11 @@ def escrow_contract():
     STATUS_DISPUTED = Int(3)
     STATUS_RESOLVED = Int(4)
     
+    # Milestone statuses
+    MILESTONE_PENDING = Int(0)
+    MILESTONE_SUBMITTED = Int(1)
+    MILESTONE_RELEASED = Int(2)
+    
     # Methods
     method_create_job = Bytes("create_job")
     method_accept_job = Bytes("accept_job")
@@ -55,6 +88,12 @@ def escrow_contract():
     method_raise_dispute = Bytes("raise_dispute")
     method_vote_dispute = Bytes("vote_dispute")
     method_withdraw_funds = Bytes("withdraw_funds")
+    method_submit_milestone = Bytes("submit_milestone")
+    method_approve_milestone = Bytes("approve_milestone")
+    method_opt_in_asset = Bytes("opt_in_asset")
+    method_link_sbt = Bytes("link_sbt")
+    method_import_job = Bytes("import_job")
+    method_export_job = Bytes("export_job")
     
     @Subroutine(TealType.uint64)
     def is_client():
@@ -68,22 +107,270 @@ def escrow_contract():
     def is_participant():
         return Or(is_client(), is_freelancer())
     
-    # Create Job - Called by client with payment
+    def voter_key(index):
+        """Global key voter0..voter4 for the index-th juror vote"""
+        return Concat(voter_key_prefix, Extract(Bytes("0123456789"), index, Int(1)))
+    
+    @Subroutine(TealType.uint64)
+    def has_voted():
+        return Or(*[
+            App.globalGet(voter_key(Int(i))) == Txn.sender() for i in range(MAX_JURORS)
+        ])
+    
+    @Subroutine(TealType.uint64)
+    def milestone_total(packed: Expr):
+        """Validate packed milestone records and return the sum of their amounts"""
+        offset = ScratchVar(TealType.uint64)
+        total = ScratchVar(TealType.uint64)
+        return Seq([
+            Assert(Len(packed) > Int(0)),
+            Assert(Len(packed) % Int(MILESTONE_SIZE) == Int(0)),
+            Assert(Len(packed) <= Int(MILESTONE_SIZE * MAX_MILESTONES)),
+            total.store(Int(0)),
+            For(
+                offset.store(Int(0)),
+                offset.load() < Len(packed),
+                offset.store(offset.load() + Int(MILESTONE_SIZE))
+            ).Do(Seq([
+                Assert(ExtractUint64(packed, offset.load()) > Int(0)),
+                Assert(GetByte(packed, offset.load() + Int(8)) == MILESTONE_PENDING),
+                total.store(total.load() + ExtractUint64(packed, offset.load())),
+            ])),
+            total.load()
+        ])
+    
+    def remaining_amount():
+        """Escrowed amount not yet released through milestones"""
+        return App.globalGet(amount_key) - App.globalGet(released_key)
+    
+    @Subroutine(TealType.none)
+    def pay(receiver: Expr, amount: Expr):
+        """Inner payment of `amount` from the escrow to `receiver` in the job's currency"""
+        return Seq([
+            InnerTxnBuilder.Begin(),
+            If(App.globalGet(asset_key) == Int(0))
+            .Then(InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.Payment,
+                TxnField.receiver: receiver,
+                TxnField.amount: amount,
+            }))
+            .Else(InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.AssetTransfer,
+                TxnField.xfer_asset: App.globalGet(asset_key),
+                TxnField.asset_receiver: receiver,
+                TxnField.asset_amount: amount,
+            })),
+            InnerTxnBuilder.Submit(),
+        ])
+    
+    @Subroutine(TealType.none)
+    def opt_in_to_asset(asset: Expr):
+        """Record the job's ASA and opt the app in; the caller pools the inner fee"""
+        return Seq([
+            App.globalPut(asset_key, asset),
+            InnerTxnBuilder.Begin(),
+            InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.AssetTransfer,
+                TxnField.xfer_asset: asset,
+                TxnField.asset_receiver: Global.current_application_address(),
+                TxnField.asset_amount: Int(0),
+                TxnField.fee: Int(0),
+            }),
+            InnerTxnBuilder.Submit(),
+        ])
+    
+    @Subroutine(TealType.none)
+    def assert_sbt_mint_follows():
+        """When an SBT app is linked, the settling call must be followed by its mint_sbt"""
+        mint = Gtxn[Txn.group_index() + Int(1)]
+        return If(App.globalGet(sbt_app_key) != Int(0)).Then(Seq([
+            Assert(Txn.group_index() + Int(1) < Global.group_size()),
+            Assert(mint.type_enum() == TxnType.ApplicationCall),
+            Assert(mint.application_id() == App.globalGet(sbt_app_key)),
+            Assert(mint.on_completion() == OnComplete.NoOp),
+            Assert(mint.application_args[0] == Bytes("mint_sbt")),
+        ]))
+    
+    # Milestone index argument and the offset of its record
+    milestone_index = Btoi(Txn.application_args[1])
+    milestone_offset = milestone_index * Int(MILESTONE_SIZE)
+    milestone_status = GetByte(App.globalGet(milestones_key), milestone_offset + Int(8))
+    milestone_amount = ExtractUint64(App.globalGet(milestones_key), milestone_offset)
+    
+    def set_milestone_status(status):
+        return App.globalPut(
+            milestones_key,
+            SetByte(App.globalGet(milestones_key), milestone_offset + Int(8), status)
+        )
+    
+    # App creation - initialise byte state so later equality checks are well typed
+    on_create = Seq([
+        App.globalPut(client_key, Bytes("")),
+        App.globalPut(freelancer_key, Bytes("")),
+        App.globalPut(status_key, STATUS_CREATED),
+        App.globalPut(milestones_key, Bytes("")),
+        App.globalPut(released_key, Int(0)),
+        App.globalPut(asset_key, Int(0)),
+        App.globalPut(sbt_app_key, Int(0)),
+        Int(1)
+    ])
+    
+    # Opt In Asset - Called once by the creator before a job is funded so
+    # the job is escrowed in that ASA (e.g. USDC) instead of ALGO. The inner
+    # opt-in fee must be covered by the caller through fee pooling.
+    opt_in_asset = Seq([
+        Assert(Txn.sender() == Global.creator_address()),
+        Assert(App.globalGet(client_key) == Bytes("")),
+        Assert(App.globalGet(asset_key) == Int(0)),
+        Assert(Txn.assets[0] != Int(0)),
+        
+        opt_in_to_asset(Txn.assets[0]),
+        
+        Int(1)
+    ])
+    
+    # Link SBT - Called once by the creator before a job is funded. Every
+    # payout that settles the job must then be grouped with the reputation
+    # app's mint_sbt (Txn.applications[1]), so payments and SBTs never drift.
+    link_sbt = Seq([
+        Assert(Txn.sender() == Global.creator_address()),
+        Assert(App.globalGet(client_key) == Bytes("")),
+        Assert(App.globalGet(sbt_app_key) == Int(0)),
+        Assert(Txn.applications[1] != Int(0)),
+        
+        App.globalPut(sbt_app_key, Txn.applications[1]),
+        
+        Int(1)
+    ])
+    
+    # Import Job - Called by the creator on a fresh app to replay a job from
+    # a previous deployment: application_args[1] packs IMPORT_UINT_KEYS,
+    # [2] is client + freelancer, [3] the milestones and [4] the five voter
+    # slots. With Txn.assets[0] the app opts in to the job's ASA. The funds
+    # arrive from the old app's export_job later in the same group.
+    freelancer_arg = Extract(Txn.application_args[2], Int(32), Int(32))
+    import_job = Seq([
+        Assert(Txn.sender() == Global.creator_address()),
+        Assert(App.globalGet(client_key) == Bytes("")),
+        Assert(Len(Txn.application_args[1]) == Int(8 * len(IMPORT_UINT_KEYS))),
+        Assert(Len(Txn.application_args[2]) == Int(64)),
+        Assert(Len(Txn.application_args[4]) == Int(32 * MAX_JURORS)),
+        
+        *[App.globalPut(Bytes(key), ExtractUint64(Txn.application_args[1], Int(8 * i)))
+          for i, key in enumerate(IMPORT_UINT_KEYS)],
+        App.globalPut(client_key, Extract(Txn.application_args[2], Int(0), Int(32))),
+        App.globalPut(freelancer_key, If(freelancer_arg == BytesZero(Int(32)), Bytes(""), freelancer_arg)),
+        App.globalPut(milestones_key, Txn.application_args[3]),
+        *[App.globalPut(voter_key(Int(i)), Extract(Txn.application_args[4], Int(32 * i), Int(32)))
+          for i in range(MAX_JURORS)],
+        
+        If(Txn.assets.length() > Int(0)).Then(opt_in_to_asset(Txn.assets[0])),
+        
+        Int(1)
+    ])
+    
+    # Export Job - Called by the creator after the job was imported into a
+    # new app (Txn.applications[1], never this one) by the same creator:
+    # moves the unreleased funds there and closes the job here. The new app
+    # must hold exactly the live job, so an import from a stale snapshot
+    # cannot take the funds. Only the linked SBT app may differ, so a
+    # migration can move jobs to a new reputation app: a linked job stays
+    # linked, to an app of the same creator (in the foreign apps).
+    new_app = Txn.applications[1]
+    new_creator = AppParam.creator(new_app)
+    new_address = AppParam.address(new_app)
+    
+    @Subroutine(TealType.none)
+    def assert_imported(key: Expr):
+        """The new app's global `key` equals ours"""
+        theirs = App.globalGetEx(Txn.applications[1], key)
+        return Seq([theirs, Assert(theirs.value() == App.globalGet(key))])
+    
+    @Subroutine(TealType.none)
+    def assert_imported_voter(index: Expr):
+        """Voter slots import as 32 bytes, zero for an empty or unset slot"""
+        ours = App.globalGetEx(Int(0), voter_key(index))
+        theirs = App.globalGetEx(Txn.applications[1], voter_key(index))
+        return Seq([
+            ours,
+            theirs,
+            Assert(theirs.value() == If(ours.hasValue())
+                   .Then(Concat(ours.value(), BytesZero(Int(32) - Len(ours.value()))))
+                   .Else(BytesZero(Int(32)))),
+        ])
+    
+    @Subroutine(TealType.none)
+    def assert_imported_sbt_app():
+        """The new app's sbt_app is unset if ours is, else an app of our creator"""
+        theirs = App.globalGetEx(Txn.applications[1], sbt_app_key)
+        sbt_creator = AppParam.creator(theirs.value())
+        return Seq([
+            theirs,
+            If(App.globalGet(sbt_app_key) == Int(0))
+            .Then(Assert(theirs.value() == Int(0)))
+            .Else(Seq([
+                Assert(theirs.value() != Int(0)),
+                sbt_creator,
+                Assert(sbt_creator.value() == Global.creator_address()),
+            ])),
+        ])
+    
+    export_job = Seq([
+        Assert(Txn.sender() == Global.creator_address()),
+        Assert(App.globalGet(client_key) != Bytes("")),
+        Assert(App.globalGet(status_key) != STATUS_RESOLVED),
+        Assert(new_app != Global.current_application_id()),
+        new_creator,
+        Assert(new_creator.value() == Global.creator_address()),
+        *[assert_imported(Bytes(key))
+          for key in ("client", "freelancer", "milestones", "asset") + IMPORT_UINT_KEYS
+          if key != "sbt_app"],
+        assert_imported_sbt_app(),
+        *[assert_imported_voter(Int(i)) for i in range(MAX_JURORS)],
+        new_address,
+        
+        pay(new_address.value(), remaining_amount()),
+        App.globalPut(released_key, App.globalGet(amount_key)),
+        App.globalPut(status_key, STATUS_RESOLVED),
+        
+        Int(1)
+    ])
+    
+    # Create Job - Called by client with payment, optionally with packed
+    # milestones (application_args[3]) that must add up to the amount.
+    # The payment is the transaction right after this call, so tooling can
+    # put an app funding payment in front of the pair.
+    payment = Gtxn[Txn.group_index() + Int(1)]
     create_job = Seq([
-        # Verify this is the first call (creation)
-        Assert(App.globalGet(status_key) == Int(0)),
+        # Only one job per escrow app
+        Assert(App.globalGet(client_key) == Bytes("")),
+        Assert(Btoi(Txn.application_args[1]) > Int(0)),
         
         # Store client address and job details
         App.globalPut(client_key, Txn.sender()),
-        App.globalPut(amount_key, Txn.application_args[1]),
+        App.globalPut(amount_key, Btoi(Txn.application_args[1])),
         App.globalPut(status_key, STATUS_CREATED),
         App.globalPut(created_key, Global.latest_timestamp()),
-        App.globalPut(deadline_key, Txn.application_args[2]),
+        App.globalPut(deadline_key, Btoi(Txn.application_args[2])),
+        
+        If(Txn.application_args.length() > Int(3)).Then(Seq([
+            Assert(milestone_total(Txn.application_args[3]) == Btoi(Txn.application_args[1])),
+            App.globalPut(milestones_key, Txn.application_args[3]),
+        ])),
         
-        # Payment must accompany this transaction
-        Assert(Gtxn[1].type_enum() == TxnType.Payment),
-        Assert(Gtxn[1].amount() == Btoi(Txn.application_args[1])),
-        Assert(Gtxn[1].receiver() == Global.current_application_address()),
+        # Payment (or transfer of the opted-in asset) must accompany this transaction
+        If(App.globalGet(asset_key) == Int(0))
+        .Then(Seq([
+            Assert(payment.type_enum() == TxnType.Payment),
+            Assert(payment.amount() == Btoi(Txn.application_args[1])),
+            Assert(payment.receiver() == Global.current_application_address()),
+        ]))
+        .Else(Seq([
+            Assert(payment.type_enum() == TxnType.AssetTransfer),
+            Assert(payment.xfer_asset() == App.globalGet(asset_key)),
+            Assert(payment.asset_amount() == Btoi(Txn.application_args[1])),
+            Assert(payment.asset_receiver() == Global.current_application_address()),
+        ])),
         
         Int(1)
     ])
@@ -91,7 +378,9 @@ def escrow_contract():
     # Accept Job - Called by freelancer
     accept_job = Seq([
         Assert(App.globalGet(status_key) == STATUS_CREATED),
+        Assert(App.globalGet(client_key) != Bytes("")),  # Job has been funded
         Assert(App.globalGet(freelancer_key) == Bytes("")),  # No freelancer assigned yet
+        Assert(Not(is_client())),
         
         App.globalPut(freelancer_key, Txn.sender()),
         App.globalPut(status_key, STATUS_IN_PROGRESS),
@@ -114,16 +403,44 @@ def escrow_contract():
         Assert(App.globalGet(status_key) == STATUS_COMPLETED),
         Assert(is_client()),
         
-        # Transfer funds to freelancer
-        InnerTxnBuilder.Begin(),
-        InnerTxnBuilder.SetFields({
-            TxnField.type_enum: TxnType.Payment,
-            TxnField.receiver: App.globalGet(freelancer_key),
-            TxnField.amount: App.globalGet(amount_key),
-        }),
-        InnerTxnBuilder.Submit(),
+        # Transfer whatever milestones have not released yet to freelancer
+        pay(App.globalGet(freelancer_key), remaining_amount()),
         
         App.globalPut(status_key, STATUS_RESOLVED),
+        assert_sbt_mint_follows(),
+        
+        Int(1)
+    ])
+    
+    # Submit Milestone - Called by freelancer when a milestone is delivered
+    submit_milestone = Seq([
+        Assert(App.globalGet(status_key) == STATUS_IN_PROGRESS),
+        Assert(is_freelancer()),
+        Assert(milestone_index < Len(App.globalGet(milestones_key)) / Int(MILESTONE_SIZE)),
+        Assert(milestone_status == MILESTONE_PENDING),
+        
+        set_milestone_status(MILESTONE_SUBMITTED),
+        
+        Int(1)
+    ])
+    
+    # Approve Milestone - Called by client to release one submitted milestone
+    approve_milestone = Seq([
+        Assert(App.globalGet(status_key) == STATUS_IN_PROGRESS),
+        Assert(is_client()),
+        Assert(milestone_index < Len(App.globalGet(milestones_key)) / Int(MILESTONE_SIZE)),
+        Assert(milestone_status == MILESTONE_SUBMITTED),
+        
+        pay(App.globalGet(freelancer_key), milestone_amount),
+        App.globalPut(released_key, App.globalGet(released_key) + milestone_amount),
+        set_milestone_status(MILESTONE_RELEASED),
+        
+        # Releasing the last milestone settles the job
+        If(App.globalGet(released_key) == App.globalGet(amount_key))
+        .Then(Seq([
+            App.globalPut(status_key, STATUS_RESOLVED),
+            assert_sbt_mint_follows(),
+        ])),
         
         Int(1)
     ])
@@ -139,7 +456,8 @@ def escrow_contract():
         App.globalPut(status_key, STATUS_DISPUTED),
         App.globalPut(votes_for_key, Int(0)),
         App.globalPut(votes_against_key, Int(0)),
-        App.globalPut(jurors_key, Int(5)),  # 5 jurors for disputes
+        App.globalPut(jurors_key, Int(MAX_JURORS)),  # 5 jurors for disputes
+        *[App.globalPut(voter_key(Int(i)), Bytes("")) for i in range(MAX_JURORS)],
         
         Int(1)
     ])
@@ -148,6 +466,16 @@ def escrow_contract():
     vote_dispute = Seq([
         Assert(App.globalGet(status_key) == STATUS_DISPUTED),
         # TODO: Add juror authorization check (SBT verification)
+        Assert(Not(is_participant())),
+        Assert(Not(has_voted())),
+        Assert(App.globalGet(votes_for_key) + App.globalGet(votes_against_key)
+               < App.globalGet(jurors_key)),
+        
+        # Record the voter in the next free slot
+        App.globalPut(
+            voter_key(App.globalGet(votes_for_key) + App.globalGet(votes_against_key)),
+            Txn.sender()
+        ),
         
         # vote_for_freelancer is passed as argument (1 for freelancer, 0 for client)
         If(Btoi(Txn.application_args[1]) == Int(1))
@@ -158,25 +486,13 @@ def escrow_contract():
         If(App.globalGet(votes_for_key) > App.globalGet(jurors_key) / Int(2))
         .Then(Seq([
             # Majority voted for freelancer - pay them
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.Payment,
-                TxnField.receiver: App.globalGet(freelancer_key),
-                TxnField.amount: App.globalGet(amount_key),
-            }),
-            InnerTxnBuilder.Submit(),
+            pay(App.globalGet(freelancer_key), remaining_amount()),
             App.globalPut(status_key, STATUS_RESOLVED),
         ]))
         .ElseIf(App.globalGet(votes_against_key) > App.globalGet(jurors_key) / Int(2))
         .Then(Seq([
-            # Majority voted for client - refund them
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.Payment,
-                TxnField.receiver: App.globalGet(client_key),
-                TxnField.amount: App.globalGet(amount_key),
-            }),
-            InnerTxnBuilder.Submit(),
+            # Majority voted for client - refund what was not yet released
+            pay(App.globalGet(client_key), remaining_amount()),
             App.globalPut(status_key, STATUS_RESOLVED),
         ])),
         
@@ -185,7 +501,12 @@ def escrow_contract():
     
     # Main contract logic
     program = Cond(
-        [Txn.application_id() == Int(0), Int(1)],  # Creation always succeeds
+        [Txn.application_id() == Int(0), on_create],
+        
+        # Only the creator (the platform) may update the code; methods are
+        # plain NoOp calls and delete/opt-in are not supported
+        [Txn.on_completion() == OnComplete.UpdateApplication, Txn.sender() == Global.creator_address()],
+        [Txn.on_completion() != OnComplete.NoOp, Int(0)],
         
         [Txn.application_args[0] == method_create_job, create_job],
         [Txn.application_args[0] == method_accept_job, accept_job],
@@ -193,6 +514,12 @@ def escrow_contract():
         [Txn.application_args[0] == method_approve_completion, approve_completion],
         [Txn.application_args[0] == method_raise_dispute, raise_dispute],
         [Txn.application_args[0] == method_vote_dispute, vote_dispute],
+        [Txn.application_args[0] == method_submit_milestone, submit_milestone],
+        [Txn.application_args[0] == method_approve_milestone, approve_milestone],
+        [Txn.application_args[0] == method_opt_in_asset, opt_in_asset],
+        [Txn.application_args[0] == method_link_sbt, link_sbt],
+        [Txn.application_args[0] == method_import_job, import_job],
+        [Txn.application_args[0] == method_export_job, export_job],
     )
     
     return program
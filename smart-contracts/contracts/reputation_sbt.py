@@ -2,17 +2,44 @@
 Ellora Reputation Soulbound Token (SBT) Contract
 
 This contract manages reputation tokens that cannot be transferred:
-- Mint SBTs when jobs are completed successfully
+- Mint SBTs when jobs are completed successfully, either by the platform
+  or atomically with the escrow payout that settles the job
 - Track user reputation on-chain
 - Enable dispute resolution juror selection
 - Follow ARC-71 standard for NFTs with transfer restrictions
+- Keep an optional per-account ring buffer of recent ratings in a box
+- Accept code updates and state imports from the platform (migrations)
 """
 
 from pyteal import (
-    Bytes, Int, Seq, Assert, App, Txn, Global, Btoi, Or, If, And,
-    Subroutine, TealType, compileTeal, Mode, Cond, OnComplete
+    Bytes, Int, Seq, Assert, App, Txn, Gtxn, Global, Btoi, Or, If, And,
+    Subroutine, TealType, compileTeal, Mode, Cond, OnComplete, TxnType,
+    Concat, Extract, ExtractUint16, ExtractUint64, Itob, ScratchVar, AppParam, Len
 )
 
+# Rating history box: "h" + account address, holding a 4-byte header
+# (uint16 next slot, uint16 entry count) followed by HISTORY_SLOTS entries of
+# uint32 timestamp + uint8 rating. Dispute outcomes are stored with the high
+# bit set (0x80 | outcome) so they can be told apart from job ratings.
+HISTORY_PREFIX = b"h"
+HISTORY_SLOTS = 32
+HISTORY_HEADER_SIZE = 4
+HISTORY_ENTRY_SIZE = 5
+HISTORY_BOX_SIZE = HISTORY_HEADER_SIZE + HISTORY_SLOTS * HISTORY_ENTRY_SIZE
+HISTORY_DISPUTE_FLAG = 0x80
+
+# Minimum balance the app account needs per history box
+HISTORY_BOX_MBR = 2500 + 400 * (len(HISTORY_PREFIX) + 32 + HISTORY_BOX_SIZE)
+
+# Migrated reputation waiting for its account to opt in: "m" + address,
+# holding uint64 sbt_count, positive, negative, last_earned, juror_eligible
+IMPORT_PREFIX = b"m"
+IMPORT_RECORD_SIZE = 40
+
+# Escrow calls that pay the freelancer and can settle a job (see escrow_contract.py)
+ESCROW_SETTLEMENT_METHODS = (b"approve_completion", b"approve_milestone")
+ESCROW_STATUS_RESOLVED = 4
+
 def reputation_sbt_contract():
     """
     Soulbound Token contract for Ellora reputation system
@@ -24,6 +51,10 @@ def reputation_sbt_contract():
     - last_earned: Timestamp of last SBT earned
     - juror_eligible: Whether user can serve as dispute juror
     
+    Boxes (optional, per user):
+    - "h" + address: ring buffer of the last HISTORY_SLOTS ratings
+    - "m" + address: imported reputation until the account claims it
+    
     Global State:
     - total_supply: Total SBTs minted
     - platform_address: Address authorized to mint SBTs
@@ -45,11 +76,79 @@ def reputation_sbt_contract():
     method_update_rating = Bytes("update_rating")
     method_check_eligibility = Bytes("check_eligibility")
     method_get_reputation = Bytes("get_reputation")
+    method_enable_history = Bytes("enable_history")
+    method_import_reputation = Bytes("import_reputation")
+    method_claim_reputation = Bytes("claim_reputation")
     
     @Subroutine(TealType.uint64)
     def is_platform():
         return Txn.sender() == App.globalGet(platform_address_key)
     
+    @Subroutine(TealType.none)
+    def assert_escrow_settlement():
+        """
+        Require that the previous transaction settled a platform escrow job
+        
+        The previous transaction must be an approve call that left the job
+        resolved, on an escrow app created by the platform and linked to this
+        app (its sbt_app), and the SBT goes to that job's freelancer
+        (Txn.accounts[1]). The escrow app must be in Txn.applications so its
+        state can be read.
+        """
+        escrow = Gtxn[Txn.group_index() - Int(1)]
+        creator = AppParam.creator(escrow.application_id())
+        status = App.globalGetEx(escrow.application_id(), Bytes("status"))
+        freelancer = App.globalGetEx(escrow.application_id(), Bytes("freelancer"))
+        sbt_app = App.globalGetEx(escrow.application_id(), Bytes("sbt_app"))
+        return Seq([
+            Assert(Txn.group_index() > Int(0)),
+            Assert(escrow.type_enum() == TxnType.ApplicationCall),
+            Assert(escrow.on_completion() == OnComplete.NoOp),
+            Assert(Or(*[escrow.application_args[0] == Bytes(method)
+                        for method in ESCROW_SETTLEMENT_METHODS])),
+            creator,
+            Assert(creator.hasValue()),
+            Assert(creator.value() == App.globalGet(platform_address_key)),
+            sbt_app,
+            Assert(sbt_app.value() == Global.current_application_id()),
+            status,
+            Assert(status.value() == Int(ESCROW_STATUS_RESOLVED)),
+            freelancer,
+            Assert(freelancer.value() == Txn.accounts[1]),
+        ])
+    
+    @Subroutine(TealType.none)
+    def record_history(address, rating):
+        """Append a rating to the account's history box, if it has one"""
+        name = Concat(Bytes(HISTORY_PREFIX), address)
+        box_length = App.box_length(name)
+        head = ScratchVar(TealType.uint64)
+        count = ScratchVar(TealType.uint64)
+        return Seq([
+            box_length,
+            If(box_length.hasValue()).Then(Seq([
+                head.store(ExtractUint16(App.box_extract(name, Int(0), Int(2)), Int(0))),
+                count.store(ExtractUint16(App.box_extract(name, Int(2), Int(2)), Int(0))),
+                
+                App.box_replace(
+                    name,
+                    Int(HISTORY_HEADER_SIZE) + head.load() * Int(HISTORY_ENTRY_SIZE),
+                    Concat(
+                        Extract(Itob(Global.latest_timestamp()), Int(4), Int(4)),
+                        Extract(Itob(rating), Int(7), Int(1))
+                    )
+                ),
+                
+                # Advance the write slot and saturate the count at capacity
+                App.box_replace(name, Int(0), Concat(
+                    Extract(Itob((head.load() + Int(1)) % Int(HISTORY_SLOTS)), Int(6), Int(2)),
+                    Extract(Itob(If(count.load() < Int(HISTORY_SLOTS),
+                                    count.load() + Int(1),
+                                    count.load())), Int(6), Int(2))
+                ))
+            ]))
+        ])
+    
     @Subroutine(TealType.uint64)
     def calculate_reputation_score(address):
         """Calculate overall reputation score for an address"""
@@ -67,34 +166,58 @@ def reputation_sbt_contract():
             Int(50)  # Default score for new users
         )
     
-    # Mint SBT - Called by platform when job is completed
+    # Recipient of a mint or rating update: Txn.accounts[1] when given,
+    # otherwise the sender (the original platform-only behaviour)
+    recipient = ScratchVar(TealType.bytes)
+    rating = Btoi(Txn.application_args[1])
+    
+    def store_recipient():
+        return recipient.store(
+            If(Txn.accounts.length() > Int(0), Txn.accounts[1], Txn.sender())
+        )
+    
+    # Mint SBT - Called by the platform when a job is completed, or by the
+    # client in the same group as the escrow call that settles the job, so
+    # the payout and the SBT confirm (or fail) together
     mint_sbt = Seq([
-        Assert(is_platform()),
-        
-        # Update SBT count for sender (recipient is sender for now - simplified)
-        App.localPut(Txn.sender(), sbt_count_key, 
-                    App.localGet(Txn.sender(), sbt_count_key) + Int(1)),
+        Assert(rating >= Int(1)),
+        Assert(rating <= Int(5)),
+        If(is_platform())
+        .Then(store_recipient())
+        .Else(Seq([
+            assert_escrow_settlement(),
+            recipient.store(Txn.accounts[1]),
+        ])),
         
-        # Update ratings based on rating argument
-        If(Btoi(Txn.application_args[1]) >= Int(4))  # 4-5 star rating is positive
-        .Then(App.localPut(Txn.sender(), positive_rating_key,
-                          App.localGet(Txn.sender(), positive_rating_key) + Int(1)))
-        .ElseIf(Btoi(Txn.application_args[1]) <= Int(2))  # 1-2 star rating is negative
-        .Then(App.localPut(Txn.sender(), negative_rating_key,
-                          App.localGet(Txn.sender(), negative_rating_key) + Int(1))),
-        
-        # Update timestamp
-        App.localPut(Txn.sender(), last_earned_key, Global.latest_timestamp()),
-        
-        # Check if user is eligible to be a juror (10+ SBTs, good rating)
-        If(And(
-            App.localGet(Txn.sender(), sbt_count_key) >= Int(10),
-            calculate_reputation_score(Txn.sender()) >= Int(70)
-        ))
-        .Then(App.localPut(Txn.sender(), juror_eligible_key, Int(1))),
-        
-        # Increment global supply
-        App.globalPut(total_supply_key, App.globalGet(total_supply_key) + Int(1)),
+        # A freelancer who cleared their local state simply earns nothing;
+        # that must not block the client's payout
+        If(Or(is_platform(), App.optedIn(recipient.load(), Global.current_application_id())))
+        .Then(Seq([
+            App.localPut(recipient.load(), sbt_count_key,
+                        App.localGet(recipient.load(), sbt_count_key) + Int(1)),
+            
+            # Update ratings based on rating argument
+            If(rating >= Int(4))  # 4-5 star rating is positive
+            .Then(App.localPut(recipient.load(), positive_rating_key,
+                              App.localGet(recipient.load(), positive_rating_key) + Int(1)))
+            .ElseIf(rating <= Int(2))  # 1-2 star rating is negative
+            .Then(App.localPut(recipient.load(), negative_rating_key,
+                              App.localGet(recipient.load(), negative_rating_key) + Int(1))),
+            
+            # Update timestamp
+            App.localPut(recipient.load(), last_earned_key, Global.latest_timestamp()),
+            record_history(recipient.load(), rating),
+            
+            # Check if user is eligible to be a juror (10+ SBTs, good rating)
+            If(And(
+                App.localGet(recipient.load(), sbt_count_key) >= Int(10),
+                calculate_reputation_score(recipient.load()) >= Int(70)
+            ))
+            .Then(App.localPut(recipient.load(), juror_eligible_key, Int(1))),
+            
+            # Increment global supply
+            App.globalPut(total_supply_key, App.globalGet(total_supply_key) + Int(1)),
+        ])),
         
         Int(1)
     ])
@@ -102,20 +225,23 @@ def reputation_sbt_contract():
     # Update Rating - Called by platform after dispute resolution
     update_rating = Seq([
         Assert(is_platform()),
+        store_recipient(),
         
         If(Btoi(Txn.application_args[1]) == Int(1))
-        .Then(App.localPut(Txn.sender(), positive_rating_key,
-                          App.localGet(Txn.sender(), positive_rating_key) + Int(1)))
-        .Else(App.localPut(Txn.sender(), negative_rating_key,
-                          App.localGet(Txn.sender(), negative_rating_key) + Int(1))),
+        .Then(App.localPut(recipient.load(), positive_rating_key,
+                          App.localGet(recipient.load(), positive_rating_key) + Int(1)))
+        .Else(App.localPut(recipient.load(), negative_rating_key,
+                          App.localGet(recipient.load(), negative_rating_key) + Int(1))),
+        record_history(recipient.load(),
+                       Int(HISTORY_DISPUTE_FLAG) | (Btoi(Txn.application_args[1]) == Int(1))),
         
         # Update juror eligibility
         If(And(
-            App.localGet(Txn.sender(), sbt_count_key) >= Int(10),
-            calculate_reputation_score(Txn.sender()) >= Int(70)
+            App.localGet(recipient.load(), sbt_count_key) >= Int(10),
+            calculate_reputation_score(recipient.load()) >= Int(70)
         ))
-        .Then(App.localPut(Txn.sender(), juror_eligible_key, Int(1)))
-        .Else(App.localPut(Txn.sender(), juror_eligible_key, Int(0))),
+        .Then(App.localPut(recipient.load(), juror_eligible_key, Int(1)))
+        .Else(App.localPut(recipient.load(), juror_eligible_key, Int(0))),
         
         Int(1)
     ])
@@ -126,6 +252,61 @@ def reputation_sbt_contract():
     # Get Reputation - Read-only method to get user's reputation data
     get_reputation = calculate_reputation_score(Txn.sender())
     
+    # Enable History - Account creates its own history box, paying the box
+    # minimum balance to the app in the preceding payment. Calls that may
+    # record history must reference the box even when it does not exist.
+    enable_history = Seq([
+        Assert(Txn.group_index() > Int(0)),
+        Assert(Gtxn[Txn.group_index() - Int(1)].type_enum() == TxnType.Payment),
+        Assert(Gtxn[Txn.group_index() - Int(1)].sender() == Txn.sender()),
+        Assert(Gtxn[Txn.group_index() - Int(1)].receiver() == Global.current_application_address()),
+        Assert(Gtxn[Txn.group_index() - Int(1)].amount() >= Int(HISTORY_BOX_MBR)),
+        Assert(App.box_create(Concat(Bytes(HISTORY_PREFIX), Txn.sender()), Int(HISTORY_BOX_SIZE))),
+        Int(1)
+    ])
+    
+    def put_reputation(address, record):
+        """Write a packed IMPORT_RECORD_SIZE reputation record into local state"""
+        return Seq([
+            App.localPut(address, key, ExtractUint64(record, Int(8 * i)))
+            for i, key in enumerate((sbt_count_key, positive_rating_key, negative_rating_key,
+                                     last_earned_key, juror_eligible_key))
+        ])
+    
+    # Import Reputation - Called by the platform to replay an account's state
+    # from a previous deployment. Accounts already opted in get it directly;
+    # others find it in an "m" box and claim it after opting in. An optional
+    # application_args[2] restores the rating history box.
+    import_reputation = Seq([
+        Assert(is_platform()),
+        Assert(Len(Txn.application_args[1]) == Int(IMPORT_RECORD_SIZE)),
+        
+        If(App.optedIn(Txn.accounts[1], Global.current_application_id()))
+        .Then(put_reputation(Txn.accounts[1], Txn.application_args[1]))
+        .Else(App.box_put(Concat(Bytes(IMPORT_PREFIX), Txn.accounts[1]), Txn.application_args[1])),
+        
+        If(Txn.application_args.length() > Int(2)).Then(Seq([
+            Assert(Len(Txn.application_args[2]) == Int(HISTORY_BOX_SIZE)),
+            App.box_put(Concat(Bytes(HISTORY_PREFIX), Txn.accounts[1]), Txn.application_args[2]),
+        ])),
+        
+        App.globalPut(total_supply_key,
+                      App.globalGet(total_supply_key) + ExtractUint64(Txn.application_args[1], Int(0))),
+        
+        Int(1)
+    ])
+    
+    # Claim Reputation - Called by an opted-in account to move its imported
+    # reputation from the "m" box into local state
+    imported = App.box_get(Concat(Bytes(IMPORT_PREFIX), Txn.sender()))
+    claim_reputation = Seq([
+        imported,
+        Assert(imported.hasValue()),
+        put_reputation(Txn.sender(), imported.value()),
+        Assert(App.box_delete(Concat(Bytes(IMPORT_PREFIX), Txn.sender()))),
+        Int(1)
+    ])
+    
     # Main contract logic
     program = Cond(
         # App creation - set platform address
@@ -135,13 +316,21 @@ def reputation_sbt_contract():
             Int(1)
         ])],
         
+        # Opt-in always succeeds (checked before the method dispatch, which
+        # would fail on an opt-in without application args)
+        [Txn.on_completion() == OnComplete.OptIn, Int(1)],
+        
+        # Code updates are the platform's; the app is never deleted
+        [Txn.on_completion() == OnComplete.UpdateApplication, is_platform()],
+        [Txn.on_completion() == OnComplete.DeleteApplication, Int(0)],
+        
         [Txn.application_args[0] == method_mint_sbt, mint_sbt],
         [Txn.application_args[0] == method_update_rating, update_rating],
         [Txn.application_args[0] == method_check_eligibility, check_eligibility],
         [Txn.application_args[0] == method_get_reputation, get_reputation],
-        
-        # Opt-in always succeeds
-        [Txn.on_completion() == OnComplete.OptIn, Int(1)],
+        [Txn.application_args[0] == method_enable_history, enable_history],
+        [Txn.application_args[0] == method_import_reputation, import_reputation],
+        [Txn.application_args[0] == method_claim_reputation, claim_reputation],
     )
     
     return program
@@ -0,0 +1,269 @@
+"""
+Ellora Application State Helpers
+
+Decodes the key/value state that algod returns for the escrow and
+reputation SBT apps into plain Python dicts, and mirrors the contracts'
+on-chain arithmetic (reputation score, juror eligibility) for off-chain
+tooling. Reputation history boxes are decoded in place through a
+memoryview, so a recent-history lookup is one box read and no copies.
+"""
+
+import base64
+import struct
+
+# Escrow job statuses (see escrow_contract.py)
+STATUS_CREATED = 0
+STATUS_IN_PROGRESS = 1
+STATUS_COMPLETED = 2
+STATUS_DISPUTED = 3
+STATUS_RESOLVED = 4
+
+STATUS_NAMES = {
+    STATUS_CREATED: "created",
+    STATUS_IN_PROGRESS: "in_progress",
+    STATUS_COMPLETED: "completed",
+    STATUS_DISPUTED: "disputed",
+    STATUS_RESOLVED: "resolved",
+}
+
+# Milestone statuses and record layout (see escrow_contract.py)
+MILESTONE_PENDING = 0
+MILESTONE_SUBMITTED = 1
+MILESTONE_RELEASED = 2
+
+MILESTONE_SIZE = 9
+MAX_MILESTONES = 12
+
+# Dispute juror slots and import_job's packed uint globals (see escrow_contract.py)
+MAX_JURORS = 5
+IMPORT_UINT_KEYS = ("amount", "status", "created", "deadline", "votes_for", "votes_against",
+                    "jurors", "released", "sbt_app")
+
+ZERO_ADDRESS = bytes(32)
+
+# Juror eligibility thresholds (see reputation_sbt.py)
+JUROR_MIN_SBTS = 10
+JUROR_MIN_SCORE = 70
+DEFAULT_SCORE = 50
+
+# Reputation history ring buffer layout (see reputation_sbt.py)
+HISTORY_PREFIX = b"h"
+HISTORY_SLOTS = 32
+HISTORY_HEADER = struct.Struct(">HH")  # next slot, entry count
+HISTORY_ENTRY = struct.Struct(">IB")   # timestamp, rating
+HISTORY_BOX_SIZE = HISTORY_HEADER.size + HISTORY_SLOTS * HISTORY_ENTRY.size
+HISTORY_DISPUTE_FLAG = 0x80
+
+
+def decode_state(key_values):
+    """
+    Decode an algod TEAL key/value list into {key: value}
+
+    Keys are decoded as UTF-8 where possible (all Ellora keys are ASCII);
+    byte values stay raw bytes and uint values become ints.
+    """
+    state = {}
+    for item in key_values or []:
+        raw_key = base64.b64decode(item["key"])
+        try:
+            key = raw_key.decode()
+        except UnicodeDecodeError:
+            key = raw_key
+        value = item["value"]
+        if value["type"] == 1:
+            state[key] = base64.b64decode(value.get("bytes", ""))
+        else:
+            state[key] = value.get("uint", 0)
+    return state
+
+
+def as_uint(value):
+    """Read a state value that may have been stored as bytes or uint"""
+    if isinstance(value, bytes):
+        return int.from_bytes(value, "big") if value else 0
+    return value or 0
+
+
+def as_address(value):
+    """Read a 32-byte address from state, empty/missing becomes zero bytes"""
+    if isinstance(value, bytes) and len(value) == 32:
+        return value
+    return ZERO_ADDRESS
+
+
+def pack_milestones(amounts, statuses=None):
+    """Pack milestone amounts (and statuses, default pending) into escrow records"""
+    if not 0 < len(amounts) <= MAX_MILESTONES:
+        raise ValueError(f"a job has 1 to {MAX_MILESTONES} milestones, got {len(amounts)}")
+    statuses = statuses or [MILESTONE_PENDING] * len(amounts)
+    return b"".join(amount.to_bytes(8, "big") + bytes([status])
+                    for amount, status in zip(amounts, statuses))
+
+
+def unpack_milestones(packed):
+    """Unpack escrow milestone records into [(amount, status)]"""
+    packed = packed or b""
+    return [(int.from_bytes(packed[i:i + 8], "big"), packed[i + 8])
+            for i in range(0, len(packed), MILESTONE_SIZE)]
+
+
+def escrow_job_from_state(app_id, state):
+    """Normalise escrow global state into a job dict"""
+    return {
+        "app_id": app_id,
+        "client": as_address(state.get("client")),
+        "freelancer": as_address(state.get("freelancer")),
+        "amount": as_uint(state.get("amount")),
+        "status": as_uint(state.get("status")),
+        "created": as_uint(state.get("created")),
+        "deadline": as_uint(state.get("deadline")),
+        "votes_for": as_uint(state.get("votes_for")),
+        "votes_against": as_uint(state.get("votes_against")),
+        "jurors": as_uint(state.get("jurors")),
+        "released": as_uint(state.get("released")),
+        "asset": as_uint(state.get("asset")),
+        "sbt_app": as_uint(state.get("sbt_app")),
+        "milestones": unpack_milestones(state.get("milestones")),
+        "voters": [as_address(state.get(f"voter{i}")) for i in range(MAX_JURORS)],
+    }
+
+
+def sbt_state_from_local(address, state):
+    """Normalise reputation SBT local state into a dict"""
+    return {
+        "address": address,
+        "sbt_count": as_uint(state.get("sbt_count")),
+        "positive": as_uint(state.get("positive")),
+        "negative": as_uint(state.get("negative")),
+        "last_earned": as_uint(state.get("last_earned")),
+        "juror_eligible": as_uint(state.get("juror_eligible")),
+    }
+
+
+def escrow_import_args(job):
+    """application_args replaying a job into a fresh escrow app (import_job)"""
+    milestones = job["milestones"]
+    return [
+        b"import_job",
+        b"".join(job[key].to_bytes(8, "big") for key in IMPORT_UINT_KEYS),
+        job["client"] + job["freelancer"],
+        pack_milestones([amount for amount, _ in milestones], [status for _, status in milestones])
+        if milestones else b"",
+        b"".join(job["voters"]),
+    ]
+
+
+def pack_reputation(state):
+    """Pack SBT local state as the 40-byte record import_reputation takes"""
+    return b"".join(state[key].to_bytes(8, "big")
+                    for key in ("sbt_count", "positive", "negative", "last_earned", "juror_eligible"))
+
+
+def reputation_score(positive, negative, sbt_count):
+    """
+    Off-chain mirror of calculate_reputation_score
+
+    (positive - negative) * 100 / total_jobs, floored at 0, 50 for new users.
+    The contract's uint subtraction would panic when negative > positive;
+    off-chain that case is simply scored 0.
+    """
+    if sbt_count <= 0:
+        return DEFAULT_SCORE
+    if negative >= positive:
+        return 0
+    return (positive - negative) * 100 // sbt_count
+
+
+def juror_eligible(sbt_count, score):
+    """Mirror of the contract's juror eligibility rule"""
+    return sbt_count >= JUROR_MIN_SBTS and score >= JUROR_MIN_SCORE
+
+
+def history_box_name(address):
+    """Box name of an account's reputation history (32-byte address)"""
+    return HISTORY_PREFIX + address
+
+
+def iter_history(box):
+    """
+    Yield (timestamp, rating, dispute) from a history box, newest first
+
+    The box is read through a memoryview with struct.unpack_from, so no
+    slice of it is ever copied. Dispute outcomes have `dispute` set and a
+    rating of 1 (resolved in favour) or 0.
+    """
+    view = memoryview(box)
+    if len(view) != HISTORY_BOX_SIZE:
+        raise ValueError(f"history box must be {HISTORY_BOX_SIZE} bytes, got {len(view)}")
+    head, count = HISTORY_HEADER.unpack_from(view, 0)
+    for back in range(1, min(count, HISTORY_SLOTS) + 1):
+        slot = (head - back) % HISTORY_SLOTS
+        timestamp, rating = HISTORY_ENTRY.unpack_from(
+            view, HISTORY_HEADER.size + slot * HISTORY_ENTRY.size)
+        yield timestamp, rating & ~HISTORY_DISPUTE_FLAG, bool(rating & HISTORY_DISPUTE_FLAG)
+
+
+def decode_history(box, limit=None):
+    """Decode up to `limit` history entries (newest first) into dicts"""
+    entries = []
+    for timestamp, rating, dispute in iter_history(box):
+        if limit is not None and len(entries) >= limit:
+            break
+        entries.append({"timestamp": timestamp, "rating": rating, "dispute": dispute})
+    return entries
+
+
+def recent_average_rating(box, jobs=20):
+    """Average job rating over the last `jobs` jobs, None without any"""
+    ratings = []
+    for _, rating, dispute in iter_history(box):
+        if len(ratings) >= jobs:
+            break
+        if not dispute:
+            ratings.append(rating)
+    return sum(ratings) / len(ratings) if ratings else None
+
+
+def read_escrow_job(algod_client, app_id):
+    """Fetch and decode one escrow app's global state"""
+    params = algod_client.application_info(app_id)["params"]
+    return escrow_job_from_state(app_id, decode_state(params.get("global-state")))
+
+
+def read_sbt_state(algod_client, address, sbt_app_id):
+    """
+    Fetch and decode one account's reputation SBT local state
+
+    `address` is the 32-byte public key; returns None if the account has
+    not opted in.
+    """
+    from algosdk.encoding import encode_address
+    from algosdk.error import AlgodHTTPError
+
+    try:
+        info = algod_client.account_application_info(encode_address(address), sbt_app_id)
+    except AlgodHTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    local = info.get("app-local-state")
+    if local is None:
+        return None
+    return sbt_state_from_local(address, decode_state(local.get("key-value")))
+
+
+def read_history_box(algod_client, sbt_app_id, address):
+    """
+    Fetch an account's raw reputation history box
+
+    Returns None if the account has not enabled history.
+    """
+    from algosdk.error import AlgodHTTPError
+
+    try:
+        box = algod_client.application_box_by_name(sbt_app_id, history_box_name(address))
+    except AlgodHTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    return base64.b64decode(box["value"])
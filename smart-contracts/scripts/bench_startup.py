@@ -0,0 +1,98 @@
+"""
+Startup Benchmark for Ellora Deploy Tooling
+
+Measures how long each deploy CLI subcommand takes to start and checks
+that the lightweight ones (`status`, `--help`) never import PyTeal,
+algosdk or the contract modules.
+
+Usage:
+    python3 bench_startup.py [--runs 10] [--budget-ms 150]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "deploy_contracts_fixed.py")
+
+# Commands that must stay offline and free of heavy imports
+FAST_COMMANDS = [
+    ["--help"],
+    ["status"],
+]
+
+HEAVY_MODULES = ("pyteal", "algosdk", "certifi", "escrow_contract", "reputation_sbt")
+
+
+def time_command(argv, runs):
+    """Wall-clock timings (ms) of running the CLI `runs` times"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT, *argv], stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def baseline_interpreter(runs):
+    """Wall-clock timings (ms) of a bare interpreter start, for reference"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=False)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def imported_roots(argv):
+    """Top-level heavy packages imported while running `python argv`"""
+    result = subprocess.run([sys.executable, "-X", "importtime", *argv],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        module = line.rsplit("|", 1)[-1].strip()
+        root = module.split(".")[0]
+        if root in HEAVY_MODULES:
+            imported.add(root)
+    return imported
+
+
+def heavy_imports(argv):
+    """Heavy packages a command imports beyond what site startup already loads"""
+    return sorted(imported_roots([SCRIPT, *argv]) - imported_roots(["-c", "pass"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark deploy CLI startup time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="max median overhead over a bare interpreter for fast commands")
+    args = parser.parse_args()
+
+    baseline = statistics.median(baseline_interpreter(args.runs))
+    print(f"🐍 Bare interpreter start: {baseline:.1f} ms (median of {args.runs})\n")
+    print(f"{'COMMAND':<12} {'MEDIAN':>9} {'MIN':>9} {'OVERHEAD':>9}  HEAVY IMPORTS")
+
+    failed = False
+    for argv in FAST_COMMANDS:
+        timings = time_command(argv, args.runs)
+        median = statistics.median(timings)
+        overhead = median - baseline
+        heavy = heavy_imports(argv)
+        ok = not heavy and overhead <= args.budget_ms
+        failed = failed or not ok
+        icon = "✅" if ok else "❌"
+        print(f"{' '.join(argv):<12} {median:>7.1f}ms {min(timings):>7.1f}ms {overhead:>7.1f}ms  "
+              f"{', '.join(heavy) or '-'} {icon}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Build Ellora Smart Contracts
+
+Compiles every contract variant against every requested TEAL version in a
+process pool and writes the results to smart-contracts/build/:
+
+    build/<variant>/v<version>/approval.teal
+    build/<variant>/v<version>/clear.teal
+    build/summary.json
+
+Each successful matrix cell is cached on the hash of the contract source,
+the TEAL version and the installed PyTeal version, so unchanged inputs are
+not recompiled. Failures are never cached. Variants in ALLOWED_FAILURES are
+reported but do not affect the exit status.
+
+Usage:
+    python3 build_contracts.py
+    python3 build_contracts.py --versions 8 9 10 --variants escrow reputation
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+
+CONTRACTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'contracts')
+BUILD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'build')
+CACHE_DIR = os.path.join(BUILD_DIR, '.cache')
+
+# variant name -> (module in contracts/, approval builder, clear builder)
+VARIANTS = {
+    "escrow": ("escrow_contract", "escrow_contract", "clear_state_program"),
+    "reputation": ("reputation_sbt", "reputation_sbt_contract", "clear_state_program"),
+    "reputation_backup": ("reputation_sbt_backup", "reputation_sbt_contract", "clear_state_program"),
+}
+
+# Variants that are built for reference but may fail without failing the build
+ALLOWED_FAILURES = {"reputation_backup"}
+
+DEFAULT_VERSIONS = [8, 9, 10]
+
+
+def pyteal_version():
+    """Installed PyTeal version, part of every cache key"""
+    try:
+        return metadata.version("pyteal")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def cache_key(variant, version):
+    """Hash of everything that determines a build's output"""
+    module_name, approval_fn, clear_fn = VARIANTS[variant]
+    with open(os.path.join(CONTRACTS_DIR, module_name + ".py"), 'rb') as f:
+        source = f.read()
+
+    digest = hashlib.sha256()
+    for part in (source, module_name.encode(), approval_fn.encode(), clear_fn.encode(),
+                 str(version).encode(), pyteal_version().encode()):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def compile_variant(variant, version):
+    """
+    Compile one (variant, version) cell
+
+    Runs inside a worker process, so it imports the contract module itself
+    and returns only plain data.
+    """
+    import importlib
+    from pyteal import compileTeal, Mode
+
+    if CONTRACTS_DIR not in sys.path:
+        sys.path.append(CONTRACTS_DIR)
+
+    module_name, approval_fn, clear_fn = VARIANTS[variant]
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+        approval = compileTeal(getattr(module, approval_fn)(), Mode.Application, version=version)
+        clear = compileTeal(getattr(module, clear_fn)(), Mode.Application, version=version)
+        result = {"status": "ok", "approval": approval, "clear": clear, "error": None}
+    except Exception as e:
+        result = {"status": "error", "approval": None, "clear": None,
+                  "error": f"{type(e).__name__}: {e}".splitlines()[0]}
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def load_cached(key):
+    """Return a cached build result or None"""
+    path = os.path.join(CACHE_DIR, key + ".json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def store_cached(key, result):
+    """Persist a build result in the cache"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = os.path.join(CACHE_DIR, key + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(result, f)
+    os.replace(tmp_path, os.path.join(CACHE_DIR, key + ".json"))
+
+
+def write_artifacts(variant, version, result):
+    """Write approval/clear TEAL for a successful build"""
+    out_dir = os.path.join(BUILD_DIR, variant, f"v{version}")
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ("approval", "clear"):
+        with open(os.path.join(out_dir, f"{name}.teal"), 'w') as f:
+            f.write(result[name])
+    return out_dir
+
+
+def build_matrix(variants, versions, workers=None, use_cache=True):
+    """Compile the full variant x version matrix and return one row per cell"""
+    cells = [(variant, version) for variant in variants for version in versions]
+    keys = {cell: cache_key(*cell) for cell in cells}
+
+    results = {}
+    pending = []
+    for cell in cells:
+        cached = load_cached(keys[cell]) if use_cache else None
+        if cached and cached["status"] == "ok":
+            cached["cached"] = True
+            results[cell] = cached
+        else:
+            pending.append(cell)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {cell: pool.submit(compile_variant, *cell) for cell in pending}
+            for cell, future in futures.items():
+                result = future.result()
+                result["cached"] = False
+                if result["status"] == "ok":
+                    store_cached(keys[cell], result)
+                results[cell] = result
+
+    rows = []
+    for variant, version in cells:
+        result = results[(variant, version)]
+        row = {
+            "variant": variant,
+            "version": version,
+            "status": result["status"],
+            "cached": result["cached"],
+            "seconds": round(result["seconds"], 3),
+            "approval_sha256": None,
+            "approval_lines": None,
+            "error": result["error"],
+            "allow_failure": variant in ALLOWED_FAILURES,
+        }
+        if result["status"] == "ok":
+            write_artifacts(variant, version, result)
+            row["approval_sha256"] = hashlib.sha256(result["approval"].encode()).hexdigest()
+            row["approval_lines"] = result["approval"].count("\n") + 1
+        rows.append(row)
+    return rows
+
+
+def print_summary(rows):
+    """Print the build matrix as a table"""
+    print(f"{'VARIANT':<20} {'TEAL':<5} {'STATUS':<7} {'LINES':>6} {'TIME':>7}  {'SHA256':<12} NOTE")
+    for row in rows:
+        icon = "✅" if row["status"] == "ok" else ("⚠️" if row["allow_failure"] else "❌")
+        lines = row["approval_lines"] if row["approval_lines"] is not None else "-"
+        sha = row["approval_sha256"][:12] if row["approval_sha256"] else "-"
+        note = "cached" if row["cached"] else ""
+        if row["error"]:
+            note = row["error"] + (" (allowed to fail)" if row["allow_failure"] else "")
+        print(f"{row['variant']:<20} v{row['version']:<4} {icon:<6} {lines:>6} "
+              f"{row['seconds']:>6.2f}s  {sha:<12} {note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile Ellora contracts across variants and TEAL versions")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--versions", nargs="+", type=int, default=DEFAULT_VERSIONS)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="recompile every cell")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = build_matrix(args.variants, args.versions, args.workers, use_cache=not args.no_cache)
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    with open(os.path.join(BUILD_DIR, "summary.json"), 'w') as f:
+        json.dump(rows, f, indent=2)
+
+    print_summary(rows)
+    failed = sum(1 for row in rows if row["status"] != "ok")
+    required_failed = sum(1 for row in rows if row["status"] != "ok" and not row["allow_failure"])
+    print(f"\n🏗️  Built {len(rows) - failed}/{len(rows)} targets in {time.perf_counter() - started:.2f}s"
+          + (f" ({failed - required_failed} allowed failures)" if failed > required_failed else ""))
+    print(f"📄 Artifacts written to {os.path.normpath(BUILD_DIR)}")
+    return 1 if required_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
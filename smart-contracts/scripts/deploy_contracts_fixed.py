@@ -1,52 +1,119 @@
 """
 Deploy Ellora Smart Contracts to Algorand Testnet
 
-This script deploys both the escrow and reputation SBT contracts
+This script deploys both the escrow and reputation SBT contracts.
+
+Deployments are tracked per environment in deployments.json. Running
+`apply` compiles every contract, compares the bytecode hashes with the
+manifest and only touches the apps that changed, so re-running against an
+up-to-date environment is a cheap no-op. Changed programs are updated in
+place (keeping app IDs and state); only a schema change, or an app whose
+deployed program predates update support, gets a new app, whose state is
+then replayed with migrate_state.py.
+
+PyTeal, algosdk and the contract modules are only imported by the
+subcommands that need them, so `status` and `balance` start instantly.
+
+All algod calls go through metrics.InstrumentedAlgod; pass --metrics-file
+(or set ELLORA_METRICS_FILE) to write compile/submit/confirmation latency,
+fees, retries and failure codes in Prometheus text format on exit.
+
+Usage:
+    python3 deploy_contracts_fixed.py status  [--env testnet]
+    python3 deploy_contracts_fixed.py balance [--env testnet] [--address ADDR]
+    python3 deploy_contracts_fixed.py plan    [--env testnet]
+    python3 deploy_contracts_fixed.py apply   [--env testnet]
+    python3 deploy_contracts_fixed.py --metrics-file ellora.prom apply
 """
 
 import os
 import sys
-import ssl
-import certifi
-from algosdk import mnemonic, account
-from algosdk.v2client import algod
-from algosdk.transaction import ApplicationCreateTxn, PaymentTxn, wait_for_confirmation
-from algosdk.transaction import StateSchema, OnComplete
-from algosdk.logic import get_application_address
+import argparse
 import base64
-from pyteal import compileTeal, Mode
+import importlib
 
-# Fix SSL certificate issues on macOS
-ssl._create_default_https_context = ssl._create_unverified_context
+from manifest import DeploymentManifest, program_hash
+from metrics import AlgodMetrics, InstrumentedAlgod, export_on_exit, instrumented
 
-# Add the contracts directory to the path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'contracts'))
+CONTRACTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'contracts')
 
-from escrow_contract import escrow_contract, clear_state_program  # type: ignore
-from reputation_sbt import reputation_sbt_contract, clear_state_program as sbt_clear_program  # type: ignore
+# Algod endpoints per environment: (address, token)
+NETWORKS = {
+    "testnet": ("https://testnet-api.algonode.cloud", ""),
+    "mainnet": ("https://mainnet-api.algonode.cloud", ""),
+    "localnet": ("http://localhost:4001", "a" * 64),
+    "standin": ("http://127.0.0.1:4190", "a" * 64),  # local_algod.py
+}
 
 # Algorand testnet configuration
-ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
-ALGOD_TOKEN = ""
+ALGOD_ADDRESS, ALGOD_TOKEN = NETWORKS["testnet"]
+
+# Contracts managed by the deployer, in deployment order. Builders are
+# "module:function" references into contracts/ and are resolved lazily.
+CONTRACTS = {
+    "escrow": {
+        "label": "Escrow Contract",
+        "approval": "escrow_contract:escrow_contract",
+        "clear": "escrow_contract:clear_state_program",
+        "global_schema": {"num_uints": 10, "num_byte_slices": 10},
+        "local_schema": {"num_uints": 5, "num_byte_slices": 5},
+        "fund": True,  # Needs a balance for inner payment transactions
+    },
+    "reputation": {
+        "label": "Reputation SBT Contract",
+        "approval": "reputation_sbt:reputation_sbt_contract",
+        "clear": "reputation_sbt:clear_state_program",
+        "global_schema": {"num_uints": 5, "num_byte_slices": 5},
+        "local_schema": {"num_uints": 10, "num_byte_slices": 5},
+        "fund": True,  # Base minimum balance for per-account history boxes
+    },
+}
+
+def load_builder(reference):
+    """Import a contract builder from a "module:function" reference"""
+    if CONTRACTS_DIR not in sys.path:
+        sys.path.append(CONTRACTS_DIR)
+    module_name, function_name = reference.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+def state_schema(schema):
+    """Build an algosdk StateSchema from a schema dict"""
+    from algosdk.transaction import StateSchema
+    return StateSchema(num_uints=schema["num_uints"], num_byte_slices=schema["num_byte_slices"])
+
+def create_algod_client(algod_address=ALGOD_ADDRESS, algod_token=ALGOD_TOKEN):
+    """Create an instrumented algod client, applying the SSL workaround on first use"""
+    import ssl
+    from algosdk.v2client import algod
+
+    # Fix SSL certificate issues on macOS
+    ssl._create_default_https_context = ssl._create_unverified_context
+
+    return InstrumentedAlgod(algod.AlgodClient(algod_token, algod_address))
 
 class ContractDeployer:
-    def __init__(self, private_key=None, mnemonic_phrase=None):
+    def __init__(self, private_key=None, mnemonic_phrase=None,
+                 algod_address=ALGOD_ADDRESS, algod_token=ALGOD_TOKEN, read_only=False):
         """Initialize deployer with account credentials"""
-        self.algod_client = algod.AlgodClient(ALGOD_TOKEN, ALGOD_ADDRESS)
-        
+        from algosdk import mnemonic, account
+
+        self.algod_client = create_algod_client(algod_address, algod_token)
+        self.private_key = None
+        self.address = None
+
         if private_key:
             self.private_key = private_key
             self.address = account.address_from_private_key(private_key)
         elif mnemonic_phrase:
             self.private_key = mnemonic.to_private_key(mnemonic_phrase)
             self.address = account.address_from_private_key(self.private_key)
-        else:
+        elif not read_only:
             # Generate new account if none provided
             self.private_key, self.address = account.generate_account()
             print(f"Generated new account: {self.address}")
             print(f"Mnemonic: {mnemonic.from_private_key(self.private_key)}")
             print("Please fund this account with testnet ALGO before deployment")
-    
+
     def get_account_info(self):
         """Get account information including balance"""
         try:
@@ -55,39 +122,37 @@ class ContractDeployer:
         except Exception as e:
             print(f"Error getting account info: {e}")
             return None
-    
+
     def compile_pyteal_program(self, pyteal_program):
         """Compile PyTEAL program to bytecode"""
+        from pyteal import compileTeal, Mode
+
         try:
             # Compile PyTEAL to TEAL
-            teal_source = compileTeal(pyteal_program, Mode.Application, version=8)
-            
+            with AlgodMetrics().compile.time(stage="pyteal"):
+                teal_source = compileTeal(pyteal_program, Mode.Application, version=8)
+
             # Compile TEAL to bytecode
             compile_response = self.algod_client.compile(teal_source)
             return base64.b64decode(compile_response['result'])
         except Exception as e:
             print(f"Error compiling program: {e}")
             return None
-    
-    def deploy_escrow_contract(self):
-        """Deploy the escrow smart contract"""
-        print("🚀 Deploying Escrow Contract...")
-        
-        # Compile programs
-        approval_program = self.compile_pyteal_program(escrow_contract())
-        clear_program = self.compile_pyteal_program(clear_state_program())
-        
-        if not approval_program or not clear_program:
-            print("❌ Failed to compile escrow contract")
-            return None
-        
-        # Define state schema
-        global_schema = StateSchema(num_uints=10, num_byte_slices=10)
-        local_schema = StateSchema(num_uints=5, num_byte_slices=5)
-        
+
+    def compile_contract(self, name):
+        """Compile approval and clear programs for a managed contract"""
+        spec = CONTRACTS[name]
+        approval_program = self.compile_pyteal_program(load_builder(spec["approval"])())
+        clear_program = self.compile_pyteal_program(load_builder(spec["clear"])())
+        return approval_program, clear_program
+
+    def create_application(self, approval_program, clear_program, global_schema, local_schema):
+        """Submit an ApplicationCreateTxn and return the new app ID"""
+        from algosdk.transaction import ApplicationCreateTxn, OnComplete, wait_for_confirmation
+
         # Get suggested parameters
         params = self.algod_client.suggested_params()
-        
+
         # Create application transaction
         txn = ApplicationCreateTxn(
             sender=self.address,
@@ -95,164 +160,397 @@ class ContractDeployer:
             on_complete=OnComplete.NoOpOC,
             approval_program=approval_program,
             clear_program=clear_program,
-            global_schema=global_schema,
-            local_schema=local_schema,
+            global_schema=state_schema(global_schema),
+            local_schema=state_schema(local_schema),
         )
-        
+
         # Sign and submit transaction
         signed_txn = txn.sign(self.private_key)
         tx_id = self.algod_client.send_transaction(signed_txn)
-        
+
         # Wait for confirmation
         confirmed_txn = wait_for_confirmation(self.algod_client, tx_id, 4)
-        app_id = confirmed_txn["application-index"]
-        
-        print(f"✅ Escrow Contract deployed with App ID: {app_id}")
+        return confirmed_txn["application-index"]
+
+    def update_application(self, app_id, approval_program, clear_program):
+        """Submit an ApplicationUpdateTxn (creator only) and wait for it"""
+        from algosdk.transaction import ApplicationUpdateTxn, wait_for_confirmation
+
+        params = self.algod_client.suggested_params()
+        txn = ApplicationUpdateTxn(
+            sender=self.address,
+            sp=params,
+            index=app_id,
+            approval_program=approval_program,
+            clear_program=clear_program,
+        )
+        tx_id = self.algod_client.send_transaction(txn.sign(self.private_key))
+        wait_for_confirmation(self.algod_client, tx_id, 4)
+        return app_id
+
+    @instrumented("update_contract")
+    def update_contract(self, name, app_id, approval_program, clear_program):
+        """
+        Update a managed contract in place
+
+        Returns None if the deployed program rejects the update (apps
+        created before UpdateApplication was handled).
+        """
+        from algosdk.error import AlgodHTTPError
+
+        try:
+            self.update_application(app_id, approval_program, clear_program)
+        except AlgodHTTPError as e:
+            if "logic eval error" not in str(e) and "rejected" not in str(e):
+                raise
+            print(f"⚠️ App {app_id} rejected the update: {e}")
+            return None
+
+        print(f"✅ {CONTRACTS[name]['label']} updated in place (App ID: {app_id})")
         return app_id
-    
+
+    @instrumented("deploy_contract")
+    def deploy_contract(self, name, approval_program=None, clear_program=None):
+        """Deploy a managed contract, compiling it unless bytecode is given"""
+        spec = CONTRACTS[name]
+
+        if approval_program is None or clear_program is None:
+            approval_program, clear_program = self.compile_contract(name)
+
+        if not approval_program or not clear_program:
+            print(f"❌ Failed to compile {spec['label'].lower()}")
+            return None
+
+        app_id = self.create_application(
+            approval_program, clear_program, spec["global_schema"], spec["local_schema"]
+        )
+
+        print(f"✅ {spec['label']} deployed with App ID: {app_id}")
+        return app_id
+
+    def deploy_escrow_contract(self):
+        """Deploy the escrow smart contract"""
+        print("🚀 Deploying Escrow Contract...")
+        return self.deploy_contract("escrow")
+
     def deploy_reputation_contract(self):
         """Deploy the reputation SBT contract"""
         print("🏆 Deploying Reputation SBT Contract...")
-        
-        # Compile programs
-        approval_program = self.compile_pyteal_program(reputation_sbt_contract())
-        clear_program = self.compile_pyteal_program(sbt_clear_program())
-        
-        if not approval_program or not clear_program:
-            print("❌ Failed to compile reputation contract")
-            return None
-        
-        global_schema = StateSchema(num_uints=5, num_byte_slices=5)
-        local_schema = StateSchema(num_uints=10, num_byte_slices=5)
-        
+        return self.deploy_contract("reputation")
+
+    @instrumented("fund_app")
+    def fund_app(self, app_id, amount=1000000):
+        """Send ALGO to an application account"""
+        from algosdk.transaction import PaymentTxn, wait_for_confirmation
+        from algosdk.logic import get_application_address
+
         params = self.algod_client.suggested_params()
-        
-        txn = ApplicationCreateTxn(
+        app_address = get_application_address(app_id)
+        txn = PaymentTxn(
             sender=self.address,
             sp=params,
-            on_complete=OnComplete.NoOpOC,
-            approval_program=approval_program,
-            clear_program=clear_program,
-            global_schema=global_schema,
-            local_schema=local_schema,
+            receiver=app_address,
+            amt=amount,
         )
-        
+
+        # Submit transaction
         signed_txn = txn.sign(self.private_key)
         tx_id = self.algod_client.send_transaction(signed_txn)
-        
-        confirmed_txn = wait_for_confirmation(self.algod_client, tx_id, 4)
-        app_id = confirmed_txn["application-index"]
-        
-        print(f"✅ Reputation SBT Contract deployed with App ID: {app_id}")
-        return app_id
+        wait_for_confirmation(self.algod_client, tx_id, 4)
+        return app_address
 
     def fund_contracts(self, escrow_app_id, sbt_app_id, amount=1000000):
         """Fund contract accounts with ALGO for inner transactions"""
         print("💰 Funding contract accounts...")
-        
-        params = self.algod_client.suggested_params()
-        
+
         # Fund escrow contract
-        escrow_address = get_application_address(escrow_app_id)
-        txn1 = PaymentTxn(
-            sender=self.address,
-            sp=params,
-            receiver=escrow_address,
-            amt=amount,
-        )
-        
-        # Submit transaction
-        signed_txn1 = txn1.sign(self.private_key)
-        tx_id1 = self.algod_client.send_transaction(signed_txn1)
-        wait_for_confirmation(self.algod_client, tx_id1, 4)
-        
+        escrow_address = self.fund_app(escrow_app_id, amount)
+
         print(f"✅ Contracts funded successfully")
         print(f"🔗 Escrow contract address: {escrow_address}")
 
-def main():
-    """Main deployment function"""
+    def backfill_manifest_entry(self, manifest, environment, name):
+        """
+        Fill in missing hashes/schema for a recorded app from the chain
+
+        Raises RuntimeError if the app cannot be read: a partial entry would
+        be diffed as a schema change and the live app replaced.
+        """
+        entry = manifest.get_app(environment, name)
+        if not entry or entry.get("approval_hash"):
+            return entry
+
+        try:
+            params = self.algod_client.application_info(entry["app_id"])["params"]
+        except Exception as e:
+            raise RuntimeError(f"could not read {name} app {entry['app_id']} from chain to backfill "
+                               f"the manifest: {e}") from e
+
+        global_schema = params.get("global-state-schema", {})
+        local_schema = params.get("local-state-schema", {})
+        entry.update({
+            "approval_hash": program_hash(base64.b64decode(params["approval-program"])),
+            "clear_hash": program_hash(base64.b64decode(params["clear-state-program"])),
+            "global_schema": {"num_uints": global_schema.get("num-uint", 0),
+                              "num_byte_slices": global_schema.get("num-byte-slice", 0)},
+            "local_schema": {"num_uints": local_schema.get("num-uint", 0),
+                             "num_byte_slices": local_schema.get("num-byte-slice", 0)},
+        })
+        return entry
+
+    def plan(self, manifest, environment):
+        """
+        Compile every managed contract and diff it against the manifest
+
+        Returns a list of (name, action, approval_program, clear_program)
+        where action is one of create/unchanged/update/recreate.
+        """
+        changes = []
+        for name, spec in CONTRACTS.items():
+            approval_program, clear_program = self.compile_contract(name)
+            if not approval_program or not clear_program:
+                raise RuntimeError(f"Failed to compile {spec['label'].lower()}")
+
+            self.backfill_manifest_entry(manifest, environment, name)
+            action = manifest.diff(
+                environment, name,
+                program_hash(approval_program), program_hash(clear_program),
+                spec["global_schema"], spec["local_schema"],
+            )
+            changes.append((name, action, approval_program, clear_program))
+        return changes
+
+    def apply(self, manifest, environment, changes=None):
+        """
+        Update or create the apps whose bytecode or schema changed
+
+        A changed program is updated in place. Schemas are immutable, so a
+        schema change (or an app that rejects updates) gets a fresh app, the
+        manifest is repointed and the old app's state must be migrated.
+        """
+        from algosdk.logic import get_application_address
+
+        if changes is None:
+            changes = self.plan(manifest, environment)
+
+        applied = {}
+        for name, action, approval_program, clear_program in changes:
+            spec = CONTRACTS[name]
+            entry = manifest.get_app(environment, name)
+            if action == "unchanged":
+                print(f"✅ {spec['label']} unchanged (App ID: {entry['app_id']})")
+                continue
+
+            app_id = None
+            if action == "update":
+                print(f"🔄 Updating {spec['label']}...")
+                app_id = self.update_contract(name, entry["app_id"], approval_program, clear_program)
+                if not app_id:
+                    action = "recreate"
+
+            if not app_id:
+                print(f"🚀 {action.capitalize()} {spec['label']}...")
+                app_id = self.deploy_contract(name, approval_program, clear_program)
+                if not app_id:
+                    print(f"❌ {spec['label']} was not deployed; stopping")
+                    break
+
+                if spec["fund"]:
+                    print("💰 Funding contract account...")
+                    self.fund_app(app_id)
+
+                if entry:
+                    print(f"💡 State of the previous app {entry['app_id']} stays there; replay it with "
+                          f"migrate_state.py capture --env {environment} --from-{name} {entry['app_id']}")
+
+            manifest.record_app(
+                environment, name, app_id, get_application_address(app_id),
+                program_hash(approval_program), program_hash(clear_program),
+                spec["global_schema"], spec["local_schema"],
+            )
+            manifest.environment(environment)["deployer_address"] = self.address
+            # Save after every app so a failure mid-run keeps earlier progress
+            manifest.save()
+            applied[name] = (action, app_id)
+
+        return applied
+
+def print_plan(changes, manifest, environment):
+    """Pretty-print the result of ContractDeployer.plan"""
+    icons = {"create": "🆕", "unchanged": "✅", "update": "🔄", "recreate": "♻️"}
+    for name, action, _, _ in changes:
+        entry = manifest.get_app(environment, name) or {}
+        app_id = entry.get("app_id", "-")
+        print(f"{icons[action]} {CONTRACTS[name]['label']:<26} {action:<10} App ID: {app_id}")
+
+def print_banner(environment):
+    """Print the deployment header"""
     print("=" * 50)
     print("🚀 ELLORA SMART CONTRACT DEPLOYMENT")
-    print("🌐 Network: Algorand Testnet")
+    print(f"🌐 Network: {environment} ({NETWORKS[environment][0]})")
     print("🎯 Target: Bolt.new Hackathon")
     print("=" * 50)
-    
+
+def cmd_status(args):
+    """Show what the manifest records for an environment (no network access)"""
+    manifest = DeploymentManifest()
+    env = manifest.environment(args.env)
+    if not env["apps"]:
+        print(f"📭 Nothing deployed to {args.env} yet")
+        return
+
+    print(f"🌐 {args.env}  👤 Deployer: {env.get('deployer_address', '-')}")
+    for name, entry in env["apps"].items():
+        label = CONTRACTS[name]["label"] if name in CONTRACTS else name
+        approval_hash = (entry.get("approval_hash") or "-")[:12]
+        print(f"📋 {label:<26} App ID: {entry['app_id']:<12} approval: {approval_hash}  "
+              f"updated: {entry.get('updated_at', '-')}")
+
+def cmd_balance(args):
+    """Show the balance of the deployer (or any) account"""
+    address = args.address or DeploymentManifest().environment(args.env).get("deployer_address")
+    if not address:
+        print("❌ No address given and no deployer recorded for this environment")
+        return 1
+
+    try:
+        account_info = create_algod_client(*NETWORKS[args.env]).account_info(address)
+    except Exception as e:
+        print(f"❌ Unable to get account info: {e}")
+        return 1
+
+    balance = account_info.get('amount', 0) / 1000000  # type: ignore
+    print(f"📍 {address}")
+    print(f"💰 Account balance: {balance} ALGO")
+
+def plan_changes(args):
+    """Compile all contracts and show what apply would change"""
+    algod_address, algod_token = NETWORKS[args.env]
+    print_banner(args.env)
+
+    manifest = DeploymentManifest()
+    planner = ContractDeployer(algod_address=algod_address, algod_token=algod_token, read_only=True)
+
+    try:
+        changes = planner.plan(manifest, args.env)
+    except Exception as e:
+        print(f"❌ Planning failed: {e}")
+        return None, manifest
+
+    print_plan(changes, manifest, args.env)
+
+    if all(action == "unchanged" for _, action, _, _ in changes):
+        print("\n✅ Everything is up to date. Nothing to deploy.")
+        return [], manifest
+    return changes, manifest
+
+def cmd_plan(args):
+    """Show the plan without deploying anything"""
+    changes, _ = plan_changes(args)
+    return 1 if changes is None else None
+
+def cmd_apply(args):
+    """Deploy the contracts whose bytecode or schema changed"""
+    algod_address, algod_token = NETWORKS[args.env]
+    changes, manifest = plan_changes(args)
+    if changes is None:
+        return 1
+    if not changes:
+        return
+
     # Get user mnemonic
-    mnemonic_phrase = input("\n🔑 Enter your testnet account mnemonic (or press Enter to generate new): ").strip()
-    
+    mnemonic_phrase = os.environ.get("ELLORA_DEPLOYER_MNEMONIC") or input(
+        "\n🔑 Enter your testnet account mnemonic (or press Enter to generate new): ").strip()
+
     if not mnemonic_phrase:
-        deployer = ContractDeployer()
+        deployer = ContractDeployer(algod_address=algod_address, algod_token=algod_token)
         print("\n⚠️ New account generated. Please fund it and run again.")
         print(f"🔗 Testnet Faucet: https://bank.testnet.algorand.network/")
-        return
+        return 1
     else:
-        deployer = ContractDeployer(mnemonic_phrase=mnemonic_phrase)
-    
+        deployer = ContractDeployer(mnemonic_phrase=mnemonic_phrase,
+                                    algod_address=algod_address, algod_token=algod_token)
+
     # Check account balance
     account_info = deployer.get_account_info()
     if account_info:
         balance = account_info.get('amount', 0) / 1000000  # type: ignore
         print(f"\n📍 Deployer address: {deployer.address}")
         print(f"💰 Account balance: {balance} ALGO")
-        
+
         if balance < 2.0:
             print(f"\n⚠️ Insufficient balance for deployment. Need at least 2 ALGO.")
             print(f"💳 Fund this address: {deployer.address}")
             print(f"🔗 Testnet Faucet: https://bank.testnet.algorand.network/")
-            return
+            return 1
     else:
         print("❌ Unable to get account info. Check network connection.")
-        return
-    
+        return 1
+
     try:
         print(f"\n📜 Starting Contract Deployment...")
-        
-        # Deploy contracts
-        escrow_app_id = deployer.deploy_escrow_contract()
-        if not escrow_app_id:
-            return
-            
-        reputation_app_id = deployer.deploy_reputation_contract()
-        if not reputation_app_id:
-            return
-        
-        # Fund escrow contract for inner transactions
-        deployer.fund_contracts(escrow_app_id, reputation_app_id)
-        
-        # Save deployment info for hackathon submission
-        deployment_info = {
-            "network": "Algorand Testnet",
-            "deployer_address": deployer.address,
-            "escrow_contract_id": escrow_app_id,
-            "reputation_contract_id": reputation_app_id,
-            "escrow_address": get_application_address(escrow_app_id),
-            "reputation_address": get_application_address(reputation_app_id),
-            "deployment_time": str(__import__('datetime').datetime.now())
-        }
-        
+
+        applied = deployer.apply(manifest, args.env, changes)
+        apps = manifest.environment(args.env)["apps"]
+        not_applied = [name for name, action, _, _ in changes
+                       if action != "unchanged" and name not in applied]
+        if not_applied:
+            print("\n❌ DEPLOYMENT INCOMPLETE")
+            for name in not_applied:
+                print(f"   {CONTRACTS[name]['label']} was not applied")
+            print("📄 Contracts applied before the failure are recorded in deployments.json")
+            return 1
+
         print("\n" + "=" * 50)
         print("🎉 DEPLOYMENT SUCCESSFUL! 🎉")
         print("=" * 50)
-        print(f"🔗 Network: Algorand Testnet")
-        print(f"📋 Escrow Contract ID: {escrow_app_id}")
-        print(f"🏆 Reputation Contract ID: {reputation_app_id}")
+        print(f"🔗 Network: {args.env}")
+        for name, entry in apps.items():
+            marker = f" ({applied[name][0]})" if name in applied else ""
+            print(f"📋 {CONTRACTS[name]['label']} ID: {entry['app_id']}{marker}")
         print(f"👤 Deployer: {deployer.address}")
         print("=" * 50)
-        print("\n🚀 Ready for Bolt.new Hackathon Submission!")
         print(f"🔍 View contracts on AlgoExplorer:")
-        print(f"   Escrow: https://testnet.algoexplorer.io/application/{escrow_app_id}")
-        print(f"   Reputation: https://testnet.algoexplorer.io/application/{reputation_app_id}")
-        
-        # Write deployment info to file for frontend integration
-        import json
-        with open('../deployed_contracts.json', 'w') as f:
-            json.dump(deployment_info, f, indent=2)
-        print(f"\n📄 Deployment info saved to deployed_contracts.json")
+        for name, entry in apps.items():
+            print(f"   {name.capitalize()}: https://{args.env}.algoexplorer.io/application/{entry['app_id']}")
+
+        print(f"\n📄 Deployment manifest saved to deployments.json")
         print(f"💡 Update your frontend with these contract IDs!")
-        
+
     except Exception as e:
         print(f"❌ Deployment failed: {e}")
         print("Please check your account balance and network connection.")
+        return 1
+
+def build_parser():
+    """Build the subcommand CLI"""
+    parser = argparse.ArgumentParser(description="Deploy Ellora smart contracts")
+    parser.set_defaults(func=cmd_apply, env="testnet")
+    parser.add_argument("--metrics-file", default=os.environ.get("ELLORA_METRICS_FILE"),
+                        help="write Prometheus metrics to this file on exit")
+    subcommands = parser.add_subparsers(title="commands")
+
+    commands = {
+        "status": (cmd_status, "show deployed apps from the manifest (offline)"),
+        "balance": (cmd_balance, "show the deployer account balance"),
+        "plan": (cmd_plan, "compile contracts and show what would change"),
+        "apply": (cmd_apply, "deploy contracts whose bytecode or schema changed (default)"),
+    }
+    for name, (func, help_text) in commands.items():
+        sub = subcommands.add_parser(name, help=help_text)
+        sub.set_defaults(func=func)
+        sub.add_argument("--env", default="testnet", choices=sorted(NETWORKS),
+                         help="target environment (default: testnet)")
+        if name == "balance":
+            sub.add_argument("--address", help="account to query (default: recorded deployer)")
+    return parser
+
+def main(argv=None):
+    """Main deployment function"""
+    args = build_parser().parse_args(argv)
+    if args.metrics_file:
+        export_on_exit(args.metrics_file)
+    return args.func(args)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
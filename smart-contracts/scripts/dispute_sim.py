@@ -0,0 +1,255 @@
+"""
+Ellora Dispute Resolution Simulator
+
+Monte Carlo model of escrow disputes for sizing the juror count and the
+resolution threshold against time-to-resolution and cost.
+
+Each simulated dispute assigns `jurors` jurors. Every juror either never
+shows up or responds after a log-normally distributed delay (landing on
+the next block), and votes for the side that is actually right with
+probability `accuracy`. Votes are applied in arrival order with the
+contract's rule: vote_dispute resolves as soon as one side has more than
+jurors / 2 votes (integer division), and later votes are rejected. With an
+even juror count a tie, or too many no-shows, leaves the dispute
+unresolved, as it would be on chain.
+
+Thresholds are swept as fractions q, resolving at more than floor(jurors * q)
+votes; q = 0.5 is the contract's strict majority. Fees follow the calls
+involved: raise_dispute, one vote_dispute per counted vote and the inner
+payout on the resolving vote.
+
+All disputes of a batch are simulated at once with NumPy, so millions of
+disputes per configuration take seconds. --verify replays sampled disputes
+on the compiled escrow contract to check the vectorised rule against it.
+
+Usage:
+    python3 dispute_sim.py [--disputes 1000000] [--jurors 3,5,7,9] [--thresholds 0.5,0.66]
+                           [--median-hours 6] [--no-show 0.1] [--accuracy 0.85] [--csv curves.csv]
+    python3 dispute_sim.py --verify 2000
+"""
+
+import argparse
+import csv
+import math
+import sys
+import time
+
+import numpy as np
+
+from juror_selection import DEFAULT_JURORS
+
+MIN_TXN_FEE = 1000
+MICROALGOS_PER_ALGO = 1000000
+BLOCK_SECONDS = 3.3
+BATCH_SIZE = 250000
+
+CONTRACT_THRESHOLD = 0.5
+
+
+def resolution_votes(jurors, threshold=CONTRACT_THRESHOLD):
+    """Votes one side needs: more than floor(jurors * threshold), i.e. jurors // 2 + 1 at 0.5"""
+    return int(math.floor(jurors * threshold)) + 1
+
+
+def sample_disputes(rng, count, jurors, median_seconds, sigma, no_show, accuracy, freelancer_right,
+                    block_seconds=BLOCK_SECONDS):
+    """
+    Draw juror arrival times and votes for `count` disputes
+
+    Returns (arrival seconds sorted per dispute with inf for no-shows,
+    votes for the freelancer in arrival order, whether the freelancer
+    should win).
+    """
+    arrival = rng.lognormal(np.log(median_seconds), sigma, size=(count, jurors))
+    arrival = np.ceil(arrival / block_seconds) * block_seconds
+    arrival[rng.random((count, jurors)) < no_show] = np.inf
+
+    truth = rng.random(count) < freelancer_right
+    correct = rng.random((count, jurors)) < accuracy
+    votes_for = correct == truth[:, None]
+
+    order = np.argsort(arrival, axis=1)
+    return (np.take_along_axis(arrival, order, axis=1),
+            np.take_along_axis(votes_for, order, axis=1),
+            truth)
+
+
+def resolve(arrival, votes_for, needed):
+    """
+    Apply the contract's resolution rule to votes in arrival order
+
+    Returns (resolved, index of the resolving vote, freelancer won, votes
+    counted). No-shows (inf arrival) never vote.
+    """
+    present = np.isfinite(arrival)
+    cast_for = np.cumsum(votes_for & present, axis=1)
+    cast_against = np.cumsum(~votes_for & present, axis=1)
+    decided = (cast_for >= needed) | (cast_against >= needed)
+
+    resolved = decided.any(axis=1)
+    index = decided.argmax(axis=1)
+    rows = np.arange(len(arrival))
+    freelancer_won = resolved & (cast_for[rows, index] >= needed)
+    counted = np.where(resolved, index + 1, present.sum(axis=1))
+    return resolved, index, freelancer_won, counted
+
+
+def simulate(rng, disputes, jurors, threshold, median_seconds, sigma, no_show, accuracy,
+             freelancer_right, juror_reward=0, batch_size=BATCH_SIZE):
+    """Simulate `disputes` disputes for one configuration and summarise them"""
+    needed = resolution_votes(jurors, threshold)
+    latencies = []
+    resolved_total = wrong_total = 0
+    cost_total = 0.0
+    for start in range(0, disputes, batch_size):
+        count = min(batch_size, disputes - start)
+        arrival, votes_for, truth = sample_disputes(rng, count, jurors, median_seconds, sigma,
+                                                    no_show, accuracy, freelancer_right)
+        resolved, index, freelancer_won, counted = resolve(arrival, votes_for, needed)
+
+        latencies.append(arrival[resolved, index[resolved]].astype(np.float32))
+        resolved_total += int(resolved.sum())
+        wrong_total += int((resolved & (freelancer_won != truth)).sum())
+        fees = MIN_TXN_FEE + counted * (MIN_TXN_FEE + juror_reward) + resolved * MIN_TXN_FEE
+        cost_total += float(fees.sum())
+
+    latency = np.concatenate(latencies) if latencies else np.empty(0)
+    p50, p90, p99 = (np.percentile(latency, (50, 90, 99)) if latency.size else (math.nan,) * 3)
+    return {
+        "jurors": jurors,
+        "threshold": threshold,
+        "votes_needed": needed,
+        "disputes": disputes,
+        "resolved": resolved_total / disputes,
+        "wrong": wrong_total / resolved_total if resolved_total else math.nan,
+        "p50_seconds": float(p50),
+        "p90_seconds": float(p90),
+        "p99_seconds": float(p99),
+        "mean_cost_microalgos": cost_total / disputes,
+    }
+
+
+def verify_against_contract(samples, seed, no_show, accuracy):
+    """
+    Replay sampled disputes on the compiled escrow contract
+
+    The contract assigns DEFAULT_JURORS jurors, so that is the juror count
+    checked. Returns the number of disputes whose outcome (resolved, after
+    which vote, for which side) differs from resolve().
+    """
+    from fuzz_escrow import compile_escrow
+    from teal_evaluator import Ledger, Txn, TealError, app_address
+
+    jurors = DEFAULT_JURORS
+    client, freelancer, deployer = (bytes([i]) * 32 for i in (1, 2, 3))
+    juror_keys = [bytes([10 + i]) * 32 for i in range(jurors)]
+    amount = 5000000
+
+    ledger = Ledger()
+    for account in [client, freelancer, deployer] + juror_keys:
+        ledger.fund(account, 10 ** 12)
+    approval, clear = compile_escrow()
+    create = Txn(deployer, approval_program=approval, clear_program=clear,
+                 global_schema=(10, 10), local_schema=(5, 5))
+    ledger.submit([create])
+    app_id = create.created_app_id
+    i2b = lambda n: n.to_bytes(8, "big")
+    ledger.submit([Txn(deployer, "pay", receiver=app_address(app_id), amount=1000000)])
+    ledger.submit([Txn(client, app_id=app_id, app_args=[b"create_job", i2b(amount), i2b(2 ** 40)]),
+                   Txn(client, "pay", receiver=app_address(app_id), amount=amount)])
+    ledger.submit([Txn(freelancer, app_id=app_id, app_args=[b"accept_job"])])
+    ledger.submit([Txn(client, app_id=app_id, app_args=[b"raise_dispute"])])
+
+    rng = np.random.default_rng(seed)
+    arrival, votes_for, truth = sample_disputes(rng, samples, jurors, 3600.0, 1.0, no_show, accuracy, 0.5)
+    resolved, index, freelancer_won, _ = resolve(arrival, votes_for, resolution_votes(jurors))
+
+    mismatches = 0
+    for n in range(samples):
+        mark = ledger.checkpoint()
+        balance = ledger.balance(freelancer)
+        resolved_at = None
+        for position in range(jurors):
+            if not np.isfinite(arrival[n, position]):
+                break
+            try:
+                ledger.submit([Txn(juror_keys[position], app_id=app_id,
+                                   app_args=[b"vote_dispute", i2b(int(votes_for[n, position]))],
+                                   accounts=[client, freelancer])])
+            except TealError:
+                break
+            if resolved_at is None and ledger.global_state(app_id)[b"status"] == 4:
+                resolved_at = position
+        paid_freelancer = ledger.balance(freelancer) > balance
+        ledger.revert(mark)
+
+        expected = (bool(resolved[n]), int(index[n]) if resolved[n] else None, bool(freelancer_won[n]))
+        if (resolved_at is not None, resolved_at, paid_freelancer) != expected:
+            mismatches += 1
+    return mismatches
+
+
+def parse_list(value, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo sizing of dispute juror counts")
+    parser.add_argument("--disputes", type=int, default=1000000, help="disputes per configuration")
+    parser.add_argument("--jurors", default="3,5,7,9", help="comma separated juror counts")
+    parser.add_argument("--thresholds", default="0.5",
+                        help="comma separated fractions; resolve at more than jurors * q votes (0.5 = contract)")
+    parser.add_argument("--median-hours", type=float, default=6.0, help="median juror response time")
+    parser.add_argument("--sigma", type=float, default=1.0, help="log-normal spread of response times")
+    parser.add_argument("--no-show", type=float, default=0.1, help="probability a juror never votes")
+    parser.add_argument("--accuracy", type=float, default=0.85, help="probability a vote backs the right side")
+    parser.add_argument("--freelancer-right", type=float, default=0.5,
+                        help="share of disputes the freelancer should win")
+    parser.add_argument("--juror-reward", type=int, default=0, help="microAlgos paid per counted vote")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--csv", help="write the latency/cost curves to this CSV file")
+    parser.add_argument("--verify", type=int, metavar="N",
+                        help="replay N sampled disputes on the escrow contract instead of sweeping")
+    args = parser.parse_args()
+
+    if args.verify:
+        started = time.perf_counter()
+        mismatches = verify_against_contract(args.verify, args.seed, args.no_show, args.accuracy)
+        print(f"🔍 {args.verify} disputes replayed on the contract in {time.perf_counter() - started:.1f}s")
+        if mismatches:
+            print(f"❌ {mismatches} outcome(s) differ from the simulator")
+            return 1
+        print("✅ Simulator matches vote_dispute")
+        return 0
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    started = time.perf_counter()
+    print(f"{'jurors':>6} {'need':>4} {'resolved':>9} {'wrong':>7} {'p50 h':>7} {'p90 h':>7} "
+          f"{'p99 h':>7} {'ALGO':>8}")
+    for jurors in parse_list(args.jurors, int):
+        for threshold in parse_list(args.thresholds, float):
+            result = simulate(rng, args.disputes, jurors, threshold, args.median_hours * 3600,
+                              args.sigma, args.no_show, args.accuracy, args.freelancer_right,
+                              args.juror_reward)
+            results.append(result)
+            print(f"{jurors:>6} {result['votes_needed']:>4} {result['resolved']:>9.2%} "
+                  f"{result['wrong']:>7.2%} {result['p50_seconds'] / 3600:>7.2f} "
+                  f"{result['p90_seconds'] / 3600:>7.2f} {result['p99_seconds'] / 3600:>7.2f} "
+                  f"{result['mean_cost_microalgos'] / MICROALGOS_PER_ALGO:>8.4f}")
+
+    seconds = time.perf_counter() - started
+    total = args.disputes * len(results)
+    print(f"\n⚡ {total:,} disputes in {seconds:.1f}s ({total / seconds:,.0f}/s)")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"📄 Curves written to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+"""
+Ellora Escrow Job Tooling
+
+Creates escrow jobs (optionally split into milestones, optionally paid in
+an ASA such as USDC) and drives the payout calls.
+
+A milestone job is created with a single atomic group:
+
+    [optional app funding payment] -> create_job(amount, deadline, milestones) -> deposit
+
+so every milestone of a long job lives in one escrow app and is funded in
+one confirmation, instead of one app (deploy + fund + create) per payment.
+
+Asset opt-ins and payouts are batched across many escrow apps: calls are
+packed into groups of up to 16 transactions, every group is sent before
+any confirmation is awaited, and one flat fee on each call covers its inner
+transaction through fee pooling.
+
+Escrow apps linked to the reputation SBT app (link-sbt) settle atomically:
+the payout call that resolves a job is grouped with the client's mint_sbt
+call for the freelancer, so the payment and the SBT confirm in the same
+round or not at all.
+
+Usage:
+    python3 escrow_jobs.py create  --app-id 742004772 --milestones 1.5,2,2.5 [--asset 10458941]
+    python3 escrow_jobs.py submit  --app-id 742004772 --index 0
+    python3 escrow_jobs.py approve --app-id 742004772 --index 0 [--rating 5]
+    python3 escrow_jobs.py link-sbt --app-ids 742004772,742004790 --sbt-app-id 742004783
+    python3 escrow_jobs.py opt-in  --app-ids 742004772,742004790 --asset 10458941
+    python3 escrow_jobs.py payout  --app-ids 742004772,742004790 [--rating 5]
+    python3 escrow_jobs.py show    --app-id 742004772
+"""
+
+import os
+import sys
+import argparse
+import time
+
+from metrics import export_on_exit, instrumented
+from app_state import (
+    MILESTONE_PENDING, MILESTONE_SUBMITTED, MILESTONE_RELEASED, STATUS_NAMES, ZERO_ADDRESS,
+    history_box_name, pack_milestones,
+)
+
+MICROALGOS_PER_ALGO = 1000000
+MIN_TXN_FEE = 1000
+MAX_GROUP_SIZE = 16
+
+# Minimum balance increase of an app account for holding one ASA
+ASSET_OPT_IN_FUNDING = 100000
+
+MILESTONE_STATUS_NAMES = {
+    MILESTONE_PENDING: "pending",
+    MILESTONE_SUBMITTED: "submitted",
+    MILESTONE_RELEASED: "released",
+}
+
+
+def to_base_units(amount, decimals=6):
+    """Convert a decimal amount to base units (microAlgos for ALGO)"""
+    return int(round(float(amount) * 10 ** decimals))
+
+
+def asset_decimals(algod_client, asset_id):
+    """Decimals of an ASA, or 6 (microAlgos) for ALGO"""
+    if not asset_id:
+        return 6
+    return algod_client.asset_info(asset_id)["params"].get("decimals", 0)
+
+
+def with_flat_fee(params, fee):
+    """Copy of suggested params with a fixed fee (for pooled inner fees)"""
+    from algosdk.transaction import SuggestedParams
+
+    return SuggestedParams(fee=fee, first=params.first, last=params.last, gh=params.gh,
+                           gen=params.gen, flat_fee=True, min_fee=params.min_fee)
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most `size` items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def build_create_job_group(params, sender, app_id, amounts, deadline, asset_id=0, fund_app=0):
+    """
+    Build the grouped transactions that create a (milestone) job
+
+    `amounts` are milestone amounts in base units; a single amount creates a
+    plain single-payout job. With `asset_id` the deposit is an asset
+    transfer (the app must have been opted in with opt_in_asset).
+    `fund_app` prepends a payment covering the escrow app's minimum balance.
+    Returns the transactions with a group ID assigned, ready to sign.
+    """
+    from algosdk.transaction import ApplicationNoOpTxn, AssetTransferTxn, PaymentTxn, assign_group_id
+    from algosdk.logic import get_application_address
+
+    app_address = get_application_address(app_id)
+    total = sum(amounts)
+    app_args = [b"create_job", total.to_bytes(8, "big"), deadline.to_bytes(8, "big")]
+    if len(amounts) > 1:
+        app_args.append(pack_milestones(amounts))
+
+    group = []
+    if fund_app:
+        group.append(PaymentTxn(sender=sender, sp=params, receiver=app_address, amt=fund_app))
+    group.append(ApplicationNoOpTxn(sender=sender, sp=params, index=app_id, app_args=app_args))
+    if asset_id:
+        group.append(AssetTransferTxn(sender=sender, sp=params, receiver=app_address, amt=total,
+                                      index=asset_id))
+    else:
+        group.append(PaymentTxn(sender=sender, sp=params, receiver=app_address, amt=total))
+    return assign_group_id(group)
+
+
+def build_payout_call(params, sender, job, method, index=None):
+    """
+    Build a call that makes the escrow pay out (approve_completion/approve_milestone)
+
+    The job's parties and asset are passed as references so the inner
+    payment or asset transfer can reach them. The fee covers the inner
+    transaction too.
+    """
+    from algosdk.encoding import encode_address
+    from algosdk.transaction import ApplicationNoOpTxn
+
+    app_args = [method.encode()]
+    if index is not None:
+        app_args.append(index.to_bytes(8, "big"))
+    accounts = [encode_address(job[party]) for party in ("freelancer", "client")
+                if job[party] != ZERO_ADDRESS]
+    return ApplicationNoOpTxn(sender=sender, sp=with_flat_fee(params, 2 * MIN_TXN_FEE), index=job["app_id"],
+                              app_args=app_args, accounts=accounts,
+                              foreign_assets=[job["asset"]] if job["asset"] else None)
+
+
+def settles_job(job, method, index=None):
+    """Whether a payout call resolves the job (and so must mint the SBT)"""
+    if method == "approve_completion":
+        return True
+    return all(status == MILESTONE_RELEASED
+               for i, (_, status) in enumerate(job["milestones"]) if i != index)
+
+
+def build_settlement_call(params, sender, job, rating):
+    """
+    Build the mint_sbt call that follows a settling payout in its group
+
+    The escrow app is referenced so the SBT app can check that it was
+    created by the platform and resolved; the freelancer's history box is
+    referenced whether or not it exists.
+    """
+    from algosdk.encoding import encode_address
+    from algosdk.transaction import ApplicationNoOpTxn
+
+    return ApplicationNoOpTxn(sender=sender, sp=params, index=job["sbt_app"],
+                              app_args=[b"mint_sbt", rating.to_bytes(8, "big")],
+                              accounts=[encode_address(job["freelancer"])],
+                              foreign_apps=[job["app_id"]],
+                              boxes=[(0, history_box_name(job["freelancer"]))])
+
+
+def build_payout_txns(params, sender, job, method, index=None, rating=5):
+    """Payout call, followed by the SBT mint when it settles a linked job"""
+    txns = [build_payout_call(params, sender, job, method, index)]
+    if job["sbt_app"] and settles_job(job, method, index):
+        txns.append(build_settlement_call(params, sender, job, rating))
+    return txns
+
+
+def build_link_sbt_groups(params, sender, app_ids, sbt_app_id):
+    """Build groups that link many escrow apps to the reputation SBT app (creator)"""
+    from algosdk.transaction import ApplicationNoOpTxn, assign_group_id
+
+    txns = [ApplicationNoOpTxn(sender=sender, sp=params, index=app_id, app_args=[b"link_sbt"],
+                               foreign_apps=[sbt_app_id])
+            for app_id in app_ids]
+    return [assign_group_id(group) if len(group) > 1 else group
+            for group in chunked(txns, MAX_GROUP_SIZE)]
+
+
+def build_opt_in_groups(params, sender, app_ids, asset_id, fund=ASSET_OPT_IN_FUNDING):
+    """
+    Build groups that opt many escrow apps in to one asset
+
+    Each app gets [funding payment for the extra minimum balance,
+    opt_in_asset call paying the inner fee], so one group covers 8 apps.
+    """
+    from algosdk.transaction import ApplicationNoOpTxn, PaymentTxn, assign_group_id
+    from algosdk.logic import get_application_address
+
+    call_params = with_flat_fee(params, 2 * MIN_TXN_FEE)
+    txns = []
+    for app_id in app_ids:
+        if fund:
+            txns.append(PaymentTxn(sender=sender, sp=params, receiver=get_application_address(app_id),
+                                   amt=fund))
+        txns.append(ApplicationNoOpTxn(sender=sender, sp=call_params, index=app_id,
+                                       app_args=[b"opt_in_asset"], foreign_assets=[asset_id]))
+
+    per_group = MAX_GROUP_SIZE - MAX_GROUP_SIZE % (2 if fund else 1)
+    return [assign_group_id(group) for group in chunked(txns, per_group)]
+
+
+def build_payout_groups(params, sender, calls, rating=5):
+    """
+    Batch payout calls across jobs into groups
+
+    `calls` are (job, method, milestone index or None) tuples. Groups are
+    not required for atomicity across jobs; they let up to 16 transactions
+    share one submission and confirmation. A payout and its SBT mint are
+    never split across groups.
+    """
+    from algosdk.transaction import assign_group_id
+
+    groups = [[]]
+    for job, method, index in calls:
+        txns = build_payout_txns(params, sender, job, method, index, rating)
+        if len(groups[-1]) + len(txns) > MAX_GROUP_SIZE:
+            groups.append([])
+        groups[-1].extend(txns)
+    return [assign_group_id(group) if len(group) > 1 else group for group in groups if group]
+
+
+@instrumented("submit_groups")
+def submit_groups(algod_client, private_key, groups, wait_rounds=4):
+    """
+    Sign and send every group, then wait for all of them
+
+    Sending all groups before waiting lets them confirm in the same rounds
+    instead of paying one confirmation latency per group.
+    """
+    from algosdk.transaction import wait_for_confirmation
+
+    tx_ids = [algod_client.send_transactions([txn.sign(private_key) for txn in group])
+              for group in groups]
+    return [wait_for_confirmation(algod_client, tx_id, wait_rounds) for tx_id in tx_ids]
+
+
+def load_account():
+    """Private key and address of the acting account"""
+    from algosdk import account, mnemonic
+
+    phrase = os.environ.get("ELLORA_ACCOUNT_MNEMONIC") or input("🔑 Enter account mnemonic: ").strip()
+    private_key = mnemonic.to_private_key(phrase)
+    return private_key, account.address_from_private_key(private_key)
+
+
+def parse_app_ids(value):
+    return [int(app_id) for app_id in value.split(",") if app_id.strip()]
+
+
+def cmd_create(args, client):
+    decimals = asset_decimals(client, args.asset)
+    amounts = [to_base_units(a, decimals) for a in args.milestones.split(",")]
+    private_key, sender = load_account()
+    deadline = int(time.time()) + args.deadline_days * 86400
+    group = build_create_job_group(client.suggested_params(), sender, args.app_id, amounts, deadline,
+                                   asset_id=args.asset,
+                                   fund_app=to_base_units(args.fund) if args.fund else 0)
+
+    unit = f"of asset {args.asset}" if args.asset else "ALGO"
+    print(f"📦 Creating job on escrow {args.app_id}: {len(amounts)} milestone(s), "
+          f"{sum(amounts) / 10 ** decimals} {unit} in one group of {len(group)} transactions")
+    result = submit_groups(client, private_key, [group])[0]
+    print(f"✅ Confirmed in round {result.get('confirmed-round')}")
+
+
+def cmd_submit(args, client):
+    from algosdk.transaction import ApplicationNoOpTxn
+
+    private_key, sender = load_account()
+    txn = ApplicationNoOpTxn(sender=sender, sp=client.suggested_params(), index=args.app_id,
+                             app_args=[b"submit_milestone", args.index.to_bytes(8, "big")])
+    result = submit_groups(client, private_key, [[txn]])[0]
+    print(f"✅ submit_milestone #{args.index} confirmed in round {result.get('confirmed-round')}")
+
+
+def cmd_approve(args, client):
+    from app_state import read_escrow_job
+
+    private_key, sender = load_account()
+    job = read_escrow_job(client, args.app_id)
+    groups = build_payout_groups(client.suggested_params(), sender, [(job, "approve_milestone", args.index)],
+                                 rating=args.rating)
+    result = submit_groups(client, private_key, groups)[0]
+    minted = " with SBT mint" if len(groups[0]) > 1 else ""
+    print(f"✅ approve_milestone #{args.index}{minted} confirmed in round {result.get('confirmed-round')}")
+
+
+def cmd_link_sbt(args, client):
+    private_key, sender = load_account()
+    app_ids = parse_app_ids(args.app_ids)
+    groups = build_link_sbt_groups(client.suggested_params(), sender, app_ids, args.sbt_app_id)
+    print(f"🔗 Linking {len(app_ids)} escrow app(s) to SBT app {args.sbt_app_id} in {len(groups)} group(s)")
+    results = submit_groups(client, private_key, groups)
+    print(f"✅ Confirmed in round(s) {sorted({r.get('confirmed-round') for r in results})}")
+
+
+def cmd_opt_in(args, client):
+    private_key, sender = load_account()
+    app_ids = parse_app_ids(args.app_ids)
+    groups = build_opt_in_groups(client.suggested_params(), sender, app_ids, args.asset,
+                                 fund=0 if args.no_fund else ASSET_OPT_IN_FUNDING)
+    print(f"🪙 Opting {len(app_ids)} escrow app(s) in to asset {args.asset} in {len(groups)} group(s)")
+    results = submit_groups(client, private_key, groups)
+    print(f"✅ Confirmed in round(s) {sorted({r.get('confirmed-round') for r in results})}")
+
+
+def cmd_payout(args, client):
+    from app_state import read_escrow_job
+
+    private_key, sender = load_account()
+    jobs = [read_escrow_job(client, app_id) for app_id in parse_app_ids(args.app_ids)]
+    groups = build_payout_groups(client.suggested_params(), sender,
+                                 [(job, "approve_completion", None) for job in jobs], rating=args.rating)
+    print(f"💸 Approving {len(jobs)} job(s) in {len(groups)} group(s)")
+    results = submit_groups(client, private_key, groups)
+    print(f"✅ Confirmed in round(s) {sorted({r.get('confirmed-round') for r in results})}")
+
+
+def cmd_show(args, client):
+    from app_state import read_escrow_job
+
+    job = read_escrow_job(client, args.app_id)
+    decimals = asset_decimals(client, job["asset"])
+    unit = f"of asset {job['asset']}" if job["asset"] else "ALGO"
+    print(f"📋 Escrow {args.app_id}: {STATUS_NAMES.get(job['status'], job['status'])}, "
+          f"{job['amount'] / 10 ** decimals} {unit}, released {job['released'] / 10 ** decimals}")
+    for index, (amount, status) in enumerate(job["milestones"]):
+        print(f"   #{index:<2} {amount / 10 ** decimals:>12}  {MILESTONE_STATUS_NAMES.get(status, status)}")
+
+
+def main(argv=None):
+    from deploy_contracts_fixed import NETWORKS, create_algod_client
+
+    parser = argparse.ArgumentParser(description="Create and settle Ellora escrow jobs")
+    parser.add_argument("--env", default="testnet", choices=sorted(NETWORKS))
+    parser.add_argument("--metrics-file", default=os.environ.get("ELLORA_METRICS_FILE"),
+                        help="write Prometheus metrics to this file on exit")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    create = subcommands.add_parser("create", help="create a job with its milestones in one group")
+    create.add_argument("--app-id", type=int, required=True)
+    create.add_argument("--milestones", required=True, help="comma separated amounts (ALGO or asset units)")
+    create.add_argument("--asset", type=int, default=0, help="ASA to escrow instead of ALGO")
+    create.add_argument("--deadline-days", type=int, default=30)
+    create.add_argument("--fund", help="also fund the escrow app with this many ALGO")
+    create.set_defaults(func=cmd_create)
+
+    for name, func, help_text in (("submit", cmd_submit, "mark a milestone as delivered (freelancer)"),
+                                  ("approve", cmd_approve, "approve and release a milestone (client)")):
+        sub = subcommands.add_parser(name, help=help_text)
+        sub.add_argument("--app-id", type=int, required=True)
+        sub.add_argument("--index", type=int, required=True)
+        if name == "approve":
+            sub.add_argument("--rating", type=int, default=5, choices=range(1, 6),
+                             help="freelancer rating minted with the last milestone of SBT-linked jobs")
+        sub.set_defaults(func=func)
+
+    link_sbt = subcommands.add_parser("link-sbt", help="settle jobs atomically with SBT mints (creator, batched)")
+    link_sbt.add_argument("--app-ids", required=True, help="comma separated escrow app IDs")
+    link_sbt.add_argument("--sbt-app-id", type=int, required=True)
+    link_sbt.set_defaults(func=cmd_link_sbt)
+
+    opt_in = subcommands.add_parser("opt-in", help="opt escrow apps in to an asset (creator, batched)")
+    opt_in.add_argument("--app-ids", required=True, help="comma separated escrow app IDs")
+    opt_in.add_argument("--asset", type=int, required=True)
+    opt_in.add_argument("--no-fund", action="store_true", help="apps already hold the extra min balance")
+    opt_in.set_defaults(func=cmd_opt_in)
+
+    payout = subcommands.add_parser("payout", help="approve completion of many jobs (client, batched)")
+    payout.add_argument("--app-ids", required=True, help="comma separated escrow app IDs")
+    payout.add_argument("--rating", type=int, default=5, choices=range(1, 6),
+                        help="freelancer rating minted for SBT-linked jobs")
+    payout.set_defaults(func=cmd_payout)
+
+    show = subcommands.add_parser("show", help="show a job and its milestones")
+    show.add_argument("--app-id", type=int, required=True)
+    show.set_defaults(func=cmd_show)
+
+    args = parser.parse_args(argv)
+    if args.metrics_file:
+        export_on_exit(args.metrics_file)
+    return args.func(args, create_algod_client(*NETWORKS[args.env]))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,771 @@
+"""
+Ellora Escrow Fuzzer
+
+Property-based fuzzing of the escrow state machine
+(CREATED -> IN_PROGRESS -> COMPLETED/DISPUTED -> RESOLVED), including
+jobs split into milestones that are released one at a time, jobs
+escrowed in an ASA after the app's one-time asset opt-in, jobs moved
+between apps with import_job/export_job, and jobs linked to the reputation
+SBT app (link_sbt) whose settling payout is grouped with its mint_sbt.
+
+Random sequences of method calls, senders, arguments and OnComplete values
+are run against the compiled approval program on the in-process TEAL
+evaluator, and after every step the harness checks:
+
+- funds are conserved (every microAlgo and asset unit is accounted for,
+  fees included)
+- the escrow never pays out more than was escrowed: milestone releases pay
+  exactly the milestone, settlement pays exactly what is left, and only to
+  the recorded client or freelancer
+- nothing changes once a job is RESOLVED
+- status only moves along the allowed transitions
+- only the right party can complete, submit, approve, dispute or vote
+- dispute votes never exceed the juror count
+- payouts and deposits use the job's currency and the app stays solvent
+  in it; the app cannot be deleted while it holds a job
+- only the creator can update the code, and an update changes no state
+- a job is only imported, funds included, from an export of the live job
+  by an app of the same creator, and only exported (all unreleased funds,
+  resolving the job) to such an import
+- a settlement of a linked job mints exactly one SBT, for its freelancer,
+  in the same group; nothing else the client or jurors send mints
+
+The AVM is deterministic, so each (escrow state, call) pair is executed once
+and its outcome cached; sequences then replay cached transitions, which is
+what lets the harness run thousands of sequences per second.
+
+Usage:
+    python3 fuzz_escrow.py [--sequences 100000] [--max-length 16] [--seed 1]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from app_state import (
+    as_uint, escrow_import_args, escrow_job_from_state, history_box_name, pack_milestones, unpack_milestones,
+    MILESTONE_SUBMITTED,
+    STATUS_CREATED, STATUS_IN_PROGRESS, STATUS_COMPLETED, STATUS_DISPUTED, STATUS_RESOLVED, STATUS_NAMES,
+)
+from teal_evaluator import (
+    Ledger, Program, Txn, TealError, app_address, MIN_TXN_FEE, NOOP, OPT_IN, CLOSE_OUT, UPDATE_APPLICATION,
+    DELETE_APPLICATION,
+)
+
+CONTRACTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'contracts')
+
+# Actors: 0 deploys the app, 1 is the client, 2 the freelancer, the rest are
+# jurors/strangers. Roles are only conventions; any actor may call anything.
+ACTOR_NAMES = ["deployer", "client", "freelancer", "juror_a", "juror_b", "juror_c", "stranger"]
+ACTORS = [bytes([i + 1]) * 32 for i in range(len(ACTOR_NAMES))]
+CLIENT, FREELANCER = 1, 2
+
+ACTOR_FUNDS = 10 ** 15
+ASSET_FUNDS = 10 ** 12
+APP_FUNDING = 1000000
+JOB_AMOUNT = 5000000
+DEADLINE = 1800000000
+
+METHODS = ["create_job", "accept_job", "complete_job", "approve_completion",
+           "raise_dispute", "vote_dispute", "submit_milestone", "approve_milestone",
+           "opt_in_asset", "import_job", "export_job", "update", "link_sbt", "unknown", "payment"]
+MILESTONE_METHODS = ("submit_milestone", "approve_milestone")
+SETTLEMENT_METHODS = ("approve_completion", "approve_milestone")
+
+# mint_sbt calls grouped after a payout call: none, one for the job's
+# freelancer, one for its client, or two for the freelancer
+MINT_NONE, MINT_FREELANCER, MINT_CLIENT, MINT_TWICE = range(4)
+MINT_VARIANTS = [MINT_NONE, MINT_FREELANCER, MINT_FREELANCER, MINT_CLIENT, MINT_TWICE]
+
+# import_job replays the source app's job and is grouped with its export,
+# as migrate_state sends it: the live job, or a snapshot taken before a
+# milestone was released. export_job goes to an app of the same creator
+# after an import of the live job, of a tampered copy, or with no import at
+# all, or after a live import to one created by a stranger or the app itself.
+IMPORT_LIVE, IMPORT_STALE, IMPORT_TAMPERED, IMPORT_NONE = range(4)
+EXPORT_TARGETS = {"twin": [IMPORT_LIVE, IMPORT_LIVE, IMPORT_TAMPERED, IMPORT_NONE],
+                  "rogue": [IMPORT_LIVE], "self": [IMPORT_LIVE]}
+
+# Milestone splits for create_job; the last one does not add up to the amount
+MILESTONE_SPLITS = [None, (2000000, 3000000), (1000000, 1000000, 3000000), (1000000, 1000000)]
+PACKED_SPLITS = {split: pack_milestones(split) for split in MILESTONE_SPLITS if split}
+
+# Payment variants accompanying create_job
+PAY_EXACT, PAY_SHORT, PAY_NONE, PAY_ELSEWHERE = range(4)
+
+ON_COMPLETIONS = [NOOP] * 16 + [OPT_IN, CLOSE_OUT, UPDATE_APPLICATION, DELETE_APPLICATION]
+
+ALLOWED_TRANSITIONS = {
+    (STATUS_CREATED, STATUS_CREATED),
+    (STATUS_CREATED, STATUS_IN_PROGRESS),
+    (STATUS_IN_PROGRESS, STATUS_IN_PROGRESS),
+    (STATUS_IN_PROGRESS, STATUS_COMPLETED),
+    (STATUS_IN_PROGRESS, STATUS_DISPUTED),
+    (STATUS_IN_PROGRESS, STATUS_RESOLVED),  # Last milestone released
+    (STATUS_COMPLETED, STATUS_COMPLETED),
+    (STATUS_COMPLETED, STATUS_DISPUTED),
+    (STATUS_COMPLETED, STATUS_RESOLVED),
+    (STATUS_DISPUTED, STATUS_DISPUTED),
+    (STATUS_DISPUTED, STATUS_RESOLVED),
+    (STATUS_RESOLVED, STATUS_RESOLVED),
+}
+
+
+def compile_escrow(version=8):
+    """Compile the escrow approval/clear programs to TEAL source"""
+    from pyteal import compileTeal, Mode
+
+    if CONTRACTS_DIR not in sys.path:
+        sys.path.append(CONTRACTS_DIR)
+    from escrow_contract import escrow_contract, clear_state_program  # type: ignore
+
+    return (compileTeal(escrow_contract(), Mode.Application, version=version),
+            compileTeal(clear_state_program(), Mode.Application, version=version))
+
+
+def compile_reputation(version=8):
+    """Compile the reputation SBT approval/clear programs to TEAL source"""
+    from pyteal import compileTeal, Mode
+
+    if CONTRACTS_DIR not in sys.path:
+        sys.path.append(CONTRACTS_DIR)
+    from reputation_sbt import reputation_sbt_contract, clear_state_program  # type: ignore
+
+    return (compileTeal(reputation_sbt_contract(), Mode.Application, version=version),
+            compileTeal(clear_state_program(), Mode.Application, version=version))
+
+
+# Arguments drawn for each method; duplicates make a value more likely
+METHOD_ARGS = {
+    "create_job": [(amount, pay, split, in_asset)
+                   for amount in (0, JOB_AMOUNT)
+                   for pay in (PAY_EXACT, PAY_EXACT, PAY_SHORT, PAY_NONE, PAY_ELSEWHERE)
+                   for split in MILESTONE_SPLITS
+                   for in_asset in (False, True)],
+    "approve_completion": MINT_VARIANTS,
+    "vote_dispute": [0, 1],
+    "submit_milestone": [0, 0, 1, 1, 2, 3],  # Index 3 is beyond every split
+    "approve_milestone": [(index, mint) for index in (0, 0, 1, 1, 2, 3) for mint in MINT_VARIANTS],
+    "import_job": [IMPORT_LIVE, IMPORT_LIVE, IMPORT_STALE],
+    "export_job": [(target, variant) for target, variants in EXPORT_TARGETS.items() for variant in variants],
+}
+
+# update is a bare UpdateApplication call. Import and export groups keep to
+# NoOp: the other methods already cover OnCompletion dispatch, and an export
+# group's import into ourselves would change our state under any of them
+METHOD_ON_COMPLETIONS = {"update": [UPDATE_APPLICATION], "import_job": [NOOP], "export_job": [NOOP]}
+
+# Senders are biased towards the roles that make progress possible
+BIASED_ACTORS = {
+    "create_job": CLIENT, "approve_completion": CLIENT, "approve_milestone": CLIENT,
+    "accept_job": FREELANCER, "complete_job": FREELANCER, "submit_milestone": FREELANCER,
+    "opt_in_asset": 0, "import_job": 0, "export_job": 0, "update": 0, "link_sbt": 0,
+}
+
+
+def enumerate_steps():
+    """
+    Enumerate every distinct call the fuzzer can make
+
+    Returns (steps, tables): steps is a list of (actor, method, arg,
+    on_completion) tuples, and tables maps each method to a list of indices
+    into steps in which each call appears as often as it should be drawn.
+    Sequences are lists of these indices, so the oracle cache is keyed on
+    small ints instead of nested tuples.
+    """
+    steps, index, tables = [], {}, {}
+    for method in METHODS:
+        actors = list(range(len(ACTORS)))
+        if method in BIASED_ACTORS:
+            actors += [BIASED_ACTORS[method]] * 2 * len(ACTORS)
+        table = tables[method] = []
+        for actor in actors:
+            for arg in METHOD_ARGS.get(method, [None]):
+                for on_completion in METHOD_ON_COMPLETIONS.get(method, ON_COMPLETIONS):
+                    step = (actor, method, arg, on_completion)
+                    if step not in index:
+                        index[step] = len(steps)
+                        steps.append(step)
+                    table.append(index[step])
+    return steps, tables
+
+
+STEPS, STEP_TABLES = enumerate_steps()
+PAYMENT_TABLE = STEP_TABLES["payment"]
+
+
+def describe_step(step):
+    actor, method, arg, on_completion = STEPS[step]
+    extra = ""
+    if method == "create_job":
+        extra = f"(amount={arg[0]}, payment={['exact', 'short', 'none', 'elsewhere'][arg[1]]}"
+        extra += f", milestones={list(arg[2])}" if arg[2] else ""
+        extra += ", in asset)" if arg[3] else ")"
+    elif method == "vote_dispute":
+        extra = f"(for_freelancer={arg})"
+    elif method == "submit_milestone":
+        extra = f"(index={arg})"
+    elif method in SETTLEMENT_METHODS:
+        index, mint = arg if method == "approve_milestone" else (None, arg)
+        extra = "" if index is None else f"index={index}, "
+        extra = f"({extra}mint={['none', 'freelancer', 'client', 'twice'][mint]})"
+    elif method == "import_job":
+        extra = f"({['live', 'stale'][arg]} source)"
+    elif method == "export_job":
+        extra = f"(to {arg[0]}, import={['live', 'stale', 'tampered', 'none'][arg[1]]})"
+    oc = "" if on_completion == NOOP else f" [OnComplete={on_completion}]"
+    return f"{ACTOR_NAMES[actor]}.{method}{extra}{oc}"
+
+
+class EscrowOracle:
+    """
+    Executes single escrow calls on the TEAL evaluator from an abstract state
+
+    An abstract state is (sorted global state items, app balance, app exists,
+    app asset holding or None when the app is not opted in). Each distinct
+    state is interned to an int id and decoded once into a view for the
+    invariant checks. Outcomes are memoised per (state id, step index)
+    because the evaluator is deterministic for a given state and call.
+
+    The reputation SBT app is not part of the abstract state: every call
+    starts from its initial state, and only the SBTs a call mints are
+    reported.
+    """
+
+    def __init__(self, approval_teal, clear_teal, sbt_approval_teal, sbt_clear_teal):
+        # Assembled once: every UpdateApplication step re-installs them
+        self.programs = (Program(approval_teal), Program(clear_teal))
+        self.ledger = Ledger()
+        for actor in ACTORS:
+            self.ledger.fund(actor, ACTOR_FUNDS)
+
+        deployer = ACTORS[0]
+        self.asset_id = self.ledger.create_asset(deployer, total=ASSET_FUNDS * len(ACTORS), unit_name="USDC")
+        for actor in ACTORS[1:]:
+            self.ledger.submit([Txn(actor, "axfer", xfer_asset=self.asset_id, asset_receiver=actor)])
+            self.ledger.submit([Txn(deployer, "axfer", xfer_asset=self.asset_id, asset_receiver=actor,
+                                    asset_amount=ASSET_FUNDS)])
+
+        # The platform's SBT app, which every actor has opted in to
+        create = Txn(deployer, app_id=0, approval_program=sbt_approval_teal, clear_program=sbt_clear_teal,
+                     global_schema=(5, 5), local_schema=(10, 5))
+        self.ledger.submit([create])
+        self.sbt = create.created_app_id
+        for actor in ACTORS:
+            self.ledger.submit([Txn(actor, app_id=self.sbt, on_completion=OPT_IN)])
+
+        self.app_id = self._create_app(deployer)
+        self.address = app_address(self.app_id)
+
+        # The other side of import_job/export_job. Every step starts from
+        # this ledger, so these apps are back to this state for each call:
+        # a job to import from (in progress, first milestone released), an
+        # empty app of the same creator and one created by a stranger
+        self.source = self._create_app(deployer)
+        self.twin = self._create_app(deployer)
+        self.rogue = self._create_app(ACTORS[-1])
+        i2b = lambda n: n.to_bytes(8, "big")
+        call = lambda sender, *args, **kwargs: self.ledger.submit(
+            [Txn(sender, app_id=self.source, app_args=list(args), **kwargs)])
+        self.ledger.submit([Txn(ACTORS[CLIENT], app_id=self.source, app_args=[
+                                b"create_job", i2b(JOB_AMOUNT), i2b(DEADLINE), pack_milestones(MILESTONE_SPLITS[1])]),
+                            Txn(ACTORS[CLIENT], "pay", receiver=app_address(self.source), amount=JOB_AMOUNT)])
+        call(ACTORS[FREELANCER], b"accept_job")
+        call(ACTORS[FREELANCER], b"submit_milestone", i2b(0))
+        stale = self._job(self.source)
+        call(ACTORS[CLIENT], b"approve_milestone", i2b(0), fee=2 * MIN_TXN_FEE, accounts=[ACTORS[FREELANCER]])
+        self.source_job = self._job(self.source)
+        self.export_imports = {}  # (globals id, variant) -> import args for an export target
+        self.source_imports = {IMPORT_LIVE: escrow_import_args(self.source_job),
+                               IMPORT_STALE: escrow_import_args(stale)}
+
+        # Every call starts from this ledger with only our app's entries
+        # swapped in, so the totals of everything else are fixed
+        algo, asset = self._totals()
+        self.other_totals = (algo - self.ledger.balance(self.address),
+                             asset - self.ledger.holdings.get((self.address, self.asset_id), 0))
+
+        self.states = []       # state id -> abstract state
+        self.views = []        # state id -> decoded view
+        self.transitions = []  # state id -> {step index: result}
+        self.state_ids = {}
+        self.globals_ids = {}
+        self.initial_state = self._intern(self._observe())
+        self.executions = 0
+
+    def _create_app(self, creator):
+        create = Txn(creator, app_id=0, approval_program=self.programs[0], clear_program=self.programs[1],
+                     global_schema=(10, 10), local_schema=(5, 5))
+        self.ledger.submit([create])
+        self.ledger.submit([Txn(ACTORS[0], "pay", receiver=app_address(create.created_app_id), amount=APP_FUNDING)])
+        return create.created_app_id
+
+    def _job(self, app_id):
+        state = self.ledger.app_globals.get(app_id) or {}
+        return escrow_job_from_state(app_id, {key.decode(): value for key, value in state.items()})
+
+    def _observe(self):
+        ledger = self.ledger
+        exists = self.app_id in ledger.apps
+        items = tuple(sorted(ledger.app_globals.get(self.app_id, {}).items())) if exists else ()
+        holding = ledger.holdings.get((self.address, self.asset_id))
+        return (items, ledger.balance(self.address), exists, holding)
+
+    def _intern(self, state):
+        state_id = self.state_ids.get(state)
+        if state_id is None:
+            state_id = self.state_ids[state] = len(self.states)
+            self.states.append(state)
+            self.views.append(self._decode(state))
+            self.transitions.append({})
+        return state_id
+
+    def _decode(self, state):
+        items, app_balance, exists, holding = state
+        values = dict(items)
+        return {
+            "globals": self.globals_ids.setdefault(items, len(self.globals_ids)),
+            "exists": exists,
+            "balance": app_balance,
+            "holding": holding,
+            "status": as_uint(values.get(b"status")),
+            "client": values.get(b"client", b""),
+            "freelancer": values.get(b"freelancer", b""),
+            "amount": as_uint(values.get(b"amount")),
+            "released": as_uint(values.get(b"released")),
+            "asset": as_uint(values.get(b"asset")),
+            "jurors": as_uint(values.get(b"jurors")),
+            "votes": as_uint(values.get(b"votes_for")) + as_uint(values.get(b"votes_against")),
+            "milestones": unpack_milestones(values.get(b"milestones")),
+            "sbt_app": as_uint(values.get(b"sbt_app")),
+        }
+
+    def _build_group(self, state, step):
+        group = self._build_calls(state, step)
+        if step[3] == UPDATE_APPLICATION:
+            # Updates re-install the same programs so the sequence can go on
+            for txn in group:
+                if txn.type == "appl":
+                    txn.approval_program, txn.clear_program = self.programs
+        return group
+
+    def _build_calls(self, state, step):
+        actor, method, arg, on_completion = step
+        sender = ACTORS[actor]
+        if method == "payment":
+            return [Txn(sender, "pay", receiver=self.address, amount=JOB_AMOUNT)]
+
+        i2b = lambda n: n.to_bytes(8, "big")
+        if method == "create_job":
+            amount, pay, split, in_asset = arg
+            app_args = [b"create_job", i2b(amount), i2b(DEADLINE)]
+            if split:
+                app_args.append(PACKED_SPLITS[split])
+            call = Txn(sender, app_id=self.app_id, on_completion=on_completion, app_args=app_args)
+            if pay == PAY_NONE:
+                return [call]
+            receiver = ACTORS[FREELANCER] if pay == PAY_ELSEWHERE else self.address
+            paid = amount - 1 if pay == PAY_SHORT and amount else amount
+            if in_asset:
+                return [call, Txn(sender, "axfer", xfer_asset=self.asset_id, asset_receiver=receiver,
+                                  asset_amount=paid)]
+            return [call, Txn(sender, "pay", receiver=receiver, amount=paid)]
+        if method == "opt_in_asset":
+            # The caller covers the inner opt-in fee through fee pooling
+            return [Txn(sender, app_id=self.app_id, on_completion=on_completion, fee=2 * MIN_TXN_FEE,
+                        app_args=[b"opt_in_asset"], foreign_assets=[self.asset_id])]
+        if method == "import_job":
+            # Funded by the source's export in the same group
+            return [Txn(sender, app_id=self.app_id, on_completion=on_completion,
+                        app_args=self.source_imports[arg]),
+                    Txn(ACTORS[0], app_id=self.source, fee=2 * MIN_TXN_FEE, app_args=[b"export_job"],
+                        foreign_apps=[self.app_id])]
+        if method == "export_job":
+            return self._build_export(state, sender, arg, on_completion)
+        if method == "update":
+            return [Txn(sender, app_id=self.app_id, on_completion=on_completion)]
+        if method == "link_sbt":
+            return [Txn(sender, app_id=self.app_id, on_completion=on_completion, app_args=[b"link_sbt"],
+                        foreign_apps=[self.sbt])]
+        if method in SETTLEMENT_METHODS:
+            index, mint = arg if method == "approve_milestone" else (None, arg)
+            app_args = [method.encode()] if index is None else [method.encode(), i2b(index)]
+            return [Txn(sender, app_id=self.app_id, on_completion=on_completion, app_args=app_args,
+                        **self._references())] + self._mints(state, sender, mint)
+        if method in ("vote_dispute", "submit_milestone"):
+            return [Txn(sender, app_id=self.app_id, on_completion=on_completion,
+                        app_args=[method.encode(), i2b(arg)], **self._references())]
+        name = b"not_a_method" if method == "unknown" else method.encode()
+        return [Txn(sender, app_id=self.app_id, on_completion=on_completion, app_args=[name],
+                    **self._references())]
+
+    def _build_export(self, state, sender, arg, on_completion):
+        target_name, variant = arg
+        target = {"twin": self.twin, "rogue": self.rogue, "self": self.app_id}[target_name]
+        group = []
+        if variant != IMPORT_NONE:
+            key = (self.views[state]["globals"], variant)
+            app_args = self.export_imports.get(key)
+            if app_args is None:
+                job = self._job(self.app_id)
+                if variant == IMPORT_TAMPERED:
+                    job["votes_for"] += 1
+                app_args = self.export_imports[key] = escrow_import_args(job)
+            # The target's creator imports the job, opting in to its ASA
+            asset = self.views[state]["asset"]
+            group.append(Txn(ACTORS[-1] if target_name == "rogue" else ACTORS[0], app_id=target,
+                             fee=2 * MIN_TXN_FEE, app_args=app_args, foreign_assets=[asset] if asset else []))
+        # The SBT app is referenced so a linked job's link can be checked
+        group.append(Txn(sender, app_id=self.app_id, on_completion=on_completion, fee=2 * MIN_TXN_FEE,
+                         app_args=[b"export_job"], foreign_apps=[target, self.sbt], foreign_assets=[self.asset_id]))
+        return group
+
+    def _mints(self, state, sender, mint):
+        # mint_sbt calls as a client sends them after a settling payout
+        if mint == MINT_NONE:
+            return []
+        view = self.views[state]
+        party = "client" if mint == MINT_CLIENT else "freelancer"
+        recipient = view[party] or ACTORS[CLIENT if mint == MINT_CLIENT else FREELANCER]
+        return [Txn(sender, app_id=self.sbt, app_args=[b"mint_sbt", (5).to_bytes(8, "big")],
+                    accounts=[recipient], foreign_apps=[self.app_id],
+                    boxes=[(0, history_box_name(recipient))])
+                for _ in range(2 if mint == MINT_TWICE else 1)]
+
+    def _references(self):
+        # Like a real client, reference the job's recorded parties and the
+        # ASA so the app may pay out to them
+        state = self.ledger.app_globals.get(self.app_id) or {}
+        parties = [state[key] for key in (b"client", b"freelancer") if isinstance(state.get(key), bytes)]
+        return {"accounts": parties, "foreign_assets": [self.asset_id]}
+
+    def _totals(self):
+        # The ledger holds a single ASA, so summing every account and holding
+        # accounts for all funds, including the fee sink
+        return sum(self.ledger.balances.values()), sum(self.ledger.holdings.values())
+
+    def step(self, state, step):
+        """
+        Apply one call (a step index) to an abstract state id
+
+        Returns (accepted, new_state, net_transfers, payouts, minted) where
+        net_transfers is the net (ALGO, asset) change summed over all
+        accounts, fees included, payouts is a tuple of (receiver, amount,
+        asset) inner transfers made by the app (asset 0 for ALGO) and minted
+        a tuple of the recipients of SBTs minted by the call.
+        """
+        transitions = self.transitions[state]
+        result = transitions.get(step)
+        if result is None:
+            result = transitions[step] = self._execute(state, STEPS[step])
+        return result
+
+    def _execute(self, state, step):
+        self.executions += 1
+        ledger = self.ledger
+        mark = ledger.checkpoint()
+        try:
+            items, app_balance, exists, holding = self.states[state]
+            if exists:
+                ledger.put(ledger.app_globals, self.app_id, dict(items))
+            else:
+                ledger.delete(ledger.apps, self.app_id)
+                ledger.delete(ledger.app_globals, self.app_id)
+            ledger.put(ledger.balances, self.address, app_balance)
+            if holding is None:
+                ledger.delete(ledger.holdings, (self.address, self.asset_id))
+            else:
+                ledger.put(ledger.holdings, (self.address, self.asset_id), holding)
+
+            before = (self.other_totals[0] + app_balance, self.other_totals[1] + (holding or 0))
+            group = self._build_group(state, step)
+            try:
+                ledger.submit(group)
+                accepted = True
+            except TealError:
+                accepted = False
+
+            after = self._totals()
+            net = (after[0] - before[0], after[1] - before[1])
+            payouts = tuple((inner.receiver, inner.amount, 0) if inner.type == "pay"
+                            else (inner.asset_receiver, inner.asset_amount, inner.xfer_asset)
+                            for txn in group for inner in txn.inner_txns
+                            if inner.sender == self.address
+                            and (inner.type == "pay" or inner.asset_receiver != inner.sender))
+            # No SBT exists at the start of a call
+            minted = ()
+            if ledger.app_globals[self.sbt][b"total_supply"]:
+                minted = tuple(actor for actor in ACTORS
+                               for _ in range(ledger.app_locals[(actor, self.sbt)].get(b"sbt_count", 0)))
+            return accepted, self._intern(self._observe()), net, payouts, minted
+        finally:
+            ledger.revert(mark)
+
+
+class Violation(Exception):
+    def __init__(self, message, steps):
+        super().__init__(message)
+        self.steps = steps
+
+
+def check_step(oracle, old, new, step, result, history):
+    """Raise AssertionError if a single transition breaks an invariant"""
+    accepted, _, net, payouts, minted = result
+    actor, method, arg, on_completion = step
+
+    assert net[0] == 0, f"ALGO not conserved (net {net[0]})"
+    assert net[1] == 0, f"asset not conserved (net {net[1]})"
+
+    if not accepted:
+        assert new is old, "rejected call changed state"
+        return
+
+    if on_completion == UPDATE_APPLICATION and method != "payment":
+        assert actor == 0, "code update accepted from non-creator"
+        assert new["globals"] == old["globals"] and new["exists"] and not payouts, "code update changed state"
+        return
+
+    old_status = old["status"]
+    new_status = new["status"] if new["exists"] else old_status
+
+    if old_status == STATUS_RESOLVED:
+        assert new["globals"] == old["globals"] and not payouts, "state changed after RESOLVED"
+
+    if method == "export_job":
+        # A job may leave from any unresolved status
+        assert new_status == STATUS_RESOLVED, "export did not resolve the job"
+    else:
+        assert (old_status, new_status) in ALLOWED_TRANSITIONS, (
+            f"illegal transition {STATUS_NAMES.get(old_status)} -> {STATUS_NAMES.get(new_status)}")
+
+    sender = ACTORS[actor]
+    client, freelancer = old["client"], old["freelancer"]
+    if method == "complete_job":
+        assert sender == freelancer, "complete_job accepted from non-freelancer"
+    elif method == "approve_completion":
+        assert sender == client, "approve_completion accepted from non-client"
+    elif method == "raise_dispute":
+        assert sender in (client, freelancer), "dispute raised by outsider"
+    elif method == "submit_milestone":
+        assert sender == freelancer, "milestone submitted by non-freelancer"
+    elif method == "approve_milestone":
+        assert sender == client, "milestone approved by non-client"
+    elif method == "opt_in_asset":
+        assert actor == 0, "asset opt-in accepted from non-creator"
+        assert client == b"", "asset opt-in after the job was funded"
+    elif method == "vote_dispute":
+        assert sender not in (client, freelancer), "party voted on own dispute"
+        assert sender not in history["voters"], "same juror voted twice"
+        history["voters"].add(sender)
+
+    elif method == "import_job":
+        source = oracle.source_job
+        assert actor == 0, "job imported by non-creator"
+        assert client == b"", "job imported over an existing job"
+        assert arg == IMPORT_LIVE, "stale import accepted by the source's export"
+        assert (new["client"], new["freelancer"], new["amount"], new["released"], new["status"],
+                new["milestones"]) == (source["client"], source["freelancer"], source["amount"],
+                                       source["released"], source["status"], source["milestones"]), \
+            "imported job differs from the source"
+        history["deposited"] += source["amount"] - source["released"]
+    elif method == "export_job":
+        target, variant = arg
+        assert actor == 0, "job exported by non-creator"
+        assert target == "twin", f"job exported to the {target} app"
+        assert variant == IMPORT_LIVE, "job exported to an app that does not hold it"
+    elif method == "link_sbt":
+        assert actor == 0, "SBT app linked by non-creator"
+        assert client == b"", "SBT app linked after the job was funded"
+        assert old["sbt_app"] == 0 and new["sbt_app"] == oracle.sbt, "SBT app relinked"
+
+    if new["jurors"]:
+        assert new["votes"] <= new["jurors"], "more votes than jurors"
+
+    if method == "create_job":
+        amount, pay, _, in_asset = arg
+        assert bool(in_asset) == bool(new["asset"]), "deposit in the wrong currency"
+        if pay in (PAY_EXACT, PAY_SHORT):
+            history["deposited"] += amount - 1 if pay == PAY_SHORT and amount else amount
+
+    assert len(payouts) <= 1, "more than one payout in a single call"
+    for receiver, amount, asset in payouts:
+        assert asset == old["asset"], "payout in the wrong currency"
+        history["paid_out"] += amount
+        assert history["paid_out"] <= history["deposited"], "escrow paid out more than was deposited"
+        if method == "export_job":
+            remaining = old["amount"] - old["released"]
+            assert receiver == app_address(oracle.twin), "export paid to an app other than the import"
+            assert amount == remaining, f"export moved {amount} != unreleased amount {remaining}"
+            continue
+        assert receiver in (client, freelancer), "payout to a non-party"
+        if method == "approve_milestone":
+            milestone, status = old["milestones"][arg[0]]
+            assert status == MILESTONE_SUBMITTED, "released a milestone that was not submitted"
+            assert amount == milestone, f"milestone payout {amount} != milestone amount {milestone}"
+            assert receiver == freelancer, "milestone paid to the client"
+        else:
+            remaining = old["amount"] - old["released"]
+            assert amount == remaining, f"payout {amount} != unreleased amount {remaining}"
+            assert new_status == STATUS_RESOLVED, "payout without resolving the job"
+
+    # SBTs come from settling a linked job, one for its freelancer in the
+    # settling group; only the platform (the creator) may mint directly
+    settled = (method in SETTLEMENT_METHODS and old["sbt_app"] != 0
+               and old_status != STATUS_RESOLVED and new_status == STATUS_RESOLVED)
+    if settled:
+        assert len(minted) == 1, f"settlement of a linked job minted {len(minted)} SBTs"
+        assert minted == (freelancer,), "settlement minted an SBT for someone other than the freelancer"
+        history["settlements"] += 1
+    if actor != 0 or settled:
+        history["sbts"] += len(minted)
+    assert history["sbts"] == history["settlements"], "SBT minted without a settlement"
+
+    # A deleted app keeps no state, so judge it by what it held before
+    view = new if new["exists"] else old
+    funded = view["client"] != b"" and new_status != STATUS_RESOLVED
+    outstanding = history["deposited"] - history["paid_out"]
+    if funded:
+        assert new["exists"], "app deleted while holding an unresolved job"
+        escrowed = view["amount"] - view["released"]
+        held = new["holding"] or 0 if view["asset"] else new["balance"]
+        assert held >= escrowed, "escrow balance below escrowed amount"
+        assert outstanding == escrowed, \
+            f"client deposits ({outstanding}) do not match the escrowed amount"
+    elif new_status == STATUS_RESOLVED:
+        assert outstanding == 0, f"{outstanding} deposited but never paid out"
+
+
+def run_sequence(oracle, steps):
+    """Run one sequence; returns None or (failing step index, message)"""
+    state = oracle.initial_state
+    views = oracle.views
+    history = {"paid_out": 0, "deposited": 0, "voters": set(), "sbts": 0, "settlements": 0}
+    for index, step in enumerate(steps):
+        result = oracle.step(state, step)
+        try:
+            check_step(oracle, views[state], views[result[1]], STEPS[step], result, history)
+        except AssertionError as e:
+            return index, str(e)
+        state = result[1]
+    return None
+
+
+def shrink(oracle, steps):
+    """Greedily drop steps while the sequence still fails"""
+    failure = run_sequence(oracle, steps)
+    steps = steps[:failure[0] + 1]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(steps)):
+            candidate = steps[:i] + steps[i + 1:]
+            if candidate and run_sequence(oracle, candidate):
+                steps = candidate
+                changed = True
+                break
+    return steps, run_sequence(oracle, steps)[1]
+
+
+def random_sequence(oracle, rng, tables, length, attempts=4):
+    """
+    Draw a sequence of step indices, preferring steps the contract accepts
+
+    Each position draws up to `attempts` candidate steps (a method table,
+    then a step from it, both from one random word) and keeps the first one
+    that is accepted (or the last rejected one), which keeps sequences
+    moving forward through the state machine instead of stalling in CREATED.
+
+    A sequence makes at most one plain payment to the app. The contract
+    never reads its balance, so a second payment only repeats the first at
+    a higher balance, and every state it leads to would be new to the cache.
+    """
+    draw = rng.getrandbits
+    count = len(tables)
+    transitions = oracle.transitions
+    state = oracle.initial_state
+    steps = []
+    for _ in range(length):
+        for _ in range(attempts):
+            word = draw(48)
+            table = tables[word % count]
+            step = table[(word >> 8) % len(table)]
+            accepted, new_state = (transitions[state].get(step) or oracle.step(state, step))[:2]
+            if accepted:
+                break
+        steps.append(step)
+        state = new_state
+        if table is PAYMENT_TABLE:
+            tables = [other for other in tables if other is not PAYMENT_TABLE] or [
+                other for other in STEP_TABLES.values() if other is not PAYMENT_TABLE]
+            count = len(tables)
+    return steps
+
+
+def fuzz(oracle, sequences, max_length, seed, stop_on_failure=True):
+    """Generate and check random sequences; returns (stats, failures)"""
+    rng = random.Random(seed)
+    failures = []
+    steps_run = 0
+    started = time.perf_counter()
+
+    for _ in range(sequences):
+        # Swarm testing: each sequence only draws from a random subset of
+        # methods, so deep paths (e.g. releasing every milestone) are reached
+        swarm = rng.getrandbits(len(METHODS))
+        tables = [STEP_TABLES[m] for i, m in enumerate(METHODS) if swarm >> i & 1] or list(STEP_TABLES.values())
+        steps = random_sequence(oracle, rng, tables, rng.randint(1, max_length))
+        steps_run += len(steps)
+        failure = run_sequence(oracle, steps)
+        if failure:
+            minimal, message = shrink(oracle, steps)
+            failures.append((message, minimal))
+            if stop_on_failure:
+                break
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "sequences": sequences if not failures or not stop_on_failure else None,
+        "steps": steps_run,
+        "seconds": elapsed,
+        "executions": oracle.executions,
+        "distinct_states": len(oracle.states),
+        "statuses": sorted({STATUS_NAMES[view["status"]] for view in oracle.views}),
+    }
+    return stats, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz the Ellora escrow state machine")
+    parser.add_argument("--sequences", type=int, default=100000)
+    parser.add_argument("--max-length", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--teal-version", type=int, default=8)
+    parser.add_argument("--keep-going", action="store_true", help="collect every failure instead of stopping")
+    args = parser.parse_args()
+
+    oracle = EscrowOracle(*compile_escrow(args.teal_version), *compile_reputation(args.teal_version))
+    stats, failures = fuzz(oracle, args.sequences, args.max_length, args.seed,
+                           stop_on_failure=not args.keep_going)
+
+    rate = stats["steps"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"🧪 {stats['steps']} steps in {stats['seconds']:.2f}s "
+          f"({rate:,.0f} steps/s), {stats['executions']} evaluator runs")
+    if stats["sequences"]:
+        print(f"⚡ {stats['sequences'] / stats['seconds']:,.0f} sequences/s")
+    print(f"🗺️  {stats['distinct_states']} distinct states, statuses reached: {', '.join(stats['statuses'])}")
+
+    if not failures:
+        print("✅ All invariants held")
+        return 0
+
+    for message, steps in failures:
+        print(f"\n❌ {message}")
+        for step in steps:
+            print(f"   {describe_step(step)}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
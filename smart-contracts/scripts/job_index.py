@@ -0,0 +1,627 @@
+"""
+Ellora Job Index
+
+Columnar index of escrow jobs for the marketplace browse page: filter by
+status, currency (ALGO or an ASA), amount and deadline, sort, and paginate
+over millions of jobs in milliseconds, served as JSON over HTTP. Amounts
+are in the job's base units, so amount filters and sorts are meant to be
+combined with an asset filter.
+
+The index is built from a state snapshot (state_snapshot.py), optionally
+caught up to the latest round first, and stored as a directory of NumPy
+arrays that are memory-mapped on load:
+
+    meta.json            round, job count, source snapshot
+    <column>.npy         one array per field, rows sorted by app ID
+    <field>.order.npy    row numbers sorted by (field, app ID)
+    <field>.sorted.npy   the field's values in that order
+
+Snapshot records are fixed width, so the columns come straight from the
+mmap with a structured dtype; nothing is decoded per job. A query
+binary-searches each sorted index to size its filters, takes the rows of
+the most selective one and masks them with the rest, then orders them:
+already in order when driven by the sort field's index, a small candidate
+set is sorted directly, and a large one is read back through the sort
+field's order array.
+
+Usage:
+    python3 job_index.py build --snapshot state.snap [--catch-up --env testnet] -o jobs.idx
+    python3 job_index.py query --index jobs.idx --status created --asset 0 --min-amount 1000000 --sort -amount
+    python3 job_index.py serve --index jobs.idx --port 4191
+    python3 job_index.py bench --jobs 1000000
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from app_state import STATUS_NAMES, ZERO_ADDRESS
+from state_snapshot import ESCROW_FIELDS, ESCROW_SIZE, Snapshot, escrow_record
+
+DEFAULT_PORT = 4191
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Matches ESCROW_FORMAT in state_snapshot.py (fields packed, 1 byte of tail padding)
+ESCROW_DTYPE = np.dtype({
+    "names": list(ESCROW_FIELDS),
+    "formats": ["<u8", "V32", "V32", "<u8", "<u8", "<u8", "<u8", "<u8", "<u4", "<u4", "<u4", "u1", "u1", "u1"],
+    "itemsize": ESCROW_SIZE,
+})
+
+COLUMNS = ("app_id", "amount", "released", "asset", "created", "deadline", "status",
+           "milestone_count", "milestones_released", "client", "freelancer")
+INDEXED = ("amount", "deadline", "created", "status", "asset")
+SORT_FIELDS = ("amount", "deadline", "created", "app_id")
+UINT64_MAX = 2 ** 64 - 1
+
+STATUS_CODES = {name: code for code, name in STATUS_NAMES.items()}
+
+# Candidate sets larger than 1/DENSE_FRACTION of the index are ordered
+# through the sort field's order array instead of being sorted
+DENSE_FRACTION = 16
+SCAN_CHUNK = 65536
+
+
+class JobIndexError(Exception):
+    """Raised when an index directory is missing or malformed"""
+
+
+def records_from_jobs(jobs):
+    """Pack escrow job dicts (as produced by app_state) into snapshot-layout records"""
+    values = [escrow_record(job) for job in jobs]
+    records = np.zeros(len(values), dtype=ESCROW_DTYPE)
+    for position, field in enumerate(ESCROW_FIELDS):
+        if field in ("client", "freelancer"):
+            records[field] = [np.void(record[position]) for record in values]
+        else:
+            records[field] = [record[position] for record in values]
+    return records
+
+
+def snapshot_records(snapshot, overrides=None):
+    """
+    Escrow records of a snapshot, with a follower's updated jobs applied
+
+    The snapshot's records are viewed in place; only the overrides are
+    packed.
+    """
+    records = np.frombuffer(snapshot.escrow_records(), dtype=ESCROW_DTYPE)
+    if not overrides:
+        return records
+    merged = np.concatenate([records, records_from_jobs(overrides.values())])
+    # Keep the last occurrence of each app ID: the override
+    order = np.argsort(merged["app_id"], kind="stable")[::-1]
+    _, first = np.unique(merged["app_id"][order], return_index=True)
+    return merged[order[first]]
+
+
+def write_index(path, records, round_num, source=None):
+    """
+    Build an index directory from escrow records
+
+    The index is written next to `path` and swapped in with renames, so a
+    running server never sees a half-written index.
+    """
+    records = np.sort(records, order="app_id") if len(records) else records
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    count = len(records)
+    for column in COLUMNS:
+        values = records[column]
+        if column in ("client", "freelancer"):
+            values = np.ascontiguousarray(values).view(np.uint8).reshape(count, 32)
+        np.save(os.path.join(tmp_path, f"{column}.npy"), np.ascontiguousarray(values))
+    row_type = np.uint32 if count < 2 ** 32 else np.uint64
+    for field in INDEXED:
+        # Rows are in app ID order, so a stable sort breaks ties by app ID
+        order = np.argsort(records[field], kind="stable").astype(row_type)
+        np.save(os.path.join(tmp_path, f"{field}.order.npy"), order)
+        np.save(os.path.join(tmp_path, f"{field}.sorted.npy"), records[field][order])
+
+    with open(os.path.join(tmp_path, "meta.json"), 'w') as f:
+        json.dump({"round": round_num, "count": count, "source": source, "built": int(time.time())},
+                  f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return count
+
+
+class JobPage:
+    """One page of query results"""
+
+    def __init__(self, index, rows, total, offset, limit):
+        self.index = index
+        self.rows = rows
+        self.total = total
+        self.offset = offset
+        self.limit = limit
+
+    def jobs(self):
+        """Decode the page's rows into dicts"""
+        from algosdk.encoding import encode_address
+
+        index = self.index
+        jobs = []
+        for row in self.rows.tolist():
+            freelancer = index.freelancer[row].tobytes()
+            jobs.append({
+                "app_id": int(index.app_id[row]),
+                "client": encode_address(index.client[row].tobytes()),
+                "freelancer": encode_address(freelancer) if freelancer != ZERO_ADDRESS else None,
+                "asset": int(index.asset[row]),
+                "amount": int(index.amount[row]),
+                "released": int(index.released[row]),
+                "milestones": int(index.milestone_count[row]),
+                "milestones_released": int(index.milestones_released[row]),
+                "created": int(index.created[row]),
+                "deadline": int(index.deadline[row]),
+                "status": STATUS_NAMES.get(int(index.status[row]), "Unknown"),
+            })
+        return jobs
+
+    def to_dict(self):
+        next_offset = self.offset + len(self.rows)
+        return {
+            "round": self.index.round,
+            "total": self.total,
+            "offset": self.offset,
+            "limit": self.limit,
+            "next_offset": next_offset if next_offset < self.total else None,
+            "jobs": self.jobs(),
+        }
+
+
+class JobIndex:
+    """Memory-mapped, read-only job index"""
+
+    def __init__(self, path):
+        self.path = path
+        meta_path = os.path.join(path, "meta.json")
+        try:
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            self.loaded_mtime = os.stat(meta_path).st_mtime_ns
+            for column in COLUMNS:
+                setattr(self, column, self._load(f"{column}.npy"))
+            self.order = {field: self._load(f"{field}.order.npy") for field in INDEXED}
+            self.sorted = {field: self._load(f"{field}.sorted.npy") for field in INDEXED}
+        except (OSError, ValueError, KeyError) as e:
+            raise JobIndexError(f"{path} is not a job index: {e}")
+        self.round = self.meta["round"]
+        self.count = self.meta["count"]
+
+    def _load(self, name):
+        array = np.load(os.path.join(self.path, name), mmap_mode="r")
+        # Zero-length arrays cannot be memory-mapped
+        return array if array.size else np.load(os.path.join(self.path, name))
+
+    def __len__(self):
+        return self.count
+
+    def is_stale(self):
+        """Whether the directory has been rebuilt since this index was loaded"""
+        try:
+            return os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns != self.loaded_mtime
+        except OSError:
+            return False
+
+    def _range(self, field, low, high):
+        """[start, stop) of the rows of the `field` index with low <= value <= high"""
+        values = self.sorted[field]
+        # Search with the array's own dtype; a Python int would cast the whole array
+        start = 0 if low is None else int(values.searchsorted(values.dtype.type(low), side="left"))
+        stop = self.count if high is None else int(values.searchsorted(values.dtype.type(high), side="right"))
+        return start, max(start, stop)
+
+    def query(self, statuses=None, assets=None, min_amount=None, max_amount=None, deadline_after=None,
+              deadline_before=None, sort="deadline", descending=False, offset=0, limit=DEFAULT_LIMIT):
+        """
+        Filter, sort and paginate jobs
+
+        `statuses` is an iterable of status codes and `assets` of ASA IDs
+        (0 for ALGO); ranges are inclusive and None leaves a side open. Ties
+        in the sort field are broken by app ID. Raises ValueError for values
+        the columns cannot hold and for a negative offset or limit.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"cannot sort by {sort!r}; choose from {', '.join(SORT_FIELDS)}")
+        for name, value in (("min_amount", min_amount), ("max_amount", max_amount),
+                            ("deadline_after", deadline_after), ("deadline_before", deadline_before)):
+            if value is not None and not 0 <= value <= UINT64_MAX:
+                raise ValueError(f"{name} must be between 0 and {UINT64_MAX}")
+        if statuses is not None and not all(0 <= status <= 255 for status in statuses):
+            raise ValueError("status codes must be between 0 and 255")
+        if assets is not None and not all(0 <= asset <= UINT64_MAX for asset in assets):
+            raise ValueError(f"asset IDs must be between 0 and {UINT64_MAX}")
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must not be negative")
+        limit = min(limit, MAX_LIMIT)
+
+        # Size every filter from its index without touching any rows
+        filters = {}
+        if min_amount is not None or max_amount is not None:
+            filters["amount"] = [self._range("amount", min_amount, max_amount)]
+        if deadline_after is not None or deadline_before is not None:
+            filters["deadline"] = [self._range("deadline", deadline_after, deadline_before)]
+        if statuses is not None:
+            filters["status"] = [self._range("status", status, status) for status in sorted(set(statuses))]
+        if assets is not None:
+            filters["asset"] = [self._range("asset", asset, asset) for asset in sorted(set(assets))]
+
+        if filters:
+            driver = min(filters, key=lambda field: sum(stop - start for start, stop in filters[field]))
+            order = self.order[driver]
+            rows = np.concatenate([order[start:stop] for start, stop in filters[driver]]
+                                  or [order[:0]])
+            in_order = driver == sort and len(filters[driver]) == 1
+        else:
+            driver, rows = None, None
+            in_order = False
+
+        # Mask the driving rows with the remaining filters
+        if rows is not None:
+            keep = np.ones(len(rows), dtype=bool)
+            if "amount" in filters and driver != "amount":
+                amounts = self.amount[rows]
+                if min_amount is not None:
+                    keep &= amounts >= min_amount
+                if max_amount is not None:
+                    keep &= amounts <= max_amount
+            if "deadline" in filters and driver != "deadline":
+                deadlines = self.deadline[rows]
+                if deadline_after is not None:
+                    keep &= deadlines >= deadline_after
+                if deadline_before is not None:
+                    keep &= deadlines <= deadline_before
+            if "status" in filters and driver != "status":
+                allowed = np.zeros(256, dtype=bool)
+                allowed[list(statuses)] = True
+                keep &= allowed[self.status[rows]]
+            if "asset" in filters and driver != "asset":
+                keep &= np.isin(self.asset[rows], np.fromiter(assets, dtype=np.uint64))
+            if not keep.all():
+                rows = rows[keep]
+
+        # Only the page's window of the ascending order is materialised
+        total = self.count if rows is None else len(rows)
+        if descending:
+            window = (max(0, total - offset - limit), max(0, total - offset))
+        else:
+            window = (min(offset, total), min(offset + limit, total))
+
+        if rows is None:
+            page = (self.order[sort][window[0]:window[1]] if sort != "app_id"
+                    else np.arange(*window))
+        elif in_order:
+            page = rows[window[0]:window[1]]
+        elif sort == "app_id":
+            page = np.sort(rows)[window[0]:window[1]]
+        elif len(rows) * DENSE_FRACTION > self.count:
+            page = self._scan_window(rows, sort, *window)
+        else:
+            page = self._sorted_window(rows, sort, *window)
+
+        if descending:
+            page = page[::-1]
+        return JobPage(self, np.asarray(page), total, offset, limit)
+
+    def _scan_window(self, rows, sort, start, stop):
+        """
+        Rows [start, stop) of `rows` in sort order, walking the sort field's
+        order array in chunks from whichever end is nearer the window
+        """
+        member = np.zeros(self.count, dtype=bool)
+        member[rows] = True
+        order = self.order[sort]
+        total = len(rows)
+        backward = start > total - stop
+        if backward:
+            start, stop = total - stop, total - start
+
+        found, pieces = 0, []
+        for chunk_start in range(0, self.count, SCAN_CHUNK):
+            if backward:
+                chunk = order[max(0, self.count - chunk_start - SCAN_CHUNK):self.count - chunk_start][::-1]
+            else:
+                chunk = order[chunk_start:chunk_start + SCAN_CHUNK]
+            hits = chunk[member[chunk]]
+            if found + len(hits) > start:
+                pieces.append(hits[max(0, start - found):stop - found])
+            found += len(hits)
+            if found >= stop:
+                break
+        page = np.concatenate(pieces) if pieces else rows[:0]
+        return page[::-1] if backward else page
+
+    def _sorted_window(self, rows, sort, start, stop):
+        """
+        Rows [start, stop) of `rows` in sort order, partially sorting only
+        the rows that can land in the window
+
+        Rows tied with the window's boundary values are all kept, so ties
+        are still broken by app ID.
+        """
+        if start >= stop:
+            return rows[:0]
+        rows = np.sort(rows)
+        keys = getattr(self, sort)[rows]
+        if stop - start < len(rows):
+            low, high = np.partition(keys, (start, stop - 1))[[start, stop - 1]]
+            selected = (keys >= low) & (keys <= high)
+            before = int(np.count_nonzero(keys < low))
+            rows, keys = rows[selected], keys[selected]
+            start, stop = start - before, stop - before
+        return rows[np.argsort(keys, kind="stable")][start:stop]
+
+
+def parse_statuses(value):
+    """Status names or codes, comma separated ("created,in_progress" or "0,1")"""
+    if value is None or value == "":
+        return None
+    statuses = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if item.isdigit():
+            statuses.append(int(item))
+        elif item in STATUS_CODES:
+            statuses.append(STATUS_CODES[item])
+        else:
+            raise ValueError(f"unknown status {item!r}; choose from {', '.join(STATUS_CODES)}")
+    return statuses
+
+
+def parse_assets(value):
+    """ASA IDs, comma separated, with "algo" or 0 for ALGO ("0,31566704")"""
+    if value is None or value == "":
+        return None
+    assets = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if item == "algo":
+            assets.append(0)
+        elif item.isdigit():
+            assets.append(int(item))
+        else:
+            raise ValueError(f"unknown asset {item!r}; use an ASA ID, or algo")
+    return assets
+
+
+def parse_sort(value):
+    """"-amount" sorts by amount descending; returns (field, descending)"""
+    value = value or "deadline"
+    return value.lstrip("-"), value.startswith("-")
+
+
+def query_from_params(index, params):
+    """Run a query from URL query parameters (lists of strings, as parse_qs returns)"""
+    def get(name, cast=int):
+        values = params.get(name)
+        return cast(values[0]) if values and values[0] != "" else None
+
+    sort, descending = parse_sort(get("sort", str))
+    return index.query(
+        statuses=parse_statuses(get("status", str)), assets=parse_assets(get("asset", str)),
+        min_amount=get("min_amount"), max_amount=get("max_amount"),
+        deadline_after=get("deadline_after"), deadline_before=get("deadline_before"),
+        sort=sort, descending=descending,
+        offset=get("offset") or 0, limit=get("limit") if get("limit") is not None else DEFAULT_LIMIT,
+    )
+
+
+def make_server(path, port=DEFAULT_PORT, address="127.0.0.1"):
+    """
+    Build a threading HTTP server answering GET /jobs (not yet started)
+
+    The index is reopened when its directory is rebuilt, so `build` can
+    refresh a running server; until a rebuilt index loads, the previous
+    one keeps answering.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {"index": JobIndex(path)}
+
+    class JobIndexHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            started = time.perf_counter()
+            try:
+                if url.path == "/health":
+                    status, response = 200, {"round": state["index"].round, "jobs": len(state["index"])}
+                elif url.path == "/jobs":
+                    if state["index"].is_stale():
+                        # Mid-swap or broken rebuild: keep answering from the index we have
+                        try:
+                            state["index"] = JobIndex(path)
+                        except JobIndexError:
+                            pass
+                    response = query_from_params(state["index"], parse_qs(url.query)).to_dict()
+                    response["took_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                    status = 200
+                else:
+                    status, response = 404, {"message": f"GET {url.path} is not supported"}
+            except (ValueError, OverflowError) as e:
+                status, response = 400, {"message": str(e)}
+
+            payload = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((address, port), JobIndexHandler)
+
+
+# ASA of the synthetic jobs not escrowed in ALGO (mainnet USDC)
+BENCH_ASSET = 31566704
+
+
+def synthetic_records(count, seed=1, now=None):
+    """Random escrow records for benchmarking"""
+    rng = np.random.default_rng(seed)
+    now = now or int(time.time())
+    records = np.zeros(count, dtype=ESCROW_DTYPE)
+    records["app_id"] = 1000 + np.arange(count, dtype=np.uint64)
+    records["amount"] = np.round(rng.lognormal(np.log(50e6), 1.2, count), -4).astype(np.uint64)
+    records["created"] = now - rng.integers(0, 90 * 86400, count)
+    records["deadline"] = records["created"] + rng.integers(86400, 60 * 86400, count)
+    records["status"] = rng.choice(len(STATUS_NAMES), count, p=[0.3, 0.25, 0.05, 0.02, 0.38])
+    records["asset"] = np.where(rng.random(count) < 0.2, BENCH_ASSET, 0)
+    records["milestone_count"] = rng.integers(0, 5, count)
+    records["milestones_released"] = rng.integers(0, records["milestone_count"].astype(np.int64) + 1)
+    records["released"] = np.where(
+        records["status"] == STATUS_CODES["resolved"], records["amount"],
+        records["amount"] * records["milestones_released"] // np.maximum(records["milestone_count"], 1))
+    addresses = rng.integers(0, 256, (count, 64), dtype=np.uint8)
+    records["client"] = addresses[:, :32].copy().view("V32").ravel()
+    records["freelancer"] = addresses[:, 32:].copy().view("V32").ravel()
+    return records
+
+
+BENCH_QUERIES = [
+    ("open jobs, soonest deadline", {"status": ["created"]}),
+    ("open ALGO jobs, highest amount", {"status": ["created"], "asset": ["algo"], "sort": ["-amount"]}),
+    ("open USDC jobs, highest amount", {"status": ["created"], "asset": [str(BENCH_ASSET)], "sort": ["-amount"]}),
+    ("amount 100-500 ALGO by deadline", {"asset": ["algo"], "min_amount": ["100000000"],
+                                         "max_amount": ["500000000"]}),
+    ("open, 10-20 ALGO, newest", {"status": ["created"], "asset": ["algo"], "min_amount": ["10000000"],
+                                  "max_amount": ["20000000"], "sort": ["-created"]}),
+    ("in progress, due in a day", {"status": ["in_progress"], "deadline_before": ["{day}"]}),
+    ("everything by amount, page 200", {"sort": ["amount"], "offset": ["10000"]}),
+]
+
+
+def cmd_build(args):
+    with Snapshot(args.snapshot, verify_key=args.verify) as snapshot:
+        overrides, round_num = None, snapshot.round
+        if args.catch_up:
+            from deploy_contracts_fixed import NETWORKS, create_algod_client
+            from state_snapshot import SnapshotFollower
+
+            follower = SnapshotFollower(snapshot)
+            round_num = follower.catch_up(create_algod_client(*NETWORKS[args.env]))
+            overrides = follower.escrow_overrides
+        started = time.perf_counter()
+        count = write_index(args.output, snapshot_records(snapshot, overrides), round_num,
+                            source=os.path.abspath(args.snapshot))
+    print(f"📇 Indexed {count} escrow jobs at round {round_num} in {time.perf_counter() - started:.2f}s")
+    print(f"💾 Index written to {args.output}")
+    return 0
+
+
+def cmd_query(args):
+    index = JobIndex(args.index)
+    sort, descending = parse_sort(args.sort)
+    started = time.perf_counter()
+    page = index.query(statuses=parse_statuses(args.status), assets=parse_assets(args.asset),
+                       min_amount=args.min_amount, max_amount=args.max_amount,
+                       deadline_after=args.deadline_after, deadline_before=args.deadline_before,
+                       sort=sort, descending=descending, offset=args.offset, limit=args.limit)
+    took = (time.perf_counter() - started) * 1000
+    print(json.dumps(page.to_dict(), indent=2))
+    print(f"⚡ {page.total} matching jobs in {took:.2f} ms", file=sys.stderr)
+    return 0
+
+
+def cmd_serve(args):
+    server = make_server(args.index, args.port)
+    print(f"📇 Job index API on http://127.0.0.1:{args.port}/jobs "
+          f"({len(JobIndex(args.index))} jobs)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_bench(args):
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "jobs.idx")
+        started = time.perf_counter()
+        write_index(path, synthetic_records(args.jobs, args.seed, now), 0)
+        print(f"📇 Built a {args.jobs:,} job index in {time.perf_counter() - started:.2f}s")
+
+        index = JobIndex(path)
+        print(f"{'query':<34} {'matches':>9} {'p50 ms':>8} {'max ms':>8}")
+        for label, params in BENCH_QUERIES:
+            params = {name: [value.format(day=now + 86400) for value in values]
+                      for name, values in params.items()}
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                page = query_from_params(index, params)
+                page.jobs()
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{label:<34} {page.total:>9} {np.median(timings):>8.2f} {max(timings):>8.2f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar escrow job index and query API")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    build = subcommands.add_parser("build", help="index the escrow jobs of a snapshot")
+    build.add_argument("--snapshot", required=True)
+    build.add_argument("--verify", metavar="ADDRESS", help="expected snapshot signer address")
+    build.add_argument("--catch-up", action="store_true", help="apply blocks after the snapshot round first")
+    build.add_argument("--env", default="testnet")
+    build.add_argument("-o", "--output", default="jobs.idx")
+    build.set_defaults(func=cmd_build)
+
+    query = subcommands.add_parser("query", help="run one query and print the page as JSON")
+    query.add_argument("--index", default="jobs.idx")
+    query.add_argument("--status", help="comma separated status names or codes")
+    query.add_argument("--asset", help="comma separated ASA IDs, algo (or 0) for ALGO")
+    query.add_argument("--min-amount", type=int)
+    query.add_argument("--max-amount", type=int)
+    query.add_argument("--deadline-after", type=int)
+    query.add_argument("--deadline-before", type=int)
+    query.add_argument("--sort", default="deadline", help=f"one of {', '.join(SORT_FIELDS)}; prefix - to reverse")
+    query.add_argument("--offset", type=int, default=0)
+    query.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    query.set_defaults(func=cmd_query)
+
+    serve = subcommands.add_parser("serve", help="serve GET /jobs as JSON")
+    serve.add_argument("--index", default="jobs.idx")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.set_defaults(func=cmd_serve)
+
+    bench = subcommands.add_parser("bench", help="time queries over a synthetic index")
+    bench.add_argument("--jobs", type=int, default=1000000)
+    bench.add_argument("--repeat", type=int, default=20)
+    bench.add_argument("--seed", type=int, default=1)
+    bench.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    except (JobIndexError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
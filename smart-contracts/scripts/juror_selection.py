@@ -0,0 +1,268 @@
+"""
+Ellora Juror Selection
+
+Off-chain service that draws dispute jurors from the accounts the
+reputation SBT contract marks as `juror_eligible`, weighted by their
+reputation score and never including the dispute's client or freelancer.
+
+Draws are reproducible: the randomness comes from the block seed of a
+given round mixed with the escrow app ID, and the candidate order is
+canonical (sorted by address), so anyone holding the SBT states at that
+round can recompute the same jurors. The snapshot must carry the
+platform's signature (--verify), so a forged stake set is refused.
+
+Weights live in a Fenwick tree, so a score change from `update_rating` or
+`mint_sbt` is an O(log n) update and each juror draw is O(log n), which keeps
+selection fast with 100k+ eligible accounts.
+
+Usage:
+    python3 juror_selection.py --snapshot state.snap --verify <PLATFORM_ADDRESS> --escrow-app 742004772 --round 41000000
+"""
+
+import argparse
+import hashlib
+import sys
+
+from app_state import juror_eligible, reputation_score
+
+DEFAULT_JURORS = 5  # Matches raise_dispute in escrow_contract.py
+
+SEED_DOMAIN = b"ellora-juror-selection"
+
+
+class FenwickSampler:
+    """Binary indexed tree over non-negative integer weights"""
+
+    def __init__(self, weights=()):
+        self.weights = list(weights)
+        self.size = len(self.weights)
+        self.tree = [0] * (self.size + 1)
+        # O(n) construction: push each node's sum to its parent once
+        for i, weight in enumerate(self.weights, start=1):
+            self.tree[i] += weight
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self._top_bit = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def update(self, index, weight):
+        """Set the weight at `index` (0-based)"""
+        delta = weight - self.weights[index]
+        if not delta:
+            return
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        total, i = 0, self.size
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, target):
+        """Index whose cumulative weight range contains `target` (0 <= target < total)"""
+        position, bit = 0, self._top_bit
+        while bit:
+            next_position = position + bit
+            if next_position <= self.size and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            bit >>= 1
+        return position
+
+
+class SeededRandom:
+    """Deterministic, verifiable integer stream from SHA-512/256 in counter mode"""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.counter = 0
+
+    def _next_u64(self):
+        block = hashlib.new("sha512_256", self.seed + self.counter.to_bytes(8, "big")).digest()
+        self.counter += 1
+        return int.from_bytes(block[:8], "big")
+
+    def randbelow(self, n):
+        """Uniform integer in [0, n) without modulo bias"""
+        limit = (1 << 64) - ((1 << 64) % n)
+        while True:
+            value = self._next_u64()
+            if value < limit:
+                return value % n
+
+
+def dispute_seed(block_seed, escrow_app_id, round_num):
+    """Derive the selection seed for one dispute from a block seed"""
+    return hashlib.new(
+        "sha512_256",
+        SEED_DOMAIN + block_seed + escrow_app_id.to_bytes(8, "big") + round_num.to_bytes(8, "big"),
+    ).digest()
+
+
+def fetch_block_seed(algod_client, round_num):
+    """Read the VRF-derived seed of a block from algod"""
+    import msgpack
+
+    raw = algod_client.block_info(round_num=round_num, response_format="msgpack")
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)["block"]["seed"]
+
+
+def juror_weight(state):
+    """Selection weight for an SBT state: its score if eligible, else 0"""
+    if state is None or not state["juror_eligible"]:
+        return 0
+    score = reputation_score(state["positive"], state["negative"], state["sbt_count"])
+    # Eligibility can lag behind the score (it is only refreshed on-chain
+    # by mint_sbt/update_rating), so re-check it against the live rule
+    return score if juror_eligible(state["sbt_count"], score) else 0
+
+
+class JurorPool:
+    """Weighted pool of eligible jurors kept in canonical address order"""
+
+    def __init__(self, weights_by_address=None):
+        weights_by_address = weights_by_address or {}
+        self.addresses = sorted(weights_by_address)
+        self.slots = {address: i for i, address in enumerate(self.addresses)}
+        self.sampler = FenwickSampler(weights_by_address[a] for a in self.addresses)
+        self.pending = {}
+
+    @classmethod
+    def from_states(cls, sbt_states):
+        """Build a pool from SBT local state dicts (see app_state)"""
+        weights = {}
+        for state in sbt_states:
+            weight = juror_weight(state)
+            if weight:
+                weights[state["address"]] = weight
+        return cls(weights)
+
+    def set_weight(self, address, weight):
+        """
+        Change one account's weight
+
+        Known accounts are updated in place in O(log n). New accounts are
+        queued and merged by a rebuild before the next draw, which keeps
+        the slot order canonical.
+        """
+        slot = self.slots.get(address)
+        if slot is not None:
+            self.sampler.update(slot, weight)
+        elif weight:
+            self.pending[address] = weight
+        else:
+            self.pending.pop(address, None)
+
+    def apply_sbt_state(self, address, state):
+        """Refresh an account after mint_sbt/update_rating (state None = closed out)"""
+        self.set_weight(address, juror_weight(state))
+
+    def _merge_pending(self):
+        if not self.pending:
+            return
+        weights = {a: w for a, w in zip(self.addresses, self.sampler.weights) if w}
+        weights.update(self.pending)
+        self.__init__(weights)
+
+    def weight(self, address):
+        if address in self.pending:
+            return self.pending[address]
+        slot = self.slots.get(address)
+        return 0 if slot is None else self.sampler.weights[slot]
+
+    def __len__(self):
+        return sum(1 for w in self.sampler.weights if w) + len(self.pending)
+
+    def select(self, seed, count=DEFAULT_JURORS, exclude=()):
+        """
+        Draw `count` distinct jurors without replacement
+
+        Excluded accounts (the dispute parties) and already drawn jurors are
+        zeroed for the duration of the draw and restored afterwards.
+        """
+        self._merge_pending()
+        rng = SeededRandom(seed)
+        removed = {}
+
+        for address in exclude:
+            slot = self.slots.get(address)
+            if slot is not None and slot not in removed:
+                removed[slot] = self.sampler.weights[slot]
+                self.sampler.update(slot, 0)
+
+        jurors = []
+        try:
+            while len(jurors) < count:
+                total = self.sampler.total()
+                if total == 0:
+                    raise ValueError(f"only {len(jurors)} eligible jurors available, need {count}")
+                slot = self.sampler.find(rng.randbelow(total))
+                jurors.append(self.addresses[slot])
+                removed[slot] = self.sampler.weights[slot]
+                self.sampler.update(slot, 0)
+        finally:
+            for slot, weight in removed.items():
+                self.sampler.update(slot, weight)
+
+        return jurors
+
+
+def verify_selection(sbt_states, seed, jurors, exclude=()):
+    """Recompute a draw from the SBT states it was based on"""
+    pool = JurorPool.from_states(sbt_states)
+    return pool.select(seed, len(jurors), exclude) == list(jurors)
+
+
+def main():
+    from algosdk.encoding import encode_address
+    from deploy_contracts_fixed import NETWORKS, create_algod_client
+    from state_snapshot import Snapshot, SnapshotError
+
+    parser = argparse.ArgumentParser(description="Select dispute jurors from a state snapshot")
+    parser.add_argument("--snapshot", required=True, help="state snapshot to read SBT states from")
+    parser.add_argument("--verify", metavar="ADDRESS", required=True,
+                        help="platform address the snapshot must be signed by")
+    parser.add_argument("--escrow-app", type=int, required=True, help="escrow app in dispute")
+    parser.add_argument("--round", type=int, help="round whose block seed to use (default: snapshot round)")
+    parser.add_argument("--env", default="testnet", choices=sorted(NETWORKS))
+    parser.add_argument("--count", type=int, help="number of jurors (default: jurors in escrow state)")
+    args = parser.parse_args()
+
+    try:
+        snapshot = Snapshot(args.snapshot, verify_key=args.verify)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        return 1
+
+    with snapshot:
+        job = snapshot.escrow_job(args.escrow_app)
+        if job is None:
+            print(f"❌ Escrow app {args.escrow_app} is not in the snapshot")
+            return 1
+
+        round_num = args.round or snapshot.round
+        pool = JurorPool.from_states(snapshot.sbt_states())
+
+    client = create_algod_client(*NETWORKS[args.env])
+    seed = dispute_seed(fetch_block_seed(client, round_num), args.escrow_app, round_num)
+    count = args.count or job["jurors"] or DEFAULT_JURORS
+
+    try:
+        jurors = pool.select(seed, count, exclude=(job["client"], job["freelancer"]))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"⚖️  Jurors for escrow {args.escrow_app} (seed round {round_num}, pool {len(pool)}):")
+    for address in jurors:
+        print(f"   {encode_address(address)}  weight {pool.weight(address)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
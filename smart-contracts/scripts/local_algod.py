@@ -0,0 +1,616 @@
+"""
+Ellora Local algod Stand-in
+
+A lightweight HTTP server that speaks the subset of the algod v2 REST API
+used by the Ellora tooling. It is backed by the in-process TEAL evaluator
+(teal_evaluator.Ledger) instead of a real node, so deployments, escrow flows
+and load tests run offline and with deterministic timing.
+
+Supported endpoints:
+    GET  /health, /v2/status, /v2/status/wait-for-block-after/{round}
+    GET  /v2/transactions/params, /v2/blocks/{round}/txids
+    POST /v2/teal/compile
+    POST /v2/transactions                  (signed transactions or groups)
+    GET  /v2/transactions/pending/{txid}
+    GET  /v2/accounts/{address}
+    GET  /v2/accounts/{address}/applications/{app-id}
+    GET  /v2/applications/{app-id}, /v2/applications/{app-id}/box
+    GET  /v2/assets/{asset-id}
+
+`compile` returns the TEAL source wrapped in a marker instead of real AVM
+bytecode, which the ledger unwraps when the program is deployed. Program
+hashes stay stable, so the deployment manifest works unchanged.
+
+Blocks are produced on every submission (like a dev-mode node) or every
+`--block-time` seconds. `--latency`/`--jitter`/`--endpoint-latency` inject
+response delays drawn from a seeded RNG, so throughput and tail latency of
+the tooling can be measured reproducibly.
+
+Usage:
+    python3 local_algod.py --port 4190 --latency 20 --jitter 5 --seed 1
+    python3 deploy_contracts_fixed.py --env standin apply
+"""
+
+import re
+import sys
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+
+from teal_evaluator import Ledger, Txn, TealError, ZERO_ADDRESS
+
+DEFAULT_PORT = 4190
+GENESIS_ID = "ellora-standin-v1"
+GENESIS_HASH = hashlib.sha256(GENESIS_ID.encode()).digest()
+CONSENSUS_VERSION = "ellora-standin"
+MIN_FEE = 1000
+DISPENSER_FUNDS = 10 ** 15
+
+# Marker wrapped around TEAL source in place of assembled bytecode
+PROGRAM_MAGIC = b"\x00ELLORA-TEAL\x00"
+
+TXN_TYPES = {"pay", "axfer", "appl"}
+
+
+class RequestError(Exception):
+    """An error returned to the client as {"message": ...}"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def wrap_program(source):
+    """Stand-in 'bytecode' for a TEAL program"""
+    return PROGRAM_MAGIC + source.encode()
+
+
+def unwrap_program(program):
+    """TEAL source from stand-in bytecode"""
+    if not program:
+        return None
+    if not program.startswith(PROGRAM_MAGIC):
+        raise RequestError(400, "program was not compiled by this stand-in (missing TEAL marker)")
+    return program[len(PROGRAM_MAGIC):].decode()
+
+
+def b64(value):
+    return base64.b64encode(value).decode()
+
+
+def encode_key_values(state):
+    """algod TEAL key/value list for a state dict"""
+    items = []
+    for key, value in sorted(state.items()):
+        if isinstance(value, bytes):
+            encoded = {"type": 1, "bytes": b64(value), "uint": 0}
+        else:
+            encoded = {"type": 2, "bytes": "", "uint": value}
+        items.append({"key": b64(key), "value": encoded})
+    return items
+
+
+class LatencyModel:
+    """
+    Seeded response delays: base + exponential jitter, per endpoint
+
+    Delays are drawn in request order from one RNG, so a single-threaded
+    client sees the same latency sequence on every run with the same seed.
+    """
+
+    def __init__(self, base_ms=0.0, jitter_ms=0.0, per_endpoint=None, seed=0, sleep=time.sleep):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self.per_endpoint = dict(per_endpoint or {})
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sleep = sleep
+
+    def delay(self, endpoint):
+        base = self.per_endpoint.get(endpoint, self.base_ms)
+        with self.lock:
+            jitter = self.rng.expovariate(1.0 / self.jitter_ms) if self.jitter_ms else 0.0
+        return (base + jitter) / 1000.0
+
+    def wait(self, endpoint):
+        seconds = self.delay(endpoint)
+        if seconds > 0:
+            self.sleep(seconds)
+
+
+class LocalAlgod:
+    """Ledger state, block production and the algod API handlers"""
+
+    def __init__(self, block_time=0.0, verify_signatures=True, ledger=None):
+        self.ledger = ledger or Ledger(round=1, timestamp=int(time.time()))
+        self.block_time = block_time
+        self.verify_signatures = verify_signatures
+        self.lock = threading.RLock()
+        self.new_block = threading.Condition(self.lock)
+        self.transactions = {}  # txid -> pending/confirmed record
+        self.waiting = []  # txids applied but not yet in a block
+        self.blocks = {}  # round -> top-level txids committed in it
+        self._stopped = threading.Event()
+        if block_time > 0:
+            threading.Thread(target=self._produce_blocks, daemon=True).start()
+
+    # Accounts and assets ----------------------------------------------------
+
+    def fund(self, address, amount):
+        """Credit a 58-character address at genesis"""
+        from algosdk.encoding import decode_address
+
+        with self.lock:
+            self.ledger.fund(decode_address(address), amount)
+
+    def create_asset(self, creator, total, decimals=0, unit_name=""):
+        """Create an ASA held by `creator` (asset configuration transactions are not supported)"""
+        from algosdk.encoding import decode_address
+
+        with self.lock:
+            return self.ledger.create_asset(decode_address(creator), total, decimals, unit_name)
+
+    # Blocks -----------------------------------------------------------------
+
+    def _close_block(self):
+        """Advance one round and confirm everything applied since the last block"""
+        ledger = self.ledger
+        ledger.round += 1
+        ledger.timestamp = max(ledger.timestamp + 1, int(time.time()))
+        for tx_id in self.waiting:
+            self.transactions[tx_id]["confirmed-round"] = ledger.round
+        self.blocks[ledger.round] = self.waiting
+        self.waiting = []
+        self.new_block.notify_all()
+
+    def _produce_blocks(self):
+        while not self._stopped.wait(self.block_time):
+            with self.lock:
+                self._close_block()
+
+    def stop(self):
+        self._stopped.set()
+
+    # Transactions ------------------------------------------------------------
+
+    def _verify(self, stxn):
+        from algosdk import encoding
+        from nacl.exceptions import BadSignatureError
+        from nacl.signing import VerifyKey
+
+        if not getattr(stxn, "signature", None):
+            raise RequestError(400, "only single-signature transactions are supported")
+        signer = stxn.authorizing_address or stxn.transaction.sender
+        message = b"TX" + base64.b64decode(encoding.msgpack_encode(stxn.transaction))
+        try:
+            VerifyKey(encoding.decode_address(signer)).verify(message, base64.b64decode(stxn.signature))
+        except BadSignatureError:
+            raise RequestError(400, f"invalid signature for transaction {stxn.get_txid()}")
+
+    def _to_evaluator_txn(self, txn):
+        """Convert an algosdk Transaction into a teal_evaluator Txn"""
+        from algosdk.encoding import decode_address
+
+        def address(value):
+            return decode_address(value) if value else ZERO_ADDRESS
+
+        if txn.type not in TXN_TYPES:
+            raise RequestError(400, f"transaction type {txn.type} is not supported by the stand-in")
+        if txn.genesis_hash and base64.b64decode(txn.genesis_hash) != GENESIS_HASH:
+            raise RequestError(400, "genesis hash mismatch")
+        next_round = self.ledger.round + 1
+        if not txn.first_valid_round <= next_round <= txn.last_valid_round:
+            raise RequestError(400, f"txn dead: round {next_round} outside of "
+                                    f"{txn.first_valid_round}--{txn.last_valid_round}")
+
+        fields = dict(sender=address(txn.sender), type=txn.type, fee=txn.fee,
+                      note=txn.note or b"", first_valid=txn.first_valid_round,
+                      last_valid=txn.last_valid_round, rekey_to=address(txn.rekey_to))
+        if txn.type == "pay":
+            fields.update(receiver=address(txn.receiver), amount=txn.amt,
+                          close_remainder_to=address(txn.close_remainder_to))
+        elif txn.type == "axfer":
+            fields.update(xfer_asset=txn.index, asset_amount=txn.amount,
+                          asset_receiver=address(txn.receiver),
+                          asset_close_to=address(txn.close_assets_to),
+                          asset_sender=address(txn.revocation_target))
+        else:
+            global_schema = txn.global_schema
+            local_schema = txn.local_schema
+            fields.update(
+                app_id=txn.index or 0,
+                on_completion=int(txn.on_complete),
+                app_args=[bytes(arg) for arg in txn.app_args or []],
+                accounts=[address(a) for a in txn.accounts or []],
+                foreign_apps=list(txn.foreign_apps or []),
+                foreign_assets=list(txn.foreign_assets or []),
+                boxes=[(box.app_index, box.name) for box in txn.boxes or []],
+                approval_program=unwrap_program(txn.approval_program),
+                clear_program=unwrap_program(txn.clear_program),
+                global_schema=(global_schema.num_uints or 0, global_schema.num_byte_slices or 0)
+                if global_schema else (0, 0),
+                local_schema=(local_schema.num_uints or 0, local_schema.num_byte_slices or 0)
+                if local_schema else (0, 0),
+                extra_pages=txn.extra_pages or 0,
+            )
+        return Txn(**fields)
+
+    def send_raw(self, data):
+        """Apply a raw msgpack stream of signed transactions as one group"""
+        try:
+            stxns = self._decode_signed(data)
+        except RequestError:
+            raise
+        except Exception as e:
+            raise RequestError(400, f"could not decode transactions: {e}")
+
+        with self.lock:
+            tx_ids = [stxn.get_txid() for stxn in stxns]
+            for tx_id in tx_ids:
+                if tx_id in self.transactions:
+                    raise RequestError(400, f"transaction already in ledger: {tx_id}")
+            if len(stxns) > 1:
+                groups = {stxn.transaction.group for stxn in stxns}
+                if len(groups) != 1 or None in groups:
+                    raise RequestError(400, "transactions in a group must share one group ID")
+            if self.verify_signatures:
+                for stxn in stxns:
+                    self._verify(stxn)
+
+            group = [self._to_evaluator_txn(stxn.transaction) for stxn in stxns]
+            try:
+                self.ledger.submit(group)
+            except TealError as e:
+                raise RequestError(400, f"TransactionPool.Remember: transaction {tx_ids[0]}: "
+                                        f"logic eval error: {e}")
+
+            for tx_id, stxn, txn in zip(tx_ids, stxns, group):
+                self.transactions[tx_id] = {"stxn": stxn, "txn": txn, "confirmed-round": None}
+            self.waiting.extend(tx_ids)
+            if self.block_time <= 0:
+                self._close_block()
+        return tx_ids[0]
+
+    @staticmethod
+    def _decode_signed(data):
+        import msgpack
+        from algosdk.transaction import SignedTransaction
+
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(data)
+        stxns = [SignedTransaction.undictify(d) for d in unpacker]
+        if not 0 < len(stxns) <= 16:
+            raise RequestError(400, "expected 1 to 16 signed transactions")
+        return stxns
+
+    # Responses ----------------------------------------------------------------
+
+    def status(self):
+        ledger = self.ledger
+        return {"last-round": ledger.round, "time-since-last-round": 0, "catchup-time": 0,
+                "last-version": CONSENSUS_VERSION, "next-version": CONSENSUS_VERSION,
+                "next-version-round": ledger.round + 1, "next-version-supported": True,
+                "stopped-at-unsupported-round": False}
+
+    def wait_for_block_after(self, round_num, timeout=60.0):
+        with self.lock:
+            self.new_block.wait_for(lambda: self.ledger.round > round_num, timeout=timeout)
+            return self.status()
+
+    def block_txids(self, round_num):
+        with self.lock:
+            if not 0 < round_num <= self.ledger.round:
+                raise RequestError(404, f"failed to retrieve information from the ledger: round {round_num}")
+            return {"blockTxids": list(self.blocks.get(round_num, []))}
+
+    def suggested_params(self):
+        return {"consensus-version": CONSENSUS_VERSION, "fee": 0, "genesis-hash": b64(GENESIS_HASH),
+                "genesis-id": GENESIS_ID, "last-round": self.ledger.round, "min-fee": MIN_FEE}
+
+    def compile(self, source):
+        from algosdk import encoding
+
+        program = wrap_program(source)
+        try:
+            from teal_evaluator import Program
+            Program(source)
+        except TealError as e:
+            raise RequestError(400, f"compile error: {e}")
+        digest = encoding.checksum(b"Program" + program)
+        return {"hash": encoding.encode_address(digest), "result": b64(program)}
+
+    def _inner_info(self, txn):
+        info = {"txn": {"txn": {"type": txn.type, "snd": b64(txn.sender)}}}
+        if txn.type == "pay":
+            info["txn"]["txn"].update(rcv=b64(txn.receiver), amt=txn.amount)
+        elif txn.type == "axfer":
+            info["txn"]["txn"].update(arcv=b64(txn.asset_receiver), aamt=txn.asset_amount,
+                                      xaid=txn.xfer_asset)
+        if txn.logs:
+            info["logs"] = [b64(log) for log in txn.logs]
+        if txn.inner_txns:
+            info["inner-txns"] = [self._inner_info(inner) for inner in txn.inner_txns]
+        if txn.created_app_id:
+            info["application-index"] = txn.created_app_id
+        return info
+
+    def pending_transaction_info(self, tx_id):
+        with self.lock:
+            record = self.transactions.get(tx_id)
+            if record is None:
+                raise RequestError(404, "txn does not exist")
+            txn = record["txn"]
+            info = {"pool-error": ""}
+            info.update(self._inner_info(txn))
+            info["txn"]["sig"] = record["stxn"].signature
+            if record["confirmed-round"]:
+                info["confirmed-round"] = record["confirmed-round"]
+            return info
+
+    def _app_params(self, app_id):
+        ledger = self.ledger
+        app = ledger.apps[app_id]
+        return {
+            "creator": _encode_address(app.creator),
+            "approval-program": b64(wrap_program(app.approval.source)),
+            "clear-state-program": b64(wrap_program(app.clear.source)),
+            "extra-program-pages": app.extra_pages,
+            "global-state": encode_key_values(ledger.app_globals.get(app_id, {})),
+            "global-state-schema": {"num-uint": app.global_schema[0], "num-byte-slice": app.global_schema[1]},
+            "local-state-schema": {"num-uint": app.local_schema[0], "num-byte-slice": app.local_schema[1]},
+        }
+
+    def _local_state(self, address, app_id):
+        app = self.ledger.apps[app_id]
+        return {"id": app_id,
+                "key-value": encode_key_values(self.ledger.app_locals[(address, app_id)]),
+                "schema": {"num-uint": app.local_schema[0], "num-byte-slice": app.local_schema[1]}}
+
+    def account_info(self, address):
+        from algosdk.encoding import decode_address
+
+        key = decode_address(address)
+        with self.lock:
+            ledger = self.ledger
+            return {
+                "address": address,
+                "amount": ledger.balance(key),
+                "amount-without-pending-rewards": ledger.balance(key),
+                "min-balance": ledger.min_balance(key),
+                "round": ledger.round,
+                "status": "Offline",
+                "assets": [{"asset-id": asset_id, "amount": amount, "is-frozen": False}
+                           for (holder, asset_id), amount in sorted(ledger.holdings.items()) if holder == key],
+                "apps-local-state": [self._local_state(key, app_id)
+                                     for (holder, app_id) in sorted(ledger.app_locals) if holder == key],
+                "created-apps": [{"id": app_id, "params": self._app_params(app_id)}
+                                 for app_id, app in sorted(ledger.apps.items()) if app.creator == key],
+            }
+
+    def account_application_info(self, address, app_id):
+        from algosdk.encoding import decode_address
+
+        key = decode_address(address)
+        with self.lock:
+            ledger = self.ledger
+            if app_id not in ledger.apps:
+                raise RequestError(404, "application does not exist")
+            info = {"round": ledger.round}
+            if (key, app_id) in ledger.app_locals:
+                info["app-local-state"] = self._local_state(key, app_id)
+            if ledger.apps[app_id].creator == key:
+                info["created-app"] = self._app_params(app_id)
+            if len(info) == 1:
+                raise RequestError(404, "account application info not found")
+            return info
+
+    def application_info(self, app_id):
+        with self.lock:
+            if app_id not in self.ledger.apps:
+                raise RequestError(404, "application does not exist")
+            return {"id": app_id, "params": self._app_params(app_id)}
+
+    def application_box(self, app_id, name):
+        with self.lock:
+            box = self.ledger.boxes.get((app_id, name))
+            if box is None:
+                raise RequestError(404, "box not found")
+            return {"name": b64(name), "round": self.ledger.round, "value": b64(bytes(box))}
+
+    def asset_info(self, asset_id):
+        with self.lock:
+            asset = self.ledger.assets.get(asset_id)
+            if asset is None:
+                raise RequestError(404, "asset does not exist")
+            return {"index": asset_id, "params": {
+                "creator": _encode_address(asset["creator"]), "total": asset["total"],
+                "decimals": asset["decimals"], "unit-name": asset["unit_name"],
+                "default-frozen": False}}
+
+
+def _encode_address(key):
+    from algosdk.encoding import encode_address
+    return encode_address(key)
+
+
+def _parse_box_name(value):
+    encoding, _, data = value.partition(":")
+    if encoding == "b64":
+        return base64.b64decode(data)
+    if encoding == "str":
+        return data.encode()
+    raise RequestError(400, f"unsupported box name encoding {encoding}")
+
+
+ROUTES = [
+    ("GET", re.compile(r"^/health$"), "health"),
+    ("GET", re.compile(r"^/v2/status$"), "status"),
+    ("GET", re.compile(r"^/v2/status/wait-for-block-after/(\d+)$"), "wait_for_block"),
+    ("GET", re.compile(r"^/v2/transactions/params$"), "suggested_params"),
+    ("GET", re.compile(r"^/v2/blocks/(\d+)/txids$"), "block_txids"),
+    ("POST", re.compile(r"^/v2/teal/compile$"), "compile"),
+    ("POST", re.compile(r"^/v2/transactions$"), "send_transaction"),
+    ("GET", re.compile(r"^/v2/transactions/pending/([A-Z2-7]+)$"), "pending_transaction_info"),
+    ("GET", re.compile(r"^/v2/accounts/([A-Z2-7]{58})$"), "account_info"),
+    ("GET", re.compile(r"^/v2/accounts/([A-Z2-7]{58})/applications/(\d+)$"), "account_application_info"),
+    ("GET", re.compile(r"^/v2/applications/(\d+)$"), "application_info"),
+    ("GET", re.compile(r"^/v2/applications/(\d+)/box$"), "application_box"),
+    ("GET", re.compile(r"^/v2/assets/(\d+)$"), "asset_info"),
+]
+
+
+def dispatch(node, method, path, query, body):
+    """Route one request to the node; returns (endpoint, response dict)"""
+    for route_method, pattern, endpoint in ROUTES:
+        match = pattern.match(path)
+        if match and route_method == method:
+            break
+    else:
+        raise RequestError(404, f"{method} {path} is not supported by the stand-in")
+
+    args = match.groups()
+    if endpoint == "health":
+        return endpoint, {}
+    if endpoint == "status":
+        return endpoint, node.status()
+    if endpoint == "wait_for_block":
+        return endpoint, node.wait_for_block_after(int(args[0]))
+    if endpoint == "suggested_params":
+        return endpoint, node.suggested_params()
+    if endpoint == "block_txids":
+        return endpoint, node.block_txids(int(args[0]))
+    if endpoint == "compile":
+        return endpoint, node.compile(body.decode())
+    if endpoint == "send_transaction":
+        return endpoint, {"txId": node.send_raw(body)}
+    if endpoint == "pending_transaction_info":
+        return endpoint, node.pending_transaction_info(args[0])
+    if endpoint == "account_info":
+        return endpoint, node.account_info(args[0])
+    if endpoint == "account_application_info":
+        return endpoint, node.account_application_info(args[0], int(args[1]))
+    if endpoint == "application_info":
+        return endpoint, node.application_info(int(args[0]))
+    if endpoint == "application_box":
+        name = _parse_box_name(query.get("name", [""])[0])
+        return endpoint, node.application_box(int(args[0]), name)
+    return endpoint, node.asset_info(int(args[0]))
+
+
+def endpoint_for(method, path):
+    for route_method, pattern, endpoint in ROUTES:
+        if route_method == method and pattern.match(path):
+            return endpoint
+    return "unknown"
+
+
+def make_server(node, latency=None, port=DEFAULT_PORT, address="127.0.0.1"):
+    """Build a threading HTTP server serving `node` (not yet started)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    latency = latency or LatencyModel()
+
+    class AlgodHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _handle(self, method):
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            latency.wait(endpoint_for(method, url.path))
+            try:
+                _, response = dispatch(node, method, url.path, parse_qs(url.query), body)
+                status = 200
+            except RequestError as e:
+                status, response = e.status, {"message": str(e)}
+            except Exception as e:  # Surface stand-in bugs as algod-style errors
+                status, response = 500, {"message": f"{type(e).__name__}: {e}"}
+
+            payload = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((address, port), AlgodHandler)
+
+
+def serve_in_thread(node=None, latency=None, port=0):
+    """Start a stand-in on a background thread; returns (server, node, url)"""
+    node = node or LocalAlgod()
+    server = make_server(node, latency, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, bound_port = server.server_address[:2]
+    return server, node, f"http://{host}:{bound_port}"
+
+
+def parse_endpoint_latency(values):
+    per_endpoint = {}
+    for value in values or []:
+        name, _, ms = value.partition("=")
+        per_endpoint[name] = float(ms)
+    return per_endpoint
+
+
+def main():
+    from algosdk import account, mnemonic
+
+    parser = argparse.ArgumentParser(description="Local algod stand-in backed by the TEAL evaluator")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--block-time", type=float, default=0.0,
+                        help="seconds per block (default: a block per submission)")
+    parser.add_argument("--latency", type=float, default=0.0, help="base response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mean exponential jitter in ms")
+    parser.add_argument("--endpoint-latency", action="append", metavar="ENDPOINT=MS",
+                        help="base latency override, e.g. send_transaction=40 (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="latency RNG seed")
+    parser.add_argument("--fund", action="append", metavar="ADDRESS[=MICROALGOS]",
+                        help="fund an account at genesis (repeatable)")
+    parser.add_argument("--asset", action="append", metavar="UNIT[:DECIMALS]",
+                        help="create an ASA held by the dispenser (repeatable)")
+    parser.add_argument("--no-verify", action="store_true", help="skip signature verification")
+    args = parser.parse_args()
+
+    node = LocalAlgod(block_time=args.block_time, verify_signatures=not args.no_verify)
+    private_key, dispenser = account.generate_account()
+    node.fund(dispenser, DISPENSER_FUNDS)
+    for value in args.fund or []:
+        address, _, amount = value.partition("=")
+        node.fund(address, int(amount) if amount else DISPENSER_FUNDS // 1000)
+    for value in args.asset or []:
+        unit, _, decimals = value.partition(":")
+        asset_id = node.create_asset(dispenser, 10 ** 18, int(decimals or 6), unit)
+        print(f"🪙 Asset {unit} created with ID {asset_id}")
+
+    latency = LatencyModel(args.latency, args.jitter, parse_endpoint_latency(args.endpoint_latency),
+                           seed=args.seed)
+    server = make_server(node, latency, args.port)
+    print(f"🧪 algod stand-in listening on http://127.0.0.1:{args.port} (any token)")
+    print(f"💰 Dispenser {dispenser}")
+    print(f"   Mnemonic: {mnemonic.from_private_key(private_key)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        node.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
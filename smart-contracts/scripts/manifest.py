@@ -0,0 +1,110 @@
+"""
+Ellora Deployment Manifest
+
+Tracks what is deployed in every environment (testnet, mainnet, localnet):
+- App IDs and app addresses
+- SHA-256 hashes of the compiled approval/clear bytecode
+- Global/local state schema used at creation
+
+The deploy tooling diffs freshly compiled bytecode against these hashes so
+re-running a deployment only touches the contracts that actually changed.
+
+Entries recorded before hashes were tracked (the testnet apps in the
+committed deployments.json) have null hashes and schemas. The deployer
+backfills them from the on-chain app on the first plan, and aborts the plan
+if the app cannot be read; such an entry is never diffed as is.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+MANIFEST_PATH = os.path.join(os.path.dirname(__file__), '..', 'deployments.json')
+
+MANIFEST_VERSION = 1
+
+
+def program_hash(bytecode):
+    """SHA-256 hex digest of compiled program bytecode"""
+    return hashlib.sha256(bytecode).hexdigest()
+
+
+def schema_dict(schema):
+    """Normalise an algosdk StateSchema (or dict) into a plain dict"""
+    if isinstance(schema, dict):
+        return {"num_uints": schema["num_uints"], "num_byte_slices": schema["num_byte_slices"]}
+    return {"num_uints": schema.num_uints, "num_byte_slices": schema.num_byte_slices}
+
+
+class DeploymentManifest:
+    """Per-environment record of deployed Ellora applications"""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.data = {"version": MANIFEST_VERSION, "environments": {}}
+        self.load()
+
+    def load(self):
+        """Load the manifest if it exists"""
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.data = json.load(f)
+        return self.data
+
+    def save(self):
+        """Atomically write the manifest back to disk"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp_path, self.path)
+
+    def environment(self, name):
+        """Get (creating if missing) the record for an environment"""
+        return self.data["environments"].setdefault(name, {"apps": {}})
+
+    def get_app(self, env, name):
+        """Return the recorded app entry for `name` in `env`, or None"""
+        return self.environment(env)["apps"].get(name)
+
+    def record_app(self, env, name, app_id, app_address, approval_hash, clear_hash,
+                   global_schema, local_schema):
+        """Record a freshly created or updated application"""
+        entry = {
+            "app_id": app_id,
+            "app_address": app_address,
+            "approval_hash": approval_hash,
+            "clear_hash": clear_hash,
+            "global_schema": schema_dict(global_schema),
+            "local_schema": schema_dict(local_schema),
+            "updated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        self.environment(env)["apps"][name] = entry
+        return entry
+
+    def diff(self, env, name, approval_hash, clear_hash, global_schema, local_schema):
+        """
+        Compare compiled hashes and schema against the manifest
+
+        Returns one of:
+        - "create": nothing recorded for this environment yet
+        - "unchanged": bytecode and schema match what is deployed
+        - "update": bytecode changed, schema identical
+        - "recreate": schema changed (schemas are immutable on-chain)
+
+        Raises ValueError for an entry that was never backfilled: a missing
+        schema would otherwise read as a schema change and replace the app.
+        """
+        entry = self.get_app(env, name)
+        if not entry:
+            return "create"
+        if not all(entry.get(key) for key in ("approval_hash", "clear_hash", "global_schema", "local_schema")):
+            raise ValueError(f"{env} {name} app {entry['app_id']} has no recorded hashes or schema; "
+                             f"backfill it from the chain before diffing")
+        if (entry.get("global_schema") != schema_dict(global_schema) or
+                entry.get("local_schema") != schema_dict(local_schema)):
+            return "recreate"
+        if entry.get("approval_hash") == approval_hash and entry.get("clear_hash") == clear_hash:
+            return "unchanged"
+        return "update"
@@ -0,0 +1,397 @@
+"""
+Ellora Operator Metrics
+
+A small, dependency-free metrics layer for the deploy and ops tooling.
+
+`InstrumentedAlgod` wraps an algod client and records, per operation and
+per contract method:
+
+- request latency of every algod call, with retries on rate limits,
+  5xx responses and connection errors (reads only; submissions are never
+  retried here)
+- compile latency (PyTeal and algod stages)
+- submit latency, confirmation latency and rounds-to-confirm
+- fees paid and failure codes
+
+Metrics are rendered in the Prometheus text exposition format. They can be
+written to a file for the node_exporter textfile collector, or served over
+HTTP by long-running services.
+
+Usage:
+    ELLORA_METRICS_FILE=/var/lib/node_exporter/ellora.prom python3 deploy_contracts_fixed.py apply
+"""
+
+import os
+import time
+import atexit
+import bisect
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROUND_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+FEE_BUCKETS = (1000, 2000, 3000, 4000, 8000, 16000, 32000, 64000)
+
+# Status codes worth retrying: rate limiting and transient node errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _label_key(label_names, labels):
+    if set(labels) != set(label_names):
+        raise ValueError(f"expected labels {label_names}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in label_names)
+
+
+def _format_labels(label_names, key, extra=()):
+    pairs = list(zip(label_names, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.label_names, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(_label_key(self.label_names, labels), 0)
+
+    def samples(self):
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                yield self.name, _format_labels(self.label_names, key), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # key -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.label_names, labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        series = self.series.get(_label_key(self.label_names, labels))
+        return series[-1] if series else 0
+
+    def samples(self):
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    yield (f"{self.name}_bucket",
+                           _format_labels(self.label_names, key, [("le", _format_value(bound))]),
+                           cumulative)
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.label_names, key, [("le", "+Inf")]), series[-1])
+                yield f"{self.name}_sum", _format_labels(self.label_names, key), series[-2]
+                yield f"{self.name}_count", _format_labels(self.label_names, key), series[-1]
+
+
+class Registry:
+    """A set of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically write the metrics for the node_exporter textfile collector"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, address=""):
+        """Serve /metrics over HTTP from a daemon thread; returns the server"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((address, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+REGISTRY = Registry()
+
+
+def export_on_exit(path, registry=REGISTRY):
+    """Write the metrics file when the process exits"""
+    atexit.register(registry.write_textfile, path)
+
+
+def error_code(error):
+    """Short failure code for an exception: HTTP status, logic error or class name"""
+    code = getattr(error, "code", None)
+    message = str(error)
+    if "logic eval error" in message:
+        return f"{code or 400}:logic_eval"
+    if "overspend" in message:
+        return f"{code or 400}:overspend"
+    if isinstance(code, int):
+        return str(code)
+    return type(error).__name__
+
+
+def is_retryable(error):
+    """Rate limits, transient node errors and dropped connections"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in RETRY_STATUS_CODES
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+def transaction_method(txn):
+    """Label for a (signed) transaction: the app method name or transaction type"""
+    txn = getattr(txn, "transaction", txn)
+    if getattr(txn, "type", None) != "appl":
+        return getattr(txn, "type", "unknown")
+    if not txn.index:
+        return "create_application"
+    app_args = txn.app_args or []
+    if not app_args:
+        return "app_call"
+    name = app_args[0]
+    if isinstance(name, str):
+        return name
+    try:
+        decoded = name.decode()
+        if decoded.isprintable() and decoded.replace("_", "").isalnum():
+            return decoded
+    except UnicodeDecodeError:
+        pass
+    return name[:4].hex()  # ARC-4 selector
+
+
+class AlgodMetrics:
+    """The metric families recorded by InstrumentedAlgod"""
+
+    def __init__(self, registry=REGISTRY):
+        self.requests = registry.histogram(
+            "ellora_algod_request_seconds", "Latency of algod API calls", ("operation",))
+        self.compile = registry.histogram(
+            "ellora_compile_seconds", "Contract compile latency", ("stage",))
+        self.submit = registry.histogram(
+            "ellora_submit_seconds", "Latency of submitting a transaction or group", ("method",))
+        self.confirmation = registry.histogram(
+            "ellora_confirmation_seconds", "Time from submit to confirmation", ("method",))
+        self.rounds = registry.histogram(
+            "ellora_rounds_to_confirm", "Rounds between first valid round and confirmation",
+            ("method",), buckets=ROUND_BUCKETS)
+        self.fees = registry.histogram(
+            "ellora_fee_microalgos", "Fees paid per submitted transaction or group",
+            ("method",), buckets=FEE_BUCKETS)
+        self.retries = registry.counter(
+            "ellora_algod_retries_total", "algod calls retried after a transient error", ("operation",))
+        self.failures = registry.counter(
+            "ellora_failures_total", "Failed calls by operation, method and failure code",
+            ("operation", "method", "code"))
+
+
+class InstrumentedAlgod:
+    """
+    algod client proxy that records metrics and retries transient errors
+
+    Every callable attribute of the wrapped client is timed. Submissions
+    remember their send time so a later pending_transaction_info reporting
+    the confirmed round (as algosdk's wait_for_confirmation does) closes the
+    confirmation latency and rounds-to-confirm observations. Only the most
+    recent `max_pending` submissions are remembered, so txids that are never
+    polled do not accumulate.
+
+    Submissions are not retried: a send that failed on a timeout or 5xx may
+    still have reached the pool, and resending it would either fail with
+    "already in ledger" or stack on the caller's own resubmission backoff
+    (platform_queue). Callers own resubmission.
+    """
+
+    def __init__(self, client, registry=REGISTRY, max_retries=3, backoff=0.5, sleep=time.sleep,
+                 max_pending=4096):
+        self._client = client
+        self._metrics = AlgodMetrics(registry)
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._sleep = sleep
+        self._max_pending = max_pending
+        self._pending = OrderedDict()  # txid -> (sent at, first valid round, method)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self._call(name, attribute, args, kwargs)
+        return call
+
+    def _call(self, operation, function, args, kwargs, method="-", retry=True):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self._metrics.failures.inc(operation=operation, method=method, code=error_code(e))
+                if not retry or attempt >= self._max_retries or not is_retryable(e):
+                    raise
+                attempt += 1
+                self._metrics.retries.inc(operation=operation)
+                self._sleep(self._backoff * 2 ** (attempt - 1))
+                continue
+            self._metrics.requests.observe(time.perf_counter() - started, operation=operation)
+            return result
+
+    def compile(self, source, *args, **kwargs):
+        with self._metrics.compile.time(stage="algod"):
+            return self._call("compile", self._client.compile, (source,) + args, kwargs)
+
+    def _track(self, tx_id, txns, method, started):
+        now = time.perf_counter()
+        self._metrics.submit.observe(now - started, method=method)
+        self._metrics.fees.observe(sum(getattr(getattr(t, "transaction", t), "fee", 0) for t in txns),
+                                   method=method)
+        first_valid = getattr(getattr(txns[0], "transaction", txns[0]), "first_valid_round", 0)
+        self._pending[tx_id] = (now, first_valid, method)
+        while len(self._pending) > self._max_pending:
+            self._pending.popitem(last=False)
+
+    def send_transaction(self, txn, **kwargs):
+        method = transaction_method(txn)
+        started = time.perf_counter()
+        tx_id = self._call("send_transaction", self._client.send_transaction, (txn,), kwargs, method,
+                           retry=False)
+        self._track(tx_id, [txn], method, started)
+        return tx_id
+
+    def send_transactions(self, txns, **kwargs):
+        txns = list(txns)
+        method = next((transaction_method(t) for t in txns
+                       if getattr(getattr(t, "transaction", t), "type", None) == "appl"),
+                      transaction_method(txns[0]))
+        started = time.perf_counter()
+        tx_id = self._call("send_transactions", self._client.send_transactions, (txns,), kwargs, method,
+                           retry=False)
+        self._track(tx_id, txns, method, started)
+        return tx_id
+
+    def pending_transaction_info(self, tx_id, **kwargs):
+        info = self._call("pending_transaction_info", self._client.pending_transaction_info,
+                          (tx_id,), kwargs)
+        pending = self._pending.get(tx_id)
+        if pending and isinstance(info, dict):
+            sent_at, first_valid, method = pending
+            if info.get("confirmed-round"):
+                self._pending.pop(tx_id, None)
+                self._metrics.confirmation.observe(time.perf_counter() - sent_at, method=method)
+                self._metrics.rounds.observe(max(info["confirmed-round"] - first_valid, 0), method=method)
+            elif info.get("pool-error"):
+                self._pending.pop(tx_id, None)
+                self._metrics.failures.inc(operation="confirmation", method=method, code="pool_error")
+        return info
+
+
+def instrumented(operation, registry=REGISTRY):
+    """Decorator recording latency and failure codes of a tooling operation"""
+    import functools
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            seconds = registry.histogram("ellora_operation_seconds",
+                                         "Latency of deploy and ops steps", ("operation",))
+            try:
+                with seconds.time(operation=operation):
+                    return function(*args, **kwargs)
+            except Exception as e:
+                AlgodMetrics(registry).failures.inc(operation=operation, method="-", code=error_code(e))
+                raise
+        return wrapper
+    return decorator
@@ -0,0 +1,517 @@
+"""
+Ellora State Migration
+
+Replays reputation SBT local states and open escrow jobs from apps of a
+previous deployment into new apps, for the changes that cannot be shipped
+as an in-place update (state schemas are immutable on chain).
+
+`capture` reads every account opted in to the old SBT app (from the
+indexer at one round, or from --accounts) with its rating history box,
+and every open escrow job, into a plan file. `run` then replays the plan:
+
+- SBT records go to the new app's import_reputation, 15 per group behind
+  one payment covering their boxes' minimum balance. Accounts opted in to
+  the new app get local state directly; others claim it with
+  claim_reputation after opting in.
+- Each open job gets a fresh escrow app (16 creations per group), then
+  [funding, new.import_job, old.export_job] moves its state and unreleased
+  funds atomically, 5 jobs per group. A job linked to the old SBT app is
+  linked to the new one, so its settlement mints where reputation now is.
+
+The plan file is the migration's durable state: a group's txids are saved
+before it is sent, and every confirmed group is recorded, so an
+interrupted run resumes where it stopped without replaying anything. A
+group algod no longer reports is looked up on chain (indexer, or the
+blocks of its validity window) before it is given up on. Each escrow job
+is re-read before its group is built, and a job that changed since
+capture stops the run. Only escrow apps deployed with export_job support
+can be migrated.
+
+Usage:
+    python3 migrate_state.py capture --from-reputation 742004783 [--from-escrow 742004772 ...] -o migration.json
+    python3 migrate_state.py run --plan migration.json [--to-reputation <NEW_SBT_APP_ID>]
+    python3 migrate_state.py status --plan migration.json
+"""
+
+import os
+import sys
+import argparse
+import json
+import time
+
+from app_state import (
+    STATUS_RESOLVED, ZERO_ADDRESS, decode_state, escrow_import_args, history_box_name,
+    pack_reputation, sbt_state_from_local,
+)
+
+MAX_GROUP_SIZE = 16
+MIN_TXN_FEE = 1000
+
+INDEXERS = {
+    "testnet": "https://testnet-idx.algonode.cloud",
+    "mainnet": "https://mainnet-idx.algonode.cloud",
+}
+
+# Minimum balance of an app account, and of one ASA holding
+APP_MIN_BALANCE = 100000
+ASSET_MIN_BALANCE = 100000
+
+# Box minimum balances in the new SBT app (see reputation_sbt.py)
+IMPORT_BOX_MBR = 2500 + 400 * (1 + 32 + 40)
+HISTORY_BOX_MBR = 2500 + 400 * (1 + 32 + 164)
+
+SBT_BATCH = MAX_GROUP_SIZE - 1  # one funding payment per group
+ESCROW_BATCH = MAX_GROUP_SIZE // 3
+
+
+class MigrationPlan:
+    """Captured state and per-record progress, saved atomically as JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path) as f:
+            self.data = json.load(f)
+
+    @classmethod
+    def create(cls, path, data):
+        plan = cls.__new__(cls)
+        plan.path = path
+        plan.data = data
+        plan.save()
+        return plan
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp_path, self.path)
+
+    @property
+    def accounts(self):
+        return self.data["accounts"]
+
+    @property
+    def escrows(self):
+        return self.data["escrows"]
+
+    def progress(self):
+        """(done, total) for SBT accounts and escrow jobs"""
+        accounts = self.accounts.values()
+        escrows = self.escrows.values()
+        return ((sum(a["done"] for a in accounts), len(self.accounts)),
+                (sum(e["done"] for e in escrows), len(self.escrows)))
+
+
+def encode_job(job):
+    """JSON-safe copy of an escrow job dict"""
+    encoded = dict(job)
+    for key in ("client", "freelancer"):
+        encoded[key] = job[key].hex()
+    encoded["voters"] = [voter.hex() for voter in job["voters"]]
+    encoded["milestones"] = [list(record) for record in job["milestones"]]
+    return encoded
+
+
+def decode_job(encoded):
+    job = dict(encoded)
+    for key in ("client", "freelancer"):
+        job[key] = bytes.fromhex(encoded[key])
+    job["voters"] = [bytes.fromhex(voter) for voter in encoded["voters"]]
+    job["milestones"] = [tuple(record) for record in encoded["milestones"]]
+    return job
+
+
+def indexer_sbt_states(indexer_client, sbt_app_id, round_num):
+    """Yield (address, local state dict) for every account opted in at `round_num`"""
+    next_page = None
+    while True:
+        page = indexer_client.accounts(application_id=sbt_app_id, round_num=round_num,
+                                       limit=1000, next_page=next_page)
+        for account in page.get("accounts", []):
+            for local in account.get("apps-local-state", []):
+                if local["id"] == sbt_app_id and not local.get("deleted"):
+                    yield account["address"], decode_state(local.get("key-value"))
+        next_page = page.get("next-token")
+        if not next_page:
+            return
+
+
+def capture(algod_client, sbt_app_id, escrow_app_ids, indexer_client=None, addresses=()):
+    """
+    Read the state to migrate into a plan dict
+
+    SBT local states come from the indexer at the capture round when an
+    indexer is given (one consistent view), otherwise from algod for the
+    listed addresses. Resolved or unfunded escrow jobs have nothing to move
+    and are skipped.
+    """
+    from algosdk.encoding import decode_address
+    from app_state import read_escrow_job, read_history_box, read_sbt_state
+
+    round_num = algod_client.status()["last-round"]
+    accounts = {}
+    if not sbt_app_id:
+        states = ()
+    elif indexer_client is not None:
+        states = ((address, sbt_state_from_local(decode_address(address), state))
+                  for address, state in indexer_sbt_states(indexer_client, sbt_app_id, round_num))
+    else:
+        states = ((address, read_sbt_state(algod_client, decode_address(address), sbt_app_id))
+                  for address in addresses)
+    for address, state in states:
+        if state is None:
+            continue
+        history = read_history_box(algod_client, sbt_app_id, decode_address(address))
+        accounts[address] = {
+            "record": pack_reputation(state).hex(),
+            "history": history.hex() if history else None,
+            "done": False,
+        }
+
+    escrows = {}
+    skipped = 0
+    for app_id in escrow_app_ids:
+        job = read_escrow_job(algod_client, app_id)
+        if job["client"] == ZERO_ADDRESS or job["status"] == STATUS_RESOLVED:
+            skipped += 1
+            continue
+        escrows[str(app_id)] = {"job": encode_job(job), "new_app": None, "done": False}
+
+    return {
+        "round": round_num,
+        "from_reputation": sbt_app_id,
+        "to_reputation": None,
+        "accounts": accounts,
+        "escrows": escrows,
+        "skipped_escrows": skipped,
+        "pending": None,
+    }
+
+
+class Migrator:
+    """Replays a MigrationPlan, one confirmed group at a time"""
+
+    def __init__(self, plan, algod_client, private_key, address, escrow_programs=None,
+                 sleep=time.sleep, indexer_client=None):
+        self.plan = plan
+        self.algod = algod_client
+        self.indexer = indexer_client
+        self.private_key = private_key
+        self.address = address
+        self.escrow_programs = escrow_programs
+        self.sleep = sleep
+        self.started = time.perf_counter()
+        self.sent_records = 0
+
+    # Submission and resume -------------------------------------------------
+
+    def _send(self, kind, keys, txns):
+        """Record a group as pending, send it and wait for it"""
+        from algosdk.transaction import assign_group_id
+
+        if len(txns) > 1:
+            txns = assign_group_id(txns)
+        self.plan.data["pending"] = {
+            "kind": kind,
+            "keys": keys,
+            "txids": [txn.get_txid() for txn in txns],
+            "first_valid": txns[0].first_valid_round,
+            "last_valid": txns[0].last_valid_round,
+        }
+        self.plan.save()
+        self.algod.send_transactions([txn.sign(self.private_key) for txn in txns])
+        self._settle_pending(wait=True)
+        self.sent_records += len(keys)
+        self.report()
+
+    def _settle_pending(self, wait=False):
+        """
+        Resolve the group recorded before the last send: apply it if it
+        confirmed, forget it if it can no longer confirm
+
+        algod drops confirmed transactions from its pending cache, so a
+        group it does not know is looked up on chain before it is forgotten.
+        """
+        from algosdk.error import AlgodHTTPError
+        from platform_queue import find_confirmed_round
+
+        pending = self.plan.data.get("pending")
+        blocks = {}
+        while pending:
+            try:
+                info = self.algod.pending_transaction_info(pending["txids"][0])
+            except AlgodHTTPError as e:
+                if e.code != 404:
+                    raise
+                info = {}
+            if info.get("confirmed-round"):
+                self._apply(pending, info["confirmed-round"])
+                break
+            if info.get("pool-error"):
+                self.plan.data["pending"] = None
+                self.plan.save()
+                raise RuntimeError(f"{pending['kind']} group rejected: {info['pool-error']}")
+            last_round = self.algod.status()["last-round"]
+            if not info:
+                # Plans saved before first_valid was recorded: a window is at most 1000 rounds
+                first_valid = pending.get("first_valid") or max(1, pending["last_valid"] - 1000)
+                confirmed_round = find_confirmed_round(self.algod, pending["txids"][0], first_valid,
+                                                       min(pending["last_valid"], last_round),
+                                                       self.indexer, blocks)
+                if confirmed_round:
+                    self._apply(pending, confirmed_round)
+                    break
+                if last_round > pending["last_valid"]:
+                    break
+                if not wait:
+                    # Not on chain and still valid: it was never sent
+                    break
+            self.algod.status_after_block(last_round)
+
+        self.plan.data["pending"] = None
+        self.plan.save()
+
+    def _apply(self, pending, confirmed_round):
+        if pending["kind"] == "sbt":
+            for address in pending["keys"]:
+                self.plan.accounts[address]["done"] = True
+        elif pending["kind"] == "create":
+            for old_app, txid in zip(pending["keys"], pending["txids"]):
+                new_app = self._created_app(txid, confirmed_round, f"ellora-migrate:{old_app}".encode())
+                self.plan.escrows[old_app]["new_app"] = new_app
+        elif pending["kind"] == "escrow":
+            for old_app in pending["keys"]:
+                self.plan.escrows[old_app]["done"] = True
+
+    def _created_app(self, txid, confirmed_round, note):
+        """App ID created by `txid`, also once algod has forgotten the transaction"""
+        import msgpack
+        from algosdk.error import AlgodHTTPError
+
+        try:
+            return self.algod.pending_transaction_info(txid)["application-index"]
+        except AlgodHTTPError as e:
+            if e.code != 404:
+                raise
+        if self.indexer is not None:
+            return self.indexer.transaction(txid)["transaction"]["created-application-index"]
+        # Each creation carries a unique note, so it is found in its block
+        block = msgpack.unpackb(self.algod.block_info(confirmed_round, response_format="msgpack"),
+                                raw=False, strict_map_key=False)
+        for entry in block["block"].get("txns", []):
+            if entry["txn"].get("note") == note and entry.get("apid"):
+                return entry["apid"]
+        raise RuntimeError(f"transaction {txid} confirmed in round {confirmed_round} but created no app")
+
+    def report(self):
+        (sbt_done, sbt_total), (escrow_done, escrow_total) = self.plan.progress()
+        elapsed = time.perf_counter() - self.started
+        rate = self.sent_records / elapsed if elapsed else 0
+        remaining = (sbt_total - sbt_done) + (escrow_total - escrow_done)
+        eta = f", ETA {remaining / rate:.0f}s" if rate and remaining else ""
+        print(f"🔁 SBT {sbt_done}/{sbt_total} accounts, escrow {escrow_done}/{escrow_total} jobs "
+              f"({rate:.1f} records/s{eta})")
+
+    # Replay ----------------------------------------------------------------
+
+    def migrate_reputation(self, to_app):
+        from algosdk.encoding import decode_address
+        from algosdk.logic import get_application_address
+        from algosdk.transaction import ApplicationNoOpTxn, PaymentTxn
+
+        todo = [address for address, account in self.plan.accounts.items() if not account["done"]]
+        for start in range(0, len(todo), SBT_BATCH):
+            batch = todo[start:start + SBT_BATCH]
+            params = self.algod.suggested_params()
+            funding = 0
+            calls = []
+            for address in batch:
+                account = self.plan.accounts[address]
+                public_key = decode_address(address)
+                app_args = [b"import_reputation", bytes.fromhex(account["record"])]
+                boxes = [(0, b"m" + public_key)]
+                funding += IMPORT_BOX_MBR
+                if account["history"]:
+                    app_args.append(bytes.fromhex(account["history"]))
+                    boxes.append((0, history_box_name(public_key)))
+                    funding += HISTORY_BOX_MBR
+                calls.append(ApplicationNoOpTxn(sender=self.address, sp=params, index=to_app,
+                                                app_args=app_args, accounts=[address], boxes=boxes))
+            payment = PaymentTxn(sender=self.address, sp=params, receiver=get_application_address(to_app),
+                                 amt=funding)
+            self._send("sbt", batch, [payment] + calls)
+
+    def create_escrow_apps(self):
+        from algosdk.transaction import ApplicationCreateTxn, OnComplete
+        from deploy_contracts_fixed import CONTRACTS, state_schema
+
+        todo = [old for old, escrow in self.plan.escrows.items() if not escrow["new_app"]]
+        if not todo:
+            return
+        spec = CONTRACTS["escrow"]
+        approval_program, clear_program = self.escrow_programs
+        for start in range(0, len(todo), MAX_GROUP_SIZE):
+            batch = todo[start:start + MAX_GROUP_SIZE]
+            params = self.algod.suggested_params()
+            txns = [ApplicationCreateTxn(sender=self.address, sp=params, on_complete=OnComplete.NoOpOC,
+                                         approval_program=approval_program, clear_program=clear_program,
+                                         global_schema=state_schema(spec["global_schema"]),
+                                         local_schema=state_schema(spec["local_schema"]),
+                                         note=f"ellora-migrate:{old}".encode())
+                    for old in batch]
+            self._send("create", batch, txns)
+
+    def migrate_escrows(self, to_reputation=None):
+        from algosdk.encoding import encode_address
+        from algosdk.logic import get_application_address
+        from algosdk.transaction import ApplicationNoOpTxn, PaymentTxn
+        from app_state import read_escrow_job
+        from escrow_jobs import with_flat_fee
+
+        todo = [old for old, escrow in self.plan.escrows.items() if escrow["new_app"] and not escrow["done"]]
+        for start in range(0, len(todo), ESCROW_BATCH):
+            batch = todo[start:start + ESCROW_BATCH]
+            params = self.algod.suggested_params()
+            pooled = with_flat_fee(params, 2 * MIN_TXN_FEE)
+            txns = []
+            for old in batch:
+                escrow = self.plan.escrows[old]
+                # export_job only accepts an import of the live job; refuse a
+                # stale plan up front instead of sending a doomed group
+                if encode_job(read_escrow_job(self.algod, int(old))) != escrow["job"]:
+                    raise RuntimeError(f"escrow app {old} changed since the capture at round "
+                                       f"{self.plan.data['round']}; capture a new plan")
+                job = decode_job(escrow["job"])
+                if to_reputation and job["sbt_app"] == self.plan.data["from_reputation"]:
+                    job["sbt_app"] = to_reputation
+                new_app = escrow["new_app"]
+                assets = [job["asset"]] if job["asset"] else None
+                parties = [encode_address(job[party]) for party in ("client", "freelancer")
+                           if job[party] != ZERO_ADDRESS]
+                txns.append(PaymentTxn(sender=self.address, sp=params, receiver=get_application_address(new_app),
+                                       amt=APP_MIN_BALANCE + (ASSET_MIN_BALANCE if job["asset"] else 0)))
+                txns.append(ApplicationNoOpTxn(sender=self.address, sp=pooled if job["asset"] else params,
+                                               index=new_app, app_args=escrow_import_args(job),
+                                               accounts=parties, foreign_assets=assets))
+                txns.append(ApplicationNoOpTxn(sender=self.address, sp=pooled, index=int(old),
+                                               app_args=[b"export_job"],
+                                               foreign_apps=[new_app] + ([job["sbt_app"]] if job["sbt_app"] else []),
+                                               foreign_assets=assets))
+            self._send("escrow", batch, txns)
+
+    def run(self, to_reputation=None):
+        self._settle_pending()
+        if to_reputation:
+            self.migrate_reputation(to_reputation)
+        if self.plan.escrows:
+            self.create_escrow_apps()
+            self.migrate_escrows(to_reputation)
+        self.report()
+
+
+def load_deployer():
+    from algosdk import account, mnemonic
+
+    phrase = os.environ.get("ELLORA_DEPLOYER_MNEMONIC") or input("🔑 Enter the platform mnemonic: ").strip()
+    private_key = mnemonic.to_private_key(phrase)
+    return private_key, account.address_from_private_key(private_key)
+
+
+def cmd_capture(args, client):
+    indexer_client = None
+    if not args.accounts and args.indexer:
+        from algosdk.v2client import indexer
+        indexer_client = indexer.IndexerClient("", args.indexer)
+
+    data = capture(client, args.from_reputation, args.from_escrow, indexer_client, args.accounts)
+    MigrationPlan.create(args.output, data)
+    print(f"📸 Captured round {data['round']}: {len(data['accounts'])} SBT accounts, "
+          f"{len(data['escrows'])} open escrow jobs ({data['skipped_escrows']} resolved/unfunded skipped)")
+    print(f"💾 Plan written to {args.output}")
+
+
+def cmd_run(args, client):
+    from deploy_contracts_fixed import ContractDeployer, NETWORKS
+    from manifest import DeploymentManifest
+
+    plan = MigrationPlan(args.plan)
+    to_reputation = args.to_reputation or plan.data.get("to_reputation")
+    linked = any(decode_job(escrow["job"])["sbt_app"] == plan.data["from_reputation"]
+                 for escrow in plan.escrows.values())
+    if not to_reputation and (plan.accounts or linked):
+        entry = DeploymentManifest().get_app(args.env, "reputation")
+        if entry and entry["app_id"] != plan.data["from_reputation"]:
+            to_reputation = entry["app_id"]
+    if (plan.accounts or linked) and not to_reputation:
+        print("❌ No new reputation app: pass --to-reputation or deploy one with deploy_contracts_fixed.py apply")
+        return 1
+    plan.data["to_reputation"] = to_reputation
+    plan.save()
+
+    private_key, address = load_deployer()
+    escrow_programs = None
+    if any(not escrow["new_app"] for escrow in plan.escrows.values()):
+        deployer = ContractDeployer(private_key=private_key, algod_address=NETWORKS[args.env][0],
+                                    algod_token=NETWORKS[args.env][1])
+        escrow_programs = deployer.compile_contract("escrow")
+
+    indexer_client = None
+    if args.indexer:
+        from algosdk.v2client import indexer
+        indexer_client = indexer.IndexerClient("", args.indexer)
+
+    migrator = Migrator(plan, client, private_key, address, escrow_programs, indexer_client=indexer_client)
+    migrator.run(to_reputation)
+    print("✅ Migration complete")
+
+
+def cmd_status(args, client):
+    plan = MigrationPlan(args.plan)
+    (sbt_done, sbt_total), (escrow_done, escrow_total) = plan.progress()
+    print(f"📸 Round {plan.data['round']}: reputation {plan.data['from_reputation']} -> "
+          f"{plan.data.get('to_reputation') or '-'}")
+    print(f"🏆 SBT accounts {sbt_done}/{sbt_total}, 📋 escrow jobs {escrow_done}/{escrow_total}")
+    for old, escrow in plan.escrows.items():
+        state = "done" if escrow["done"] else ("created" if escrow["new_app"] else "pending")
+        print(f"   App {old} -> {escrow['new_app'] or '-'} ({state})")
+    if plan.data.get("pending"):
+        print(f"⏳ A {plan.data['pending']['kind']} group was in flight; `run` settles it first")
+
+
+def main(argv=None):
+    from deploy_contracts_fixed import NETWORKS, create_algod_client
+
+    parser = argparse.ArgumentParser(description="Migrate Ellora SBT and escrow state into new apps")
+    parser.add_argument("--env", default="testnet", choices=sorted(NETWORKS))
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    capture_cmd = subcommands.add_parser("capture", help="read the state to migrate into a plan file")
+    capture_cmd.add_argument("--from-reputation", type=int, default=0, help="old reputation SBT app ID")
+    capture_cmd.add_argument("--from-escrow", nargs="*", type=int, default=[], help="old escrow app IDs")
+    capture_cmd.add_argument("--accounts", nargs="*", default=[],
+                             help="SBT accounts to read from algod instead of the indexer")
+    capture_cmd.add_argument("--indexer", help="indexer URL (default: public indexer for --env)")
+    capture_cmd.add_argument("-o", "--output", default="migration.json")
+    capture_cmd.set_defaults(func=cmd_capture)
+
+    run = subcommands.add_parser("run", help="replay (or resume) a plan into the new apps")
+    run.add_argument("--plan", default="migration.json")
+    run.add_argument("--to-reputation", type=int, help="new reputation SBT app ID (default: manifest)")
+    run.add_argument("--indexer", help="indexer URL for looking up groups algod no longer reports "
+                                       "(default: public indexer for --env)")
+    run.set_defaults(func=cmd_run)
+
+    status = subcommands.add_parser("status", help="show a plan's progress")
+    status.add_argument("--plan", default="migration.json")
+    status.set_defaults(func=cmd_status)
+
+    args = parser.parse_args(argv)
+    if args.command in ("capture", "run") and args.indexer is None:
+        args.indexer = INDEXERS.get(args.env)
+    client = None if args.command == "status" else create_algod_client(*NETWORKS[args.env])
+    return args.func(args, client)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
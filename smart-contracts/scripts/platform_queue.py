@@ -0,0 +1,555 @@
+"""
+Ellora Platform Wallet Submission Queue
+
+The platform address is the only sender allowed to call mint_sbt and
+update_rating on the reputation app, and it also funds and links escrow
+apps, so every script acting as the platform funnels through one account
+and concurrent scripts used to step on each other. This queue makes that
+wallet single-writer:
+
+- Producers (any process) enqueue unsigned transactions with a priority
+  into a SQLite database. Payout-related work is drained first.
+- One worker, guarded by an exclusive lock file, re-stamps the validity
+  window from fresh suggested params, packs bundles into groups of up to
+  16 transactions, signs and sends them.
+- The stamped transaction and its txid are committed before sending, so
+  after a crash the same bytes are re-signed (same txid, so a resend is
+  idempotent) or, once the window has passed unconfirmed, the work goes
+  back to pending. algod forgets confirmed transactions, so "unknown to
+  the node" is only trusted after the indexer or the blocks of the
+  validity window show the txid was never committed. Payouts also carry a
+  lease, so two stampings of the same row can never both be committed.
+- A token bucket keeps the worker under the node's request rate, and rate
+  limits (HTTP 429) or transient errors back it off exponentially.
+
+Usage:
+    python3 platform_queue.py enqueue-mint   --sbt-app-id 742004783 --address <ADDR> --rating 5
+    python3 platform_queue.py enqueue-rating --sbt-app-id 742004783 --address <ADDR> --outcome 1
+    python3 platform_queue.py enqueue-fund   --app-id 742004772 --amount 0.5
+    python3 platform_queue.py run [--follow] [--rate 10]
+    python3 platform_queue.py status
+"""
+
+import os
+import sys
+import argparse
+import hashlib
+import sqlite3
+import time
+
+from metrics import REGISTRY, export_on_exit, is_retryable
+
+QUEUE_PATH = os.path.join(os.path.dirname(__file__), '..', 'platform_queue.db')
+
+MAX_GROUP_SIZE = 16
+MICROALGOS_PER_ALGO = 1000000
+
+# Lower drains first
+PRIORITY_PAYOUT = 0
+PRIORITY_REPUTATION = 10
+PRIORITY_ADMIN = 20
+
+PENDING = "pending"
+SENT = "sent"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+EXPIRED = "expired"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS txns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bundle INTEGER,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    label TEXT,
+    txn TEXT NOT NULL,
+    not_after INTEGER,
+    txid TEXT,
+    last_valid INTEGER,
+    confirmed_round INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    enqueued_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS txns_by_state ON txns (state, priority, bundle);
+"""
+
+QUEUE_EVENTS = REGISTRY.counter("ellora_queue_transactions_total",
+                                "Platform queue transactions by resulting state", ("state",))
+
+
+def find_confirmed_round(algod_client, txid, first_valid, last_round, indexer_client=None,
+                         blocks=None, request=None):
+    """
+    Round in which `txid` was committed, or None if it is not on chain
+
+    A 404 from pending_transaction_info does not mean a transaction never
+    landed: algod drops confirmed transactions from its pending cache. A
+    transaction can only be committed between its first valid round and
+    `last_round` (its last valid round, or the latest round if earlier),
+    so the indexer is asked first and the window blocks the indexer has
+    not caught up with are scanned on algod. `blocks` caches {round:
+    txids} across lookups; `request(function, *args)` wraps every call
+    (e.g. a rate limiter).
+    """
+    from algosdk.error import IndexerHTTPError
+
+    request = request or (lambda function, *args: function(*args))
+    blocks = {} if blocks is None else blocks
+    first = first_valid
+    if indexer_client is not None:
+        try:
+            found = request(indexer_client.transaction, txid)
+            return found["transaction"].get("confirmed-round")
+        except IndexerHTTPError as e:
+            if e.code != 404:
+                raise
+        first = max(first, request(indexer_client.health)["round"] + 1)
+    for round_num in range(first, last_round + 1):
+        if round_num not in blocks:
+            blocks[round_num] = set(request(algod_client.get_block_txids, round_num)["blockTxids"] or ())
+        if txid in blocks[round_num]:
+            return round_num
+    return None
+
+
+class TokenBucket:
+    """Blocking rate limiter: `rate` requests per second with bursts of `burst`"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+
+    def acquire(self):
+        while True:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            self.sleep((1 - self.tokens) / self.rate)
+
+
+class SubmissionQueue:
+    """SQLite-backed queue of platform wallet transactions"""
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def enqueue(self, txns, priority=PRIORITY_ADMIN, label=None, not_after=None):
+        """
+        Queue unsigned transactions as one bundle
+
+        A bundle always lands in a single group, so transactions that must
+        be atomic are enqueued together. `not_after` is the last round the
+        work is still wanted; later it is marked expired instead of sent.
+        Returns the bundle id.
+        """
+        from algosdk import encoding
+
+        txns = txns if isinstance(txns, (list, tuple)) else [txns]
+        if not 0 < len(txns) <= MAX_GROUP_SIZE:
+            raise ValueError(f"a bundle holds 1 to {MAX_GROUP_SIZE} transactions, got {len(txns)}")
+        now = time.time()
+        with self.db:
+            bundle = None
+            for txn in txns:
+                txn.group = None
+                row = self.db.execute(
+                    "INSERT INTO txns (bundle, priority, state, label, txn, not_after, enqueued_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (bundle, priority, PENDING, label, encoding.msgpack_encode(txn), not_after, now, now))
+                if bundle is None:
+                    bundle = row.lastrowid
+                    self.db.execute("UPDATE txns SET bundle = ? WHERE id = ?", (bundle, bundle))
+        QUEUE_EVENTS.inc(len(txns), state=PENDING)
+        return bundle
+
+    def counts(self):
+        """Number of queued transactions per state"""
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM txns GROUP BY state"))
+
+    def failures(self, limit=10):
+        return self.db.execute(
+            "SELECT id, label, error FROM txns WHERE state = ? ORDER BY updated_at DESC LIMIT ?",
+            (FAILED, limit)).fetchall()
+
+    def bundles(self, state):
+        """{bundle: [row]} in drain order for one state"""
+        bundles = {}
+        for row in self.db.execute(
+                "SELECT id, bundle, priority, txn, not_after, txid, last_valid, attempts FROM txns"
+                " WHERE state = ? ORDER BY priority, bundle, id", (state,)):
+            bundles.setdefault(row[1], []).append(row)
+        return bundles
+
+    def set_state(self, ids, state, **fields):
+        if not ids:
+            return
+        assignments = ", ".join(["state = ?", "updated_at = ?"] + [f"{name} = ?" for name in fields])
+        values = [state, time.time()] + list(fields.values())
+        with self.db:
+            self.db.executemany(f"UPDATE txns SET {assignments} WHERE id = ?",
+                                [values + [row_id] for row_id in ids])
+        QUEUE_EVENTS.inc(len(ids), state=state)
+
+    def mark_sent(self, stamped):
+        """Record the stamped transactions and txids of a group before it is sent"""
+        from algosdk import encoding
+
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                "UPDATE txns SET state = ?, txn = ?, txid = ?, last_valid = ?, attempts = attempts + 1,"
+                " error = NULL, updated_at = ? WHERE id = ?",
+                [(SENT, encoding.msgpack_encode(txn), txn.get_txid(), txn.last_valid_round, now, row_id)
+                 for row_id, txn in stamped])
+        QUEUE_EVENTS.inc(len(stamped), state=SENT)
+
+
+class QueueWorker:
+    """
+    Single writer that drains a SubmissionQueue for the platform wallet
+
+    Only one worker per queue runs at a time; a second one fails to take
+    the lock file instead of racing the first on the same account.
+    """
+
+    def __init__(self, queue, algod_client, private_key, address, rate=10.0,
+                 max_inflight=4, backoff=1.0, max_backoff=60.0, sleep=time.sleep, indexer_client=None):
+        self.queue = queue
+        self.algod = algod_client
+        self.indexer = indexer_client
+        self.private_key = private_key
+        self.address = address
+        self.limiter = TokenBucket(rate, sleep=sleep)
+        self.max_inflight = max_inflight
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cooldown = 0.0
+        self.sleep = sleep
+        self.lock_file = None
+
+    def acquire_lock(self):
+        import fcntl
+
+        self.lock_file = open(self.queue.path + ".lock", "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock_file.close()
+            self.lock_file = None
+            raise RuntimeError(f"another worker is draining {self.queue.path}")
+
+    def release_lock(self):
+        if self.lock_file:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def _request(self, function, *args):
+        """Call algod under the rate limit, backing off on retryable errors"""
+        while True:
+            self.limiter.acquire()
+            try:
+                result = function(*args)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.cooldown = min(self.max_backoff, self.cooldown * 2 or self.backoff)
+                print(f"⏳ algod {getattr(e, 'code', type(e).__name__)}, backing off {self.cooldown:.1f}s")
+                self.sleep(self.cooldown)
+                continue
+            self.cooldown = 0.0
+            return result
+
+    def _sign(self, txns):
+        return [txn.sign(self.private_key) for txn in txns]
+
+    def reconcile(self, last_round):
+        """
+        Settle sent transactions: confirmed, rejected by the pool, resent
+        (still valid, same txid) or returned to pending once expired
+
+        A group algod no longer reports is looked up on chain first; only
+        one that is provably absent from its validity window is resent or,
+        once the window has passed, returned to pending.
+        """
+        from algosdk import encoding
+        from algosdk.error import AlgodHTTPError
+
+        inflight = 0
+        blocks = {}
+        for rows in self.queue.bundles(SENT).values():
+            ids = [row[0] for row in rows]
+            txid = rows[0][5]
+            try:
+                info = self._request(self.algod.pending_transaction_info, txid)
+            except AlgodHTTPError as e:
+                if e.code != 404:
+                    raise
+                info = {}
+            if info.get("confirmed-round"):
+                self.queue.set_state(ids, CONFIRMED, confirmed_round=info["confirmed-round"])
+                continue
+            if info.get("pool-error"):
+                self.queue.set_state(ids, FAILED, error=info["pool-error"])
+                continue
+            if info:
+                inflight += 1
+                continue
+
+            txns = [encoding.msgpack_decode(row[3]) for row in rows]
+            last_valid = min(row[6] for row in rows)
+            confirmed_round = find_confirmed_round(self.algod, txid, txns[0].first_valid_round,
+                                                   min(last_valid, last_round), self.indexer, blocks,
+                                                   self._request)
+            if confirmed_round:
+                self.queue.set_state(ids, CONFIRMED, confirmed_round=confirmed_round)
+            elif last_round > last_valid:
+                self.queue.set_state(ids, PENDING)
+            else:
+                # Not on chain but still valid: the worker stopped between
+                # committing and sending. Same bytes, same txid.
+                error = self._send(txns)
+                if error is None:
+                    inflight += 1
+                elif "already in ledger" in error:
+                    # Committed after the rounds scanned above
+                    self.queue.set_state(ids, CONFIRMED)
+                else:
+                    self.queue.set_state(ids, FAILED, error=error)
+        return inflight
+
+    def _stamp(self, rows, params):
+        """Fresh validity window (capped by not_after) for one group"""
+        from algosdk import encoding
+        from algosdk.transaction import assign_group_id
+
+        last_valid = min([params.last] + [row[4] for row in rows if row[4] is not None])
+        txns = []
+        for row in rows:
+            txn = encoding.msgpack_decode(row[3])
+            txn.first_valid_round = params.first
+            txn.last_valid_round = last_valid
+            txn.genesis_hash = params.gh
+            txn.group = None
+            # Identical calls (two mints of the same rating) stamped in the
+            # same window would share a txid; the row id tells them apart
+            if not txn.note:
+                txn.note = f"ellora-queue:{row[0]}".encode()
+            # Payouts also hold a lease derived from the row id: however it
+            # is re-stamped, no two copies with overlapping windows commit
+            if row[2] <= PRIORITY_PAYOUT and not txn.lease:
+                txn.lease = hashlib.sha256(f"ellora-queue:{row[0]}".encode()).digest()
+            txns.append(txn)
+        return assign_group_id(txns) if len(txns) > 1 else txns
+
+    def _send(self, txns):
+        from algosdk.error import AlgodHTTPError
+
+        try:
+            self._request(self.algod.send_transactions, self._sign(txns))
+        except AlgodHTTPError as e:
+            return str(e)
+        return None
+
+    def _submit(self, bundles, params):
+        """
+        Send bundles as one group; if the node rejects it, split it so one
+        bad bundle only fails itself
+        """
+        rows = [row for bundle in bundles for row in bundle]
+        txns = self._stamp(rows, params)
+        self.queue.mark_sent(list(zip([row[0] for row in rows], txns)))
+        error = self._send(txns)
+        if error is None:
+            return 1
+        if len(bundles) == 1:
+            self.queue.set_state([row[0] for row in rows], FAILED, error=error)
+            return 0
+        middle = len(bundles) // 2
+        return self._submit(bundles[:middle], params) + self._submit(bundles[middle:], params)
+
+    def fill(self, last_round, slots):
+        """Pack pending bundles in priority order into up to `slots` groups and send them"""
+        from algosdk import encoding
+
+        if slots <= 0:
+            return 0
+        groups, current, size = [], [], 0
+        for bundle_id, rows in self.queue.bundles(PENDING).items():
+            expired = [row[0] for row in rows if row[4] is not None and row[4] <= last_round]
+            if expired:
+                self.queue.set_state([row[0] for row in rows], EXPIRED)
+                continue
+            if any(encoding.msgpack_decode(row[3]).sender != self.address for row in rows):
+                self.queue.set_state([row[0] for row in rows], FAILED, error="sender is not the platform")
+                continue
+            if size + len(rows) > MAX_GROUP_SIZE:
+                groups.append(current)
+                current, size = [], 0
+                if len(groups) == slots:
+                    break
+            current.append(rows)
+            size += len(rows)
+        if current and len(groups) < slots:
+            groups.append(current)
+        if not groups:
+            return 0
+
+        params = self._request(self.algod.suggested_params)
+        return sum(self._submit(bundles, params) for bundles in groups)
+
+    def run(self, follow=False):
+        """Drain the queue, waiting one block between passes"""
+        self.acquire_lock()
+        try:
+            last_round = self._request(self.algod.status)["last-round"]
+            while True:
+                inflight = self.reconcile(last_round)
+                sent = self.fill(last_round, self.max_inflight - inflight)
+                counts = self.queue.counts()
+                if sent:
+                    print(f"📤 round {last_round}: sent {sent} group(s), "
+                          f"{counts.get(PENDING, 0)} pending, {counts.get(SENT, 0)} in flight")
+                if not follow and not counts.get(PENDING) and not counts.get(SENT):
+                    return counts
+                last_round = self._request(self.algod.status_after_block, last_round)["last-round"]
+        finally:
+            self.release_lock()
+
+
+def _call_txn(client, sender, app_id, app_args, **kwargs):
+    from algosdk.transaction import ApplicationNoOpTxn
+
+    return ApplicationNoOpTxn(sender=sender, sp=client.suggested_params(), index=app_id,
+                              app_args=app_args, **kwargs)
+
+
+def cmd_enqueue_mint(args, client, queue):
+    from algosdk.encoding import decode_address
+    from app_state import history_box_name
+    from escrow_jobs import load_account
+
+    _, sender = load_account()
+    txn = _call_txn(client, sender, args.sbt_app_id, [b"mint_sbt", args.rating.to_bytes(8, "big")],
+                    accounts=[args.address], boxes=[(0, history_box_name(decode_address(args.address)))])
+    bundle = queue.enqueue(txn, args.priority, label=f"mint_sbt {args.address}", not_after=args.not_after)
+    print(f"🗂️  Queued mint_sbt for {args.address} as bundle {bundle}")
+
+
+def cmd_enqueue_rating(args, client, queue):
+    from algosdk.encoding import decode_address
+    from app_state import history_box_name
+    from escrow_jobs import load_account
+
+    _, sender = load_account()
+    txn = _call_txn(client, sender, args.sbt_app_id, [b"update_rating", args.outcome.to_bytes(8, "big")],
+                    accounts=[args.address], boxes=[(0, history_box_name(decode_address(args.address)))])
+    bundle = queue.enqueue(txn, args.priority, label=f"update_rating {args.address}", not_after=args.not_after)
+    print(f"🗂️  Queued update_rating for {args.address} as bundle {bundle}")
+
+
+def cmd_enqueue_fund(args, client, queue):
+    from algosdk.logic import get_application_address
+    from algosdk.transaction import PaymentTxn
+    from escrow_jobs import load_account
+
+    _, sender = load_account()
+    txn = PaymentTxn(sender=sender, sp=client.suggested_params(), receiver=get_application_address(args.app_id),
+                     amt=int(round(args.amount * MICROALGOS_PER_ALGO)))
+    bundle = queue.enqueue(txn, args.priority, label=f"fund {args.app_id}", not_after=args.not_after)
+    print(f"🗂️  Queued funding of app {args.app_id} as bundle {bundle}")
+
+
+def cmd_run(args, client, queue):
+    from escrow_jobs import load_account
+
+    private_key, address = load_account()
+    indexer_client = None
+    if args.indexer:
+        from algosdk.v2client import indexer
+        indexer_client = indexer.IndexerClient("", args.indexer)
+    worker = QueueWorker(queue, client, private_key, address, rate=args.rate, max_inflight=args.max_inflight,
+                         indexer_client=indexer_client)
+    counts = worker.run(follow=args.follow)
+    print(f"✅ Queue drained: {counts}")
+
+
+def cmd_status(args, client, queue):
+    counts = queue.counts()
+    print("📋 " + (", ".join(f"{state}: {counts[state]}" for state in sorted(counts)) or "queue is empty"))
+    for row_id, label, error in queue.failures():
+        print(f"   ❌ #{row_id} {label or ''}: {error}")
+
+
+def main(argv=None):
+    from deploy_contracts_fixed import NETWORKS, create_algod_client
+
+    parser = argparse.ArgumentParser(description="Single-writer submission queue for the platform wallet")
+    parser.add_argument("--env", default="testnet", choices=sorted(NETWORKS))
+    parser.add_argument("--db", default=os.environ.get("ELLORA_QUEUE_DB", QUEUE_PATH))
+    parser.add_argument("--metrics-file", default=os.environ.get("ELLORA_METRICS_FILE"),
+                        help="write Prometheus metrics to this file on exit")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    def enqueue_parser(name, func, help_text, priority):
+        sub = subcommands.add_parser(name, help=help_text)
+        sub.add_argument("--priority", type=int, default=priority, help="lower drains first")
+        sub.add_argument("--not-after", type=int, help="last round the transaction is still wanted")
+        sub.set_defaults(func=func)
+        return sub
+
+    mint = enqueue_parser("enqueue-mint", cmd_enqueue_mint, "queue an SBT mint", PRIORITY_REPUTATION)
+    mint.add_argument("--sbt-app-id", type=int, required=True)
+    mint.add_argument("--address", required=True)
+    mint.add_argument("--rating", type=int, required=True, choices=range(1, 6))
+
+    rating = enqueue_parser("enqueue-rating", cmd_enqueue_rating, "queue a dispute rating update",
+                            PRIORITY_REPUTATION)
+    rating.add_argument("--sbt-app-id", type=int, required=True)
+    rating.add_argument("--address", required=True)
+    rating.add_argument("--outcome", type=int, required=True, choices=(0, 1))
+
+    fund = enqueue_parser("enqueue-fund", cmd_enqueue_fund, "queue an app funding payment", PRIORITY_PAYOUT)
+    fund.add_argument("--app-id", type=int, required=True)
+    fund.add_argument("--amount", type=float, required=True, help="ALGO")
+
+    run = subcommands.add_parser("run", help="drain the queue (single writer)")
+    run.add_argument("--follow", action="store_true", help="keep running and wait for new work")
+    run.add_argument("--rate", type=float, default=10.0, help="max algod requests per second")
+    run.add_argument("--max-inflight", type=int, default=4, help="groups awaiting confirmation")
+    run.add_argument("--indexer", default=os.environ.get("ELLORA_INDEXER_URL"),
+                     help="indexer URL for looking up sent groups algod no longer reports "
+                          "(default: scan the blocks of their validity window)")
+    run.set_defaults(func=cmd_run)
+
+    status = subcommands.add_parser("status", help="show queue counts and recent failures")
+    status.set_defaults(func=cmd_status)
+
+    args = parser.parse_args(argv)
+    if args.metrics_file:
+        export_on_exit(args.metrics_file)
+    queue = SubmissionQueue(args.db)
+    try:
+        client = None if args.command == "status" else create_algod_client(*NETWORKS[args.env])
+        return args.func(args, client, queue)
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
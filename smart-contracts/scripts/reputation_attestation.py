@@ -0,0 +1,424 @@
+"""
+Ellora Reputation Attestations
+
+Signed, self-contained statements of an account's reputation SBT state, so
+partners can check reputation without querying the SBT app themselves.
+
+An attestation is a fixed-width record signed with algosdk's sign_bytes
+(ed25519 over "MX" + record), the same signing used for state snapshots.
+The signer is a dedicated attestation key (ELLORA_ATTESTATION_MNEMONIC)
+that holds no funds and has no role in the apps, never the platform key;
+partners fetch its address from GET /issuer. The layout:
+
+    ATTESTATION_FORMAT  magic, version, score, flags, sbt_app_id, address,
+                        sbt_count, positive, negative, round, ttl_rounds
+    signature           64 bytes
+
+That is 148 bytes in total, passed around base64 encoded. `round` is a
+round at or before which the state was read and `ttl_rounds` how long the
+issuer vouches for it. A consumer checks the signature and issuer, then
+caches the record until round + ttl_rounds.
+
+The issuer reuses a signed attestation for an account until half its
+validity has passed. The current round is estimated from the last algod
+status and the block time, so repeat requests cost at most one status
+read per block between them and no account reads.
+`issue --snapshot` signs every account of a state snapshot at its round
+without touching algod, once the snapshot's signature checks out against
+the platform address given with --verify.
+
+Usage:
+    python3 reputation_attestation.py serve --env testnet --port 4192
+    python3 reputation_attestation.py issue --env testnet --address <ADDR>
+    python3 reputation_attestation.py issue --snapshot ellora_state.snap --verify <PLATFORM_ADDRESS> -o attestations.jsonl
+    python3 reputation_attestation.py verify <ATTESTATION> --issuer <ISSUER_ADDRESS> [--round <ROUND>]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import base64
+import struct
+import argparse
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from app_state import juror_eligible, read_sbt_state, reputation_score
+
+MAGIC = b"ELRA"
+FORMAT_VERSION = 1
+
+# magic, version, score, flags, sbt_app_id, address, sbt_count, positive, negative, round, ttl_rounds
+ATTESTATION_FORMAT = "<4sBBBxQ32sQQQQI"
+ATTESTATION_SIZE = struct.calcsize(ATTESTATION_FORMAT)
+SIGNATURE_SIZE = 64
+
+FLAG_OPTED_IN = 0x01
+FLAG_JUROR_ELIGIBLE = 0x02
+
+DEFAULT_TTL_ROUNDS = 1000  # about an hour
+BLOCK_SECONDS = 3.3
+DEFAULT_PORT = 4192
+CACHE_ENTRIES = 100000
+
+
+class AttestationError(Exception):
+    """Raised when an attestation is malformed, forged, or expired"""
+
+
+def encode_attestation(state, sbt_app_id, round_num, private_key, ttl_rounds=DEFAULT_TTL_ROUNDS):
+    """
+    Sign an attestation of one account's SBT state
+
+    `state` is a dict as produced by app_state.read_sbt_state; an account
+    that has not opted in is passed as {"address": ..., "opted_in": False}
+    and attested as a new user. Returns the raw record + signature bytes.
+    """
+    from algosdk import util
+
+    address = state["address"]
+    opted_in = state.get("opted_in", True)
+    sbt_count, positive, negative = (state[key] if opted_in else 0
+                                     for key in ("sbt_count", "positive", "negative"))
+    score = reputation_score(positive, negative, sbt_count)
+    flags = ((FLAG_OPTED_IN if opted_in else 0)
+             | (FLAG_JUROR_ELIGIBLE if opted_in and juror_eligible(sbt_count, score) else 0))
+    record = struct.pack(ATTESTATION_FORMAT, MAGIC, FORMAT_VERSION, score, flags, sbt_app_id,
+                         address, sbt_count, positive, negative, round_num, ttl_rounds)
+    return record + base64.b64decode(util.sign_bytes(record, private_key))
+
+
+def decode_record(record):
+    """Unpack an attestation record (without checking its signature) into a dict"""
+    (magic, version, score, flags, sbt_app_id, address, sbt_count, positive, negative,
+     round_num, ttl_rounds) = struct.unpack(ATTESTATION_FORMAT, record)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise AttestationError(f"not a version {FORMAT_VERSION} Ellora attestation")
+    return {
+        "address": address,
+        "sbt_app_id": sbt_app_id,
+        "sbt_count": sbt_count,
+        "positive": positive,
+        "negative": negative,
+        "score": score,
+        "opted_in": bool(flags & FLAG_OPTED_IN),
+        "juror_eligible": bool(flags & FLAG_JUROR_ELIGIBLE),
+        "round": round_num,
+        "expires_round": round_num + ttl_rounds,
+    }
+
+
+def verify_attestation(attestation, issuer, sbt_app_id=None, current_round=None):
+    """
+    Check an attestation and return its decoded record
+
+    `attestation` is raw bytes or base64 text and `issuer` the address
+    published at GET /issuer. With `current_round`, an attestation past its
+    expiry is rejected.
+    """
+    from algosdk import encoding, util
+
+    if not encoding.is_valid_address(issuer):
+        raise AttestationError(f"issuer {issuer!r} is not a valid Algorand address")
+
+    if isinstance(attestation, str):
+        try:
+            attestation = base64.b64decode(attestation, validate=True)
+        except ValueError:
+            raise AttestationError("attestation is not valid base64")
+    if len(attestation) != ATTESTATION_SIZE + SIGNATURE_SIZE:
+        raise AttestationError(f"attestation must be {ATTESTATION_SIZE + SIGNATURE_SIZE} bytes")
+
+    record, signature = attestation[:ATTESTATION_SIZE], attestation[ATTESTATION_SIZE:]
+    attested = decode_record(record)
+    if not util.verify_bytes(record, base64.b64encode(signature).decode(), issuer):
+        raise AttestationError("attestation was not signed by the expected issuer")
+    if sbt_app_id is not None and attested["sbt_app_id"] != sbt_app_id:
+        raise AttestationError(f"attestation is for SBT app {attested['sbt_app_id']}, not {sbt_app_id}")
+    if current_round is not None and current_round > attested["expires_round"]:
+        raise AttestationError(f"attestation expired at round {attested['expires_round']}")
+    return attested
+
+
+class AttestationCache:
+    """
+    Verified attestations by address, dropped once their round expires
+
+    Consumers check the signature once per attestation and then answer
+    from here until `expires_round`; least recently used entries are
+    evicted beyond `max_entries`.
+    """
+
+    def __init__(self, issuer, sbt_app_id=None, max_entries=CACHE_ENTRIES):
+        self.issuer = issuer
+        self.sbt_app_id = sbt_app_id
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def add(self, attestation, current_round=None):
+        """Verify an attestation and cache it unless a newer one is held"""
+        attested = verify_attestation(attestation, self.issuer, self.sbt_app_id, current_round)
+        held = self.entries.get(attested["address"])
+        if held is None or held["round"] <= attested["round"]:
+            self.entries[attested["address"]] = attested
+            held = attested
+        self.entries.move_to_end(attested["address"])
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return held
+
+    def get(self, address, current_round):
+        """The cached record for a 32-byte address, or None if missing or expired"""
+        attested = self.entries.get(address)
+        if attested is None:
+            return None
+        if current_round > attested["expires_round"]:
+            del self.entries[address]
+            return None
+        self.entries.move_to_end(address)
+        return attested
+
+
+class Attestor:
+    """
+    Issues attestations from live SBT state
+
+    Signed attestations are reused until half their validity has passed,
+    judged against a round estimated from the last algod status, so the
+    node is read at most once per account per half TTL plus once per
+    block for the round. Like AttestationCache, only the `max_entries`
+    most recently requested accounts are kept.
+    """
+
+    def __init__(self, algod_client, sbt_app_id, private_key, ttl_rounds=DEFAULT_TTL_ROUNDS,
+                 block_seconds=BLOCK_SECONDS, clock=time.monotonic, max_entries=CACHE_ENTRIES):
+        from algosdk import account
+
+        self.algod = algod_client
+        self.sbt_app_id = sbt_app_id
+        self.private_key = private_key
+        self.issuer = account.address_from_private_key(private_key)
+        self.ttl_rounds = ttl_rounds
+        self.block_seconds = block_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.issued = OrderedDict()  # address -> (round, attestation)
+        self._status = None  # (round, clock time it was read)
+        self.node_reads = 0
+
+    def current_round(self, refresh=False):
+        """Round estimated from the last status; algod is asked again after a block time"""
+        now = self.clock()
+        if refresh or self._status is None or now - self._status[1] >= self.block_seconds:
+            self._status = (self.algod.status()["last-round"], now)
+            self.node_reads += 1
+        round_num, read_at = self._status
+        return round_num + int((now - read_at) / self.block_seconds)
+
+    def attest(self, address):
+        """Signed attestation bytes for a 32-byte address"""
+        with self.lock:
+            current = self.current_round()
+            held = self.issued.get(address)
+            if held is not None and current < held[0] + self.ttl_rounds // 2:
+                self.issued.move_to_end(address)
+                return held[1]
+
+        # The round is taken before the read, so the state is at least that recent
+        round_num = self.current_round(refresh=True)
+        state = read_sbt_state(self.algod, address, self.sbt_app_id)
+        self.node_reads += 1
+        if state is None:
+            state = {"address": address, "opted_in": False}
+        attestation = encode_attestation(state, self.sbt_app_id, round_num, self.private_key,
+                                         self.ttl_rounds)
+        with self.lock:
+            self.issued[address] = (round_num, attestation)
+            self.issued.move_to_end(address)
+            while len(self.issued) > self.max_entries:
+                self.issued.popitem(last=False)
+        return attestation
+
+
+def attestation_response(attestation):
+    """JSON body for one attestation: the base64 blob and its decoded record"""
+    from algosdk.encoding import encode_address
+
+    attested = decode_record(attestation[:ATTESTATION_SIZE])
+    attested["address"] = encode_address(attested["address"])
+    return {"attestation": base64.b64encode(attestation).decode(), "record": attested}
+
+
+def make_server(attestor, port=DEFAULT_PORT, address="127.0.0.1"):
+    """
+    Build a threading HTTP server for attestations (not yet started)
+
+    GET /issuer returns the signing address and SBT app, and
+    GET /attestations/{address} an attestation for one account.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from algosdk.encoding import decode_address
+
+    attestation_path = re.compile(r"^/attestations/([A-Z2-7]{58})$")
+
+    class AttestationHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            match = attestation_path.match(path)
+            try:
+                if path == "/issuer":
+                    status, response = 200, {"issuer": attestor.issuer, "sbt_app_id": attestor.sbt_app_id,
+                                             "ttl_rounds": attestor.ttl_rounds}
+                elif match:
+                    status, response = 200, attestation_response(attestor.attest(decode_address(match[1])))
+                else:
+                    status, response = 404, {"message": f"GET {path} is not supported"}
+            except Exception as e:  # Surface node errors to the caller
+                status, response = 502, {"message": f"{type(e).__name__}: {e}"}
+
+            payload = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((address, port), AttestationHandler)
+
+
+def load_signing_key():
+    """
+    The dedicated attestation key
+
+    The service is public, so it must not hold the platform key, which
+    funds the apps and is the only sender of mint_sbt/update_rating.
+    """
+    from algosdk import mnemonic
+
+    mnemonic_phrase = os.environ.get("ELLORA_ATTESTATION_MNEMONIC") or input(
+        "🔑 Enter the attestation key mnemonic (not the platform key): ").strip()
+    private_key = mnemonic.to_private_key(mnemonic_phrase)
+    platform_phrase = os.environ.get("ELLORA_DEPLOYER_MNEMONIC")
+    if platform_phrase and mnemonic.to_private_key(platform_phrase) == private_key:
+        raise AttestationError("the attestation key must not be the platform key; "
+                               "create a dedicated account for ELLORA_ATTESTATION_MNEMONIC")
+    return private_key
+
+
+def sbt_app_for(env, sbt_app_id=None):
+    from manifest import DeploymentManifest
+
+    if sbt_app_id:
+        return sbt_app_id
+    entry = DeploymentManifest().get_app(env, "reputation")
+    if entry is None:
+        raise AttestationError(f"no reputation app recorded for {env}; pass --sbt-app-id")
+    return entry["app_id"]
+
+
+def cmd_serve(args):
+    from deploy_contracts_fixed import NETWORKS, create_algod_client
+
+    attestor = Attestor(create_algod_client(*NETWORKS[args.env]), sbt_app_for(args.env, args.sbt_app_id),
+                        load_signing_key(), args.ttl)
+    server = make_server(attestor, args.port)
+    print(f"🔏 Attestations for SBT app {attestor.sbt_app_id} on http://127.0.0.1:{args.port}"
+          f"/attestations/<ADDRESS>")
+    print(f"   Issuer {attestor.issuer} (published at /issuer), valid for {attestor.ttl_rounds} rounds")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_issue(args):
+    from algosdk.encoding import decode_address
+
+    # Whatever the snapshot says gets our signature, so it must be the platform's
+    if args.snapshot and not args.verify:
+        raise AttestationError("--snapshot needs --verify <platform address> to check its signature")
+
+    private_key = load_signing_key()
+    if args.snapshot:
+        from state_snapshot import Snapshot, SnapshotError
+
+        try:
+            snapshot = Snapshot(args.snapshot, verify_key=args.verify)
+        except SnapshotError as e:
+            raise AttestationError(f"refusing to sign {args.snapshot}: {e}")
+        count = 0
+        with snapshot, open(args.output, 'w') as f:
+            for state in snapshot.sbt_states():
+                attestation = encode_attestation(state, snapshot.sbt_app_id, snapshot.round,
+                                                 private_key, args.ttl)
+                f.write(json.dumps(attestation_response(attestation)) + "\n")
+                count += 1
+        print(f"🔏 Signed {count} attestations at round {snapshot.round} into {args.output}")
+        return 0
+
+    from deploy_contracts_fixed import NETWORKS, create_algod_client
+
+    attestor = Attestor(create_algod_client(*NETWORKS[args.env]), sbt_app_for(args.env, args.sbt_app_id),
+                        private_key, args.ttl)
+    for address in args.address:
+        print(json.dumps(attestation_response(attestor.attest(decode_address(address))), indent=2))
+    return 0
+
+
+def cmd_verify(args):
+    from algosdk.encoding import encode_address
+
+    attested = verify_attestation(args.attestation, args.issuer, args.sbt_app_id, args.round)
+    print(f"✅ {encode_address(attested['address'])}: score {attested['score']}, "
+          f"{attested['sbt_count']} SBTs (+{attested['positive']}/-{attested['negative']}), "
+          f"round {attested['round']}, valid until {attested['expires_round']}")
+    return 0
+
+
+def main():
+    from deploy_contracts_fixed import NETWORKS
+
+    parser = argparse.ArgumentParser(description="Issue and verify signed reputation attestations")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    serve = subcommands.add_parser("serve", help="serve attestations over HTTP")
+    issue = subcommands.add_parser("issue", help="sign attestations for accounts or a whole snapshot")
+    for command in (serve, issue):
+        command.add_argument("--env", default="testnet", choices=sorted(NETWORKS))
+        command.add_argument("--sbt-app-id", type=int, help="reputation app (default: the manifest's)")
+        command.add_argument("--ttl", type=int, default=DEFAULT_TTL_ROUNDS, help="rounds an attestation is valid")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.set_defaults(func=cmd_serve)
+    issue.add_argument("--address", nargs="*", default=[])
+    issue.add_argument("--snapshot", help="sign every SBT account of this snapshot at its round")
+    issue.add_argument("--verify", metavar="ADDRESS", help="platform address the snapshot must be signed by")
+    issue.add_argument("-o", "--output", default="attestations.jsonl")
+    issue.set_defaults(func=cmd_issue)
+
+    verify = subcommands.add_parser("verify", help="check an attestation offline")
+    verify.add_argument("attestation", help="base64 attestation")
+    verify.add_argument("--issuer", required=True, help="attestation key address, as published at /issuer")
+    verify.add_argument("--sbt-app-id", type=int)
+    verify.add_argument("--round", type=int, help="current round, to reject expired attestations")
+    verify.set_defaults(func=cmd_verify)
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    except AttestationError as e:
+        print(f"❌ {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""
+Ellora State Snapshots
+
+Captures every tracked escrow job and reputation SBT local state at a given
+round into a compact, signed, memory-mappable file so off-chain followers
+can restore in milliseconds instead of re-reading the whole chain.
+
+File layout (little endian):
+
+    header    HEADER_FORMAT, HEADER_SIZE bytes
+    escrows   escrow_count fixed-size records, sorted by app ID
+    sbts      sbt_count fixed-size records, sorted by 32-byte address
+    signature 64-byte ed25519 signature over everything before it
+
+Records are fixed width and sorted, so the record arrays double as the index:
+lookups binary-search the mmap directly and nothing is decoded up front.
+
+Usage:
+    python3 state_snapshot.py capture --env testnet --escrow-apps 1 2 3 --accounts ADDR... -o state.snap
+    python3 state_snapshot.py inspect state.snap
+"""
+
+import argparse
+import base64
+import mmap
+import os
+import struct
+import sys
+
+from app_state import read_escrow_job, read_sbt_state, MILESTONE_RELEASED, STATUS_NAMES
+
+MAGIC = b"ELSNAP01"
+FORMAT_VERSION = 2
+
+# magic, version, flags, round, sbt_app_id, escrow_count, sbt_count, signer public key
+HEADER_FORMAT = "<8sHHQQII32s"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# app_id, client, freelancer, amount, released, asset, created, deadline,
+# votes_for, votes_against, jurors, status, milestone_count, milestones_released
+ESCROW_FORMAT = "<Q32s32sQQQQQIIIBBBx"
+ESCROW_SIZE = struct.calcsize(ESCROW_FORMAT)
+
+# address, sbt_count, positive, negative, last_earned, juror_eligible
+SBT_FORMAT = "<32sIIIQB3x"
+SBT_SIZE = struct.calcsize(SBT_FORMAT)
+
+SIGNATURE_SIZE = 64
+
+ESCROW_FIELDS = ("app_id", "client", "freelancer", "amount", "released", "asset", "created", "deadline",
+                 "votes_for", "votes_against", "jurors", "status", "milestone_count", "milestones_released")
+SBT_FIELDS = ("address", "sbt_count", "positive", "negative", "last_earned", "juror_eligible")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is malformed or fails verification"""
+
+
+def escrow_record(job):
+    """
+    ESCROW_FIELDS values of a job dict
+
+    Jobs read from a snapshot already carry the milestone totals; jobs from
+    app_state carry the milestone list they are counted from.
+    """
+    if "milestones" in job:
+        milestones = job["milestones"]
+        job = dict(job, milestone_count=len(milestones),
+                   milestones_released=sum(status == MILESTONE_RELEASED for _, status in milestones))
+    return tuple(job[field] for field in ESCROW_FIELDS)
+
+
+def encode_snapshot(round_num, sbt_app_id, escrow_jobs, sbt_states, private_key):
+    """
+    Serialise and sign a snapshot
+
+    `escrow_jobs` and `sbt_states` are iterables of dicts as produced by
+    app_state; `private_key` is an algosdk base64 private key.
+    """
+    from algosdk import account, encoding, util
+
+    signer = encoding.decode_address(account.address_from_private_key(private_key))
+    escrows = sorted(escrow_jobs, key=lambda job: job["app_id"])
+    sbts = sorted(sbt_states, key=lambda state: state["address"])
+
+    parts = [struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, 0, round_num, sbt_app_id,
+                         len(escrows), len(sbts), signer)]
+    pack_escrow = struct.Struct(ESCROW_FORMAT).pack
+    parts.extend(pack_escrow(*escrow_record(job)) for job in escrows)
+    pack_sbt = struct.Struct(SBT_FORMAT).pack
+    parts.extend(pack_sbt(*(state[field] for field in SBT_FIELDS)) for state in sbts)
+
+    body = b"".join(parts)
+    signature = util.sign_bytes(body, private_key)
+    return body + base64.b64decode(signature)
+
+
+def write_snapshot(path, round_num, sbt_app_id, escrow_jobs, sbt_states, private_key):
+    """Write a signed snapshot atomically"""
+    data = encode_snapshot(round_num, sbt_app_id, escrow_jobs, sbt_states, private_key)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file"""
+
+    def __init__(self, path, verify_key=None):
+        """
+        Map a snapshot file
+
+        If `verify_key` (an Algorand address) is given, the signature is
+        checked and the signer must match it.
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"{path} is empty")
+
+        if len(self._map) < HEADER_SIZE + SIGNATURE_SIZE:
+            self.close()
+            raise SnapshotError(f"{path} is too small to be a snapshot")
+
+        (magic, version, _flags, self.round, self.sbt_app_id,
+         self.escrow_count, self.sbt_count, self.signer) = struct.unpack_from(HEADER_FORMAT, self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} Ellora snapshot")
+
+        self._escrow_offset = HEADER_SIZE
+        self._sbt_offset = self._escrow_offset + self.escrow_count * ESCROW_SIZE
+        self._body_size = self._sbt_offset + self.sbt_count * SBT_SIZE
+        if len(self._map) != self._body_size + SIGNATURE_SIZE:
+            self.close()
+            raise SnapshotError(f"{path} is truncated or has trailing data")
+
+        if verify_key is not None:
+            self.verify(verify_key)
+
+    def verify(self, expected_signer):
+        """Check the trailing signature and that it was made by `expected_signer`"""
+        from algosdk import encoding, util
+
+        if encoding.encode_address(self.signer) != expected_signer:
+            raise SnapshotError("snapshot was signed by an unexpected key")
+        body = self._map[:self._body_size]
+        signature = base64.b64encode(self._map[self._body_size:]).decode()
+        if not util.verify_bytes(body, signature, expected_signer):
+            raise SnapshotError("snapshot signature is invalid")
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _escrow_at(self, index):
+        values = struct.unpack_from(ESCROW_FORMAT, self._map, self._escrow_offset + index * ESCROW_SIZE)
+        return dict(zip(ESCROW_FIELDS, values))
+
+    def _sbt_at(self, index):
+        values = struct.unpack_from(SBT_FORMAT, self._map, self._sbt_offset + index * SBT_SIZE)
+        return dict(zip(SBT_FIELDS, values))
+
+    def _search(self, offset, count, size, key, key_format):
+        """Binary search a sorted record array for a key at record offset 0"""
+        unpack_key = struct.Struct(key_format).unpack_from
+        low, high = 0, count
+        while low < high:
+            mid = (low + high) // 2
+            current = unpack_key(self._map, offset + mid * size)[0]
+            if current < key:
+                low = mid + 1
+            elif current > key:
+                high = mid
+            else:
+                return mid
+        return None
+
+    def escrow_records(self):
+        """The raw escrow record array (ESCROW_FORMAT records), without copying"""
+        return memoryview(self._map)[self._escrow_offset:self._sbt_offset]
+
+    def escrow_job(self, app_id):
+        """Look up one escrow job by app ID, or None"""
+        index = self._search(self._escrow_offset, self.escrow_count, ESCROW_SIZE, app_id, "<Q")
+        return None if index is None else self._escrow_at(index)
+
+    def sbt_state(self, address):
+        """Look up one account's SBT local state by 32-byte address, or None"""
+        index = self._search(self._sbt_offset, self.sbt_count, SBT_SIZE, address, "<32s")
+        return None if index is None else self._sbt_at(index)
+
+    def escrow_jobs(self):
+        for index in range(self.escrow_count):
+            yield self._escrow_at(index)
+
+    def sbt_states(self):
+        for index in range(self.sbt_count):
+            yield self._sbt_at(index)
+
+
+class SnapshotFollower:
+    """
+    Off-chain mirror of escrow and SBT state
+
+    Restores from a snapshot without decoding it (reads fall through to the
+    mmap) and then catches up by replaying blocks after the snapshot round,
+    re-reading only the apps and accounts those blocks touched.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.round = snapshot.round
+        self.sbt_app_id = snapshot.sbt_app_id
+        self.escrow_overrides = {}
+        self.sbt_overrides = {}
+        self.tracked_escrows = set()
+
+    @classmethod
+    def restore(cls, path, verify_key=None):
+        return cls(Snapshot(path, verify_key=verify_key))
+
+    def track_escrow(self, app_id):
+        """Follow an escrow app created after the snapshot was taken"""
+        self.tracked_escrows.add(app_id)
+
+    def escrow_job(self, app_id):
+        if app_id in self.escrow_overrides:
+            return self.escrow_overrides[app_id]
+        return self.snapshot.escrow_job(app_id)
+
+    def sbt_state(self, address):
+        if address in self.sbt_overrides:
+            return self.sbt_overrides[address]
+        return self.snapshot.sbt_state(address)
+
+    def is_tracked_escrow(self, app_id):
+        return app_id in self.tracked_escrows or self.escrow_job(app_id) is not None
+
+    def touched_by_block(self, block):
+        """Escrow app IDs and SBT accounts touched by a msgpack-decoded block"""
+        escrows, accounts = set(), set()
+
+        def visit(stxn):
+            txn = stxn.get("txn", {})
+            if txn.get("type") == "appl":
+                app_id = txn.get("apid", 0)
+                if app_id == self.sbt_app_id:
+                    accounts.add(txn["snd"])
+                    accounts.update(txn.get("apat", []))
+                elif self.is_tracked_escrow(app_id):
+                    escrows.add(app_id)
+            for inner in stxn.get("dt", {}).get("itx", []):
+                visit(inner)
+
+        for stxn in block.get("txns", []):
+            visit(stxn)
+        return escrows, accounts
+
+    def catch_up(self, algod_client, to_round=None):
+        """
+        Replay blocks after the current round and refresh touched state
+
+        Algod only serves current state, so touched entries are re-read at
+        the latest round; returns the round the follower is now at.
+        """
+        import msgpack
+
+        if to_round is None:
+            to_round = algod_client.status()["last-round"]
+
+        escrows, accounts = set(), set()
+        for round_num in range(self.round + 1, to_round + 1):
+            raw = algod_client.block_info(round_num=round_num, response_format="msgpack")
+            block = msgpack.unpackb(raw, raw=False, strict_map_key=False)["block"]
+            touched_escrows, touched_accounts = self.touched_by_block(block)
+            escrows |= touched_escrows
+            accounts |= touched_accounts
+
+        for app_id in escrows:
+            self.escrow_overrides[app_id] = read_escrow_job(algod_client, app_id)
+        for address in accounts:
+            self.sbt_overrides[address] = read_sbt_state(algod_client, address, self.sbt_app_id)
+
+        self.round = to_round
+        return self.round
+
+    def escrow_jobs(self):
+        """All known escrow jobs, snapshot entries overlaid with updates"""
+        seen = set()
+        for job in self.snapshot.escrow_jobs():
+            seen.add(job["app_id"])
+            yield self.escrow_overrides.get(job["app_id"], job)
+        for app_id, job in self.escrow_overrides.items():
+            if app_id not in seen:
+                yield job
+
+    def sbt_states(self):
+        """All known SBT states (None for accounts that have closed out)"""
+        seen = set()
+        for state in self.snapshot.sbt_states():
+            seen.add(state["address"])
+            yield self.sbt_overrides.get(state["address"], state)
+        for address, state in self.sbt_overrides.items():
+            if address not in seen:
+                yield state
+
+    def write_snapshot(self, path, private_key):
+        """Compact current state (snapshot + updates) into a new snapshot"""
+        jobs = list(self.escrow_jobs())
+        sbts = [state for state in self.sbt_states() if state is not None]
+        return write_snapshot(path, self.round, self.sbt_app_id, jobs, sbts, private_key)
+
+
+def capture(algod_client, escrow_app_ids, sbt_app_id, addresses):
+    """
+    Read current escrow and SBT state from algod
+
+    The round is taken before any reads, so a follower catching up from it
+    re-reads anything that changed while the capture was running.
+    """
+    from algosdk.encoding import decode_address
+
+    round_num = algod_client.status()["last-round"]
+    jobs = [read_escrow_job(algod_client, app_id) for app_id in escrow_app_ids]
+    sbts = []
+    for address in addresses:
+        state = read_sbt_state(algod_client, decode_address(address), sbt_app_id)
+        if state is not None:
+            sbts.append(state)
+    return round_num, jobs, sbts
+
+
+def main():
+    from deploy_contracts_fixed import NETWORKS, create_algod_client
+    from manifest import DeploymentManifest
+
+    parser = argparse.ArgumentParser(description="Capture and inspect Ellora state snapshots")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    capture_cmd = subcommands.add_parser("capture", help="capture a signed snapshot from algod")
+    capture_cmd.add_argument("--env", default="testnet", choices=sorted(NETWORKS))
+    capture_cmd.add_argument("--escrow-apps", nargs="*", type=int, default=None,
+                             help="escrow app IDs (default: the escrow app in the manifest)")
+    capture_cmd.add_argument("--accounts", nargs="*", default=[], help="accounts opted into the SBT app")
+    capture_cmd.add_argument("-o", "--output", default="ellora_state.snap")
+
+    inspect_cmd = subcommands.add_parser("inspect", help="summarise a snapshot file")
+    inspect_cmd.add_argument("path")
+    inspect_cmd.add_argument("--verify", metavar="ADDRESS", help="expected signer address")
+
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        from algosdk import mnemonic
+
+        apps = DeploymentManifest().environment(args.env)["apps"]
+        escrow_app_ids = args.escrow_apps if args.escrow_apps is not None else [apps["escrow"]["app_id"]]
+        sbt_app_id = apps["reputation"]["app_id"]
+
+        mnemonic_phrase = os.environ.get("ELLORA_DEPLOYER_MNEMONIC") or input(
+            "🔑 Enter the platform mnemonic used to sign snapshots: ").strip()
+        private_key = mnemonic.to_private_key(mnemonic_phrase)
+
+        client = create_algod_client(*NETWORKS[args.env])
+        round_num, jobs, sbts = capture(client, escrow_app_ids, sbt_app_id, args.accounts)
+        size = write_snapshot(args.output, round_num, sbt_app_id, jobs, sbts, private_key)
+        print(f"📸 Snapshot at round {round_num}: {len(jobs)} escrow jobs, {len(sbts)} SBT accounts")
+        print(f"💾 Wrote {size} bytes to {args.output}")
+        return 0
+
+    try:
+        with Snapshot(args.path, verify_key=args.verify) as snapshot:
+            print(f"📸 Round {snapshot.round}  SBT app {snapshot.sbt_app_id}")
+            print(f"📋 {snapshot.escrow_count} escrow jobs, 🏆 {snapshot.sbt_count} SBT accounts")
+            for job in snapshot.escrow_jobs():
+                print(f"   App {job['app_id']}: {STATUS_NAMES.get(job['status'], job['status'])} "
+                      f"amount={job['amount']} released={job['released']} asset={job['asset'] or 'ALGO'}")
+            if args.verify:
+                print("✅ Signature verified")
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
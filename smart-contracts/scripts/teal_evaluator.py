@@ -0,0 +1,1737 @@
+"""
+Ellora In-Process TEAL Evaluator
+
+A small stand-in for the AVM that runs the TEAL PyTeal emits for the Ellora
+contracts against an in-memory ledger, so tooling and fuzzing can exercise
+the real approval programs without a node.
+
+Supported:
+- The opcodes PyTeal produces for application programs (arithmetic, byte
+  manipulation, branching, subroutines with frame pointers, scratch space)
+- Global/local state, boxes, balances, ASA holdings
+- Atomic groups with rollback, inner transactions (pay, axfer, appl)
+- Pooled fees, minimum balance checks and opcode budget
+
+Not supported: logic signatures, key registration, asset configuration
+beyond what the contracts need, and anything cryptographic beyond hashing.
+"""
+
+import hashlib
+import base64
+
+UINT64_MAX = 2 ** 64 - 1
+
+ZERO_ADDRESS = bytes(32)
+
+MIN_TXN_FEE = 1000
+MIN_BALANCE = 100000
+APP_BUDGET = 700
+MAX_STACK = 1000
+
+# Minimum balance increments (microAlgos), as on mainnet
+ASSET_MIN_BALANCE = 100000
+APP_PAGE_MIN_BALANCE = 100000
+OPT_IN_MIN_BALANCE = 100000
+SCHEMA_UINT_MIN_BALANCE = 28500
+SCHEMA_BYTES_MIN_BALANCE = 50000
+BOX_FLAT_MIN_BALANCE = 2500
+BOX_BYTE_MIN_BALANCE = 400
+MAX_BOX_SIZE = 32768
+
+TXN_TYPES = {"pay": 1, "keyreg": 2, "acfg": 3, "axfer": 4, "afrz": 5, "appl": 6}
+TXN_TYPE_NAMES = {value: name for name, value in TXN_TYPES.items()}
+
+ON_COMPLETE = {
+    "NoOp": 0, "OptIn": 1, "CloseOut": 2, "ClearState": 3,
+    "UpdateApplication": 4, "DeleteApplication": 5,
+}
+NOOP, OPT_IN, CLOSE_OUT, CLEAR_STATE, UPDATE_APPLICATION, DELETE_APPLICATION = range(6)
+
+NAMED_INTS = dict(TXN_TYPES, **ON_COMPLETE)
+
+_MISSING = object()
+
+
+class TealError(Exception):
+    """Raised when a program rejects, panics, or a transaction is invalid"""
+
+
+class _AssertFailed(Exception):
+    """Raised by assert; EvalContext.run reports it with the failing pc"""
+
+
+def app_address(app_id):
+    """Address of an application account"""
+    return hashlib.new("sha512_256", b"appID" + app_id.to_bytes(8, "big")).digest()
+
+
+def method_selector(signature):
+    """ARC-4 method selector for a signature string"""
+    return hashlib.new("sha512_256", signature.encode()).digest()[:4]
+
+
+# ---------------------------------------------------------------------------
+# Transactions
+# ---------------------------------------------------------------------------
+
+class Txn:
+    """A transaction as seen by the evaluator (addresses are 32-byte keys)"""
+
+    def __init__(self, sender, type="appl", fee=MIN_TXN_FEE, receiver=ZERO_ADDRESS, amount=0,
+                 close_remainder_to=ZERO_ADDRESS, app_id=0, on_completion=NOOP, app_args=(),
+                 accounts=(), foreign_apps=(), foreign_assets=(), boxes=(), xfer_asset=0,
+                 asset_amount=0, asset_sender=ZERO_ADDRESS, asset_receiver=ZERO_ADDRESS,
+                 asset_close_to=ZERO_ADDRESS, approval_program=None, clear_program=None,
+                 global_schema=(0, 0), local_schema=(0, 0), extra_pages=0, note=b"",
+                 lease=ZERO_ADDRESS, rekey_to=ZERO_ADDRESS, first_valid=0, last_valid=1000):
+        self.sender = sender
+        self.type = type
+        self.fee = fee
+        self.receiver = receiver
+        self.amount = amount
+        self.close_remainder_to = close_remainder_to
+        self.app_id = app_id
+        self.on_completion = on_completion
+        self.app_args = list(app_args)
+        self.accounts = list(accounts)
+        self.foreign_apps = list(foreign_apps)
+        self.foreign_assets = list(foreign_assets)
+        self.boxes = list(boxes)
+        self.xfer_asset = xfer_asset
+        self.asset_amount = asset_amount
+        self.asset_sender = asset_sender
+        self.asset_receiver = asset_receiver
+        self.asset_close_to = asset_close_to
+        self.approval_program = approval_program
+        self.clear_program = clear_program
+        self.global_schema = tuple(global_schema)
+        self.local_schema = tuple(local_schema)
+        self.extra_pages = extra_pages
+        self.note = note
+        self.lease = lease
+        self.rekey_to = rekey_to
+        self.first_valid = first_valid
+        self.last_valid = last_valid
+        # Filled in by the ledger
+        self.group_index = 0
+        self.txid = b""
+        self.created_app_id = 0
+        self.created_asset_id = 0
+        self.logs = []
+        self.inner_txns = []
+
+    def __repr__(self):
+        return f"Txn({self.type}, sender={self.sender[:4].hex()}, app={self.app_id})"
+
+
+def _program_bytes(program):
+    if program is None:
+        return b""
+    return program.source.encode()
+
+
+TXN_FIELDS = {
+    "Sender": lambda t: t.sender,
+    "Fee": lambda t: t.fee or 0,
+    "FirstValid": lambda t: t.first_valid,
+    "LastValid": lambda t: t.last_valid,
+    "Note": lambda t: t.note,
+    "Lease": lambda t: t.lease,
+    "Receiver": lambda t: t.receiver,
+    "Amount": lambda t: t.amount,
+    "CloseRemainderTo": lambda t: t.close_remainder_to,
+    "Type": lambda t: t.type.encode(),
+    "TypeEnum": lambda t: TXN_TYPES[t.type],
+    "XferAsset": lambda t: t.xfer_asset,
+    "AssetAmount": lambda t: t.asset_amount,
+    "AssetSender": lambda t: t.asset_sender,
+    "AssetReceiver": lambda t: t.asset_receiver,
+    "AssetCloseTo": lambda t: t.asset_close_to,
+    "GroupIndex": lambda t: t.group_index,
+    "TxID": lambda t: t.txid,
+    "ApplicationID": lambda t: t.app_id,
+    "OnCompletion": lambda t: t.on_completion,
+    "NumAppArgs": lambda t: len(t.app_args),
+    "NumAccounts": lambda t: len(t.accounts),
+    "NumApplications": lambda t: len(t.foreign_apps),
+    "NumAssets": lambda t: len(t.foreign_assets),
+    "ApprovalProgram": lambda t: _program_bytes(t.approval_program),
+    "ClearStateProgram": lambda t: _program_bytes(t.clear_program),
+    "RekeyTo": lambda t: t.rekey_to,
+    "GlobalNumUint": lambda t: t.global_schema[0],
+    "GlobalNumByteSlice": lambda t: t.global_schema[1],
+    "LocalNumUint": lambda t: t.local_schema[0],
+    "LocalNumByteSlice": lambda t: t.local_schema[1],
+    "ExtraProgramPages": lambda t: t.extra_pages,
+    "CreatedApplicationID": lambda t: t.created_app_id,
+    "CreatedAssetID": lambda t: t.created_asset_id,
+    "NumLogs": lambda t: len(t.logs),
+    "LastLog": lambda t: t.logs[-1] if t.logs else b"",
+}
+
+TXN_ARRAY_FIELDS = {
+    # Index 0 of Accounts/Applications is the sender/current app
+    "ApplicationArgs": lambda t, i: t.app_args[i],
+    "Accounts": lambda t, i: t.sender if i == 0 else t.accounts[i - 1],
+    "Applications": lambda t, i: t.app_id if i == 0 else t.foreign_apps[i - 1],
+    "Assets": lambda t, i: t.foreign_assets[i],
+    "Logs": lambda t, i: t.logs[i],
+}
+
+# itxn_field name -> Txn attribute (scalar) or list attribute (array)
+ITXN_SCALAR_FIELDS = {
+    "Sender": "sender", "Fee": "fee", "Receiver": "receiver", "Amount": "amount",
+    "CloseRemainderTo": "close_remainder_to", "XferAsset": "xfer_asset",
+    "AssetAmount": "asset_amount", "AssetSender": "asset_sender",
+    "AssetReceiver": "asset_receiver", "AssetCloseTo": "asset_close_to",
+    "ApplicationID": "app_id", "OnCompletion": "on_completion", "Note": "note",
+    "RekeyTo": "rekey_to", "GlobalNumUint": None, "GlobalNumByteSlice": None,
+    "LocalNumUint": None, "LocalNumByteSlice": None,
+}
+ITXN_ARRAY_FIELDS = {
+    "ApplicationArgs": "app_args", "Accounts": "accounts",
+    "Applications": "foreign_apps", "Assets": "foreign_assets",
+}
+
+
+# ---------------------------------------------------------------------------
+# Assembler
+# ---------------------------------------------------------------------------
+
+def _split_line(line):
+    """Split a TEAL line into tokens, keeping quoted strings intact"""
+    tokens, current, i = [], "", 0
+    while i < len(line):
+        ch = line[i]
+        if ch == '"':
+            end = i + 1
+            while end < len(line) and line[end] != '"':
+                end += 2 if line[end] == "\\" else 1
+            tokens.append(line[i:end + 1])
+            i = end + 1
+            continue
+        if line.startswith("//", i):
+            break
+        if ch.isspace():
+            if current:
+                tokens.append(current)
+                current = ""
+        else:
+            current += ch
+        i += 1
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+def _parse_string(token):
+    body = token[1:-1]
+    out, i = bytearray(), 0
+    escapes = {"n": 10, "r": 13, "t": 9, "\\": 92, '"': 34, "0": 0}
+    while i < len(body):
+        ch = body[i]
+        if ch == "\\":
+            nxt = body[i + 1]
+            if nxt == "x":
+                out.append(int(body[i + 2:i + 4], 16))
+                i += 4
+                continue
+            out.append(escapes[nxt])
+            i += 2
+            continue
+        out.extend(ch.encode())
+        i += 1
+    return bytes(out)
+
+
+def _parse_bytes(tokens):
+    """Parse the operand of byte/pushbytes"""
+    first = tokens[0]
+    if first.startswith('"'):
+        return _parse_string(first)
+    if first.startswith("0x"):
+        return bytes.fromhex(first[2:])
+    if first in ("base64", "b64"):
+        return base64.b64decode(tokens[1])
+    if first in ("base32", "b32"):
+        data = tokens[1]
+        return base64.b32decode(data + "=" * (-len(data) % 8))
+    if first.startswith(("base64(", "b64(")):
+        return base64.b64decode(first[first.index("(") + 1:-1])
+    raise TealError(f"cannot parse byte constant {' '.join(tokens)}")
+
+
+def _parse_int(token):
+    if token in NAMED_INTS:
+        return NAMED_INTS[token]
+    return int(token, 0)
+
+
+def decode_address(address):
+    """Decode a 58-character Algorand address into its 32-byte public key"""
+    raw = base64.b32decode(address + "=" * (-len(address) % 8))
+    return raw[:32]
+
+
+class Program:
+    """An assembled TEAL program: a list of (handler, operand) pairs"""
+
+    def __init__(self, source):
+        self.source = source
+        self.version = 1
+        self.code = []
+        labels = {}
+        pending = []  # (index, label) branch targets to resolve
+
+        for raw_line in source.splitlines():
+            tokens = _split_line(raw_line.strip())
+            if not tokens:
+                continue
+            if tokens[0] == "#pragma":
+                if tokens[1] == "version":
+                    self.version = int(tokens[2])
+                continue
+            if tokens[0].endswith(":") and len(tokens) == 1:
+                labels[tokens[0][:-1]] = len(self.code)
+                continue
+
+            op, args = tokens[0], tokens[1:]
+            handler, operand, label = _assemble(op, args)
+            if label is not None:
+                pending.append((len(self.code), label))
+            self.code.append((handler, operand))
+
+        for index, label in pending:
+            if label not in labels:
+                raise TealError(f"unknown label {label}")
+            handler, _ = self.code[index]
+            # callsub also carries its return address, so the run loop need
+            # not publish the pc on every instruction
+            target = (labels[label], index + 1) if handler is op_callsub else labels[label]
+            self.code[index] = (handler, target)
+
+
+# ---------------------------------------------------------------------------
+# Opcodes
+# ---------------------------------------------------------------------------
+
+def _uint(value, op):
+    if type(value) is not int:
+        raise TealError(f"{op} expects uint64, got bytes")
+    return value
+
+
+def _bytes(value, op):
+    if type(value) is not bytes:
+        raise TealError(f"{op} expects bytes, got uint64")
+    return value
+
+
+def _binary_uint(name, fn):
+    def handler(ctx, _):
+        stack = ctx.stack
+        b = stack.pop()
+        a = stack[-1]
+        if type(a) is not int or type(b) is not int:
+            raise TealError(f"{name} expects uint64 arguments")
+        stack[-1] = fn(a, b)
+    return handler
+
+
+def _add(a, b):
+    r = a + b
+    if r > UINT64_MAX:
+        raise TealError("+ overflowed")
+    return r
+
+
+def _sub(a, b):
+    if b > a:
+        raise TealError("- would result negative")
+    return a - b
+
+
+def _mul(a, b):
+    r = a * b
+    if r > UINT64_MAX:
+        raise TealError("* overflowed")
+    return r
+
+
+def _div(a, b):
+    if b == 0:
+        raise TealError("/ by zero")
+    return a // b
+
+
+def _mod(a, b):
+    if b == 0:
+        raise TealError("% by zero")
+    return a % b
+
+
+def _exp(a, b):
+    if a == 0 and b == 0:
+        raise TealError("0^0 is undefined")
+    r = a ** b if a > 1 else a
+    if r > UINT64_MAX:
+        raise TealError("exp overflowed")
+    return r
+
+
+def _shl(a, b):
+    if b > 63:
+        raise TealError("shl shift too large")
+    return (a << b) & UINT64_MAX
+
+
+def _shr(a, b):
+    if b > 63:
+        raise TealError("shr shift too large")
+    return a >> b
+
+
+def op_eq(ctx, _):
+    stack = ctx.stack
+    b = stack.pop()
+    a = stack[-1]
+    if type(a) is not type(b):
+        raise TealError("== expects arguments of the same type")
+    stack[-1] = 1 if a == b else 0
+
+
+def op_neq(ctx, _):
+    stack = ctx.stack
+    b = stack.pop()
+    a = stack[-1]
+    if type(a) is not type(b):
+        raise TealError("!= expects arguments of the same type")
+    stack[-1] = 0 if a == b else 1
+
+
+def op_not(ctx, _):
+    stack = ctx.stack
+    stack[-1] = 0 if _uint(stack[-1], "!") else 1
+
+
+def op_bitnot(ctx, _):
+    stack = ctx.stack
+    stack[-1] = UINT64_MAX ^ _uint(stack[-1], "~")
+
+
+def op_sqrt(ctx, _):
+    import math
+    ctx.stack[-1] = math.isqrt(_uint(ctx.stack[-1], "sqrt"))
+
+
+def op_push(ctx, value):
+    ctx.stack.append(value)
+
+
+def op_btoi(ctx, _):
+    value = _bytes(ctx.stack[-1], "btoi")
+    if len(value) > 8:
+        raise TealError("btoi arg too long")
+    ctx.stack[-1] = int.from_bytes(value, "big")
+
+
+def op_itob(ctx, _):
+    ctx.stack[-1] = _uint(ctx.stack[-1], "itob").to_bytes(8, "big")
+
+
+def op_len(ctx, _):
+    ctx.stack[-1] = len(_bytes(ctx.stack[-1], "len"))
+
+
+def op_concat(ctx, _):
+    stack = ctx.stack
+    b = _bytes(stack.pop(), "concat")
+    a = _bytes(stack[-1], "concat")
+    if len(a) + len(b) > 4096:
+        raise TealError("concat produced a too big byte array")
+    stack[-1] = a + b
+
+
+def _substring(value, start, end, op):
+    if end < start or end > len(value):
+        raise TealError(f"{op} range {start}:{end} out of bounds for length {len(value)}")
+    return value[start:end]
+
+
+def op_substring(ctx, operand):
+    start, end = operand
+    ctx.stack[-1] = _substring(_bytes(ctx.stack[-1], "substring"), start, end, "substring")
+
+
+def op_substring3(ctx, _):
+    stack = ctx.stack
+    end = _uint(stack.pop(), "substring3")
+    start = _uint(stack.pop(), "substring3")
+    stack[-1] = _substring(_bytes(stack[-1], "substring3"), start, end, "substring3")
+
+
+def op_extract(ctx, operand):
+    start, length = operand
+    value = _bytes(ctx.stack[-1], "extract")
+    end = len(value) if length == 0 else start + length
+    ctx.stack[-1] = _substring(value, start, end, "extract")
+
+
+def op_extract3(ctx, _):
+    stack = ctx.stack
+    length = _uint(stack.pop(), "extract3")
+    start = _uint(stack.pop(), "extract3")
+    stack[-1] = _substring(_bytes(stack[-1], "extract3"), start, start + length, "extract3")
+
+
+def _extract_uint(width):
+    def handler(ctx, _):
+        stack = ctx.stack
+        start = _uint(stack.pop(), f"extract_uint{width * 8}")
+        value = _bytes(stack[-1], f"extract_uint{width * 8}")
+        stack[-1] = int.from_bytes(_substring(value, start, start + width, "extract_uint"), "big")
+    return handler
+
+
+def op_replace2(ctx, start):
+    stack = ctx.stack
+    patch = _bytes(stack.pop(), "replace2")
+    value = _bytes(stack[-1], "replace2")
+    _substring(value, start, start + len(patch), "replace2")
+    stack[-1] = value[:start] + patch + value[start + len(patch):]
+
+
+def op_replace3(ctx, _):
+    stack = ctx.stack
+    patch = _bytes(stack.pop(), "replace3")
+    start = _uint(stack.pop(), "replace3")
+    value = _bytes(stack[-1], "replace3")
+    _substring(value, start, start + len(patch), "replace3")
+    stack[-1] = value[:start] + patch + value[start + len(patch):]
+
+
+def op_getbyte(ctx, _):
+    stack = ctx.stack
+    index = _uint(stack.pop(), "getbyte")
+    value = _bytes(stack[-1], "getbyte")
+    if index >= len(value):
+        raise TealError("getbyte index beyond array length")
+    stack[-1] = value[index]
+
+
+def op_setbyte(ctx, _):
+    stack = ctx.stack
+    byte = _uint(stack.pop(), "setbyte")
+    index = _uint(stack.pop(), "setbyte")
+    value = _bytes(stack[-1], "setbyte")
+    if index >= len(value) or byte > 255:
+        raise TealError("setbyte index or value out of range")
+    stack[-1] = value[:index] + bytes([byte]) + value[index + 1:]
+
+
+def op_bzero(ctx, _):
+    size = _uint(ctx.stack[-1], "bzero")
+    if size > 4096:
+        raise TealError("bzero attempted to create a too large string")
+    ctx.stack[-1] = bytes(size)
+
+
+def _hash(name, cost):
+    def handler(ctx, _):
+        value = _bytes(ctx.stack[-1], name)
+        ctx.cost += cost - 1
+        if name == "sha256":
+            ctx.stack[-1] = hashlib.sha256(value).digest()
+        elif name == "sha512_256":
+            ctx.stack[-1] = hashlib.new("sha512_256", value).digest()
+        else:
+            ctx.stack[-1] = hashlib.sha3_256(value).digest()
+    return handler
+
+
+def _bytes_compare(name, fn):
+    def handler(ctx, _):
+        stack = ctx.stack
+        b = _bytes(stack.pop(), name)
+        a = _bytes(stack[-1], name)
+        stack[-1] = 1 if fn(int.from_bytes(a, "big"), int.from_bytes(b, "big")) else 0
+    return handler
+
+
+def _bytes_arith(name, fn):
+    def handler(ctx, _):
+        stack = ctx.stack
+        b = int.from_bytes(_bytes(stack.pop(), name), "big")
+        a = int.from_bytes(_bytes(stack[-1], name), "big")
+        result = fn(a, b)
+        if result < 0:
+            raise TealError(f"{name} would result negative")
+        stack[-1] = result.to_bytes((result.bit_length() + 7) // 8, "big") if result else b""
+    return handler
+
+
+def op_pop(ctx, _):
+    ctx.stack.pop()
+
+
+def op_popn(ctx, n):
+    if n:
+        del ctx.stack[-n:]
+
+
+def op_dup(ctx, _):
+    ctx.stack.append(ctx.stack[-1])
+
+
+def op_dup2(ctx, _):
+    ctx.stack.extend(ctx.stack[-2:])
+
+
+def op_dupn(ctx, n):
+    ctx.stack.extend([ctx.stack[-1]] * n)
+
+
+def op_swap(ctx, _):
+    stack = ctx.stack
+    stack[-1], stack[-2] = stack[-2], stack[-1]
+
+
+def op_dig(ctx, n):
+    ctx.stack.append(ctx.stack[-1 - n])
+
+
+def op_bury(ctx, n):
+    stack = ctx.stack
+    stack[-1 - n] = stack[-1]
+    stack.pop()
+
+
+def op_cover(ctx, n):
+    stack = ctx.stack
+    stack.insert(len(stack) - 1 - n, stack.pop())
+
+
+def op_uncover(ctx, n):
+    stack = ctx.stack
+    stack.append(stack.pop(-1 - n))
+
+
+def op_select(ctx, _):
+    stack = ctx.stack
+    cond = _uint(stack.pop(), "select")
+    b = stack.pop()
+    if cond:
+        stack[-1] = b
+
+
+def op_store(ctx, slot):
+    ctx.scratch[slot] = ctx.stack.pop()
+
+
+def op_load(ctx, slot):
+    ctx.stack.append(ctx.scratch[slot])
+
+
+def op_stores(ctx, _):
+    value = ctx.stack.pop()
+    ctx.scratch[_uint(ctx.stack.pop(), "stores")] = value
+
+
+def op_loads(ctx, _):
+    ctx.stack[-1] = ctx.scratch[_uint(ctx.stack[-1], "loads")]
+
+
+def op_intc(ctx, index):
+    ctx.stack.append(ctx.int_constants[index])
+
+
+def op_bytec(ctx, index):
+    ctx.stack.append(ctx.byte_constants[index])
+
+
+def op_intcblock(ctx, values):
+    ctx.int_constants = values
+
+
+def op_bytecblock(ctx, values):
+    ctx.byte_constants = values
+
+
+# Control flow -------------------------------------------------------------
+
+def op_b(ctx, target):
+    return target
+
+
+def op_bnz(ctx, target):
+    if _uint(ctx.stack.pop(), "bnz"):
+        return target
+    return None
+
+
+def op_bz(ctx, target):
+    if not _uint(ctx.stack.pop(), "bz"):
+        return target
+    return None
+
+
+def op_err(ctx, _):
+    raise TealError("err opcode executed")
+
+
+def op_assert(ctx, _):
+    if not _uint(ctx.stack.pop(), "assert"):
+        raise _AssertFailed()
+
+
+def op_return(ctx, _):
+    value = ctx.stack.pop()
+    ctx.stack[:] = [value]
+    return len(ctx.program.code)
+
+
+def op_callsub(ctx, operand):
+    target, return_pc = operand
+    if len(ctx.frames) >= 8 * 1024:
+        raise TealError("callsub stack overflow")
+    ctx.frames.append([return_pc, len(ctx.stack), 0, 0, False])
+    return target
+
+
+def op_proto(ctx, operand):
+    args, returns = operand
+    frame = ctx.frames[-1]
+    if len(ctx.stack) < args:
+        raise TealError("proto: not enough arguments on the stack")
+    # The frame pointer stays at the callsub height: arguments sit below it
+    # (frame_dig -1 is the last argument) and locals above it
+    frame[2], frame[3], frame[4] = args, returns, True
+
+
+def op_retsub(ctx, _):
+    return_pc, base, args, returns, has_proto = ctx.frames.pop()
+    if has_proto:
+        stack = ctx.stack
+        results = stack[len(stack) - returns:] if returns else []
+        del stack[base - args:]
+        stack.extend(results)
+    return return_pc
+
+
+def op_frame_dig(ctx, offset):
+    frame = ctx.frames[-1]
+    ctx.stack.append(ctx.stack[frame[1] + offset])
+
+
+def op_frame_bury(ctx, offset):
+    frame = ctx.frames[-1]
+    ctx.stack[frame[1] + offset] = ctx.stack.pop()
+
+
+def op_log(ctx, _):
+    ctx.logs.append(_bytes(ctx.stack.pop(), "log"))
+
+
+# Transaction / global fields ---------------------------------------------
+
+def op_txn(ctx, field):
+    ctx.stack.append(TXN_FIELDS[field](ctx.txn))
+
+
+def op_txna(ctx, operand):
+    field, index = operand
+    try:
+        ctx.stack.append(TXN_ARRAY_FIELDS[field](ctx.txn, index))
+    except IndexError:
+        raise TealError(f"txna {field} {index}: index out of range")
+
+
+def op_txnas(ctx, field):
+    index = _uint(ctx.stack[-1], "txnas")
+    try:
+        ctx.stack[-1] = TXN_ARRAY_FIELDS[field](ctx.txn, index)
+    except IndexError:
+        raise TealError(f"txnas {field} {index}: index out of range")
+
+
+def _group_txn(ctx, index):
+    if index >= len(ctx.group):
+        raise TealError(f"gtxn {index} beyond group of {len(ctx.group)}")
+    return ctx.group[index]
+
+
+def op_gtxn(ctx, operand):
+    index, field = operand
+    ctx.stack.append(TXN_FIELDS[field](_group_txn(ctx, index)))
+
+
+def op_gtxna(ctx, operand):
+    index, field, array_index = operand
+    try:
+        ctx.stack.append(TXN_ARRAY_FIELDS[field](_group_txn(ctx, index), array_index))
+    except IndexError:
+        raise TealError(f"gtxna {field} {array_index}: index out of range")
+
+
+def op_gtxns(ctx, field):
+    ctx.stack[-1] = TXN_FIELDS[field](_group_txn(ctx, _uint(ctx.stack[-1], "gtxns")))
+
+
+def op_gtxnsa(ctx, operand):
+    field, array_index = operand
+    txn = _group_txn(ctx, _uint(ctx.stack[-1], "gtxnsa"))
+    try:
+        ctx.stack[-1] = TXN_ARRAY_FIELDS[field](txn, array_index)
+    except IndexError:
+        raise TealError(f"gtxnsa {field} {array_index}: index out of range")
+
+
+def op_global(ctx, field):
+    ctx.stack.append(ctx.global_field(field))
+
+
+# State access -------------------------------------------------------------
+
+def op_app_global_get(ctx, _):
+    key = _bytes(ctx.stack[-1], "app_global_get")
+    ctx.stack[-1] = ctx.ledger.app_globals[ctx.app_id].get(key, 0)
+
+
+def op_app_global_get_ex(ctx, _):
+    stack = ctx.stack
+    key = _bytes(stack.pop(), "app_global_get_ex")
+    app_id = ctx.resolve_app(stack.pop())
+    state = ctx.ledger.app_globals.get(app_id, {})
+    if key in state:
+        stack.extend((state[key], 1))
+    else:
+        stack.extend((0, 0))
+
+
+def op_app_global_put(ctx, _):
+    stack = ctx.stack
+    value = stack.pop()
+    key = _bytes(stack.pop(), "app_global_put")
+    if len(key) > 64 or len(key) + (len(value) if type(value) is bytes else 0) > 128:
+        raise TealError("app_global_put key/value too long")
+    ctx.ledger.put(ctx.ledger.app_globals[ctx.app_id], key, value)
+
+
+def op_app_global_del(ctx, _):
+    key = _bytes(ctx.stack.pop(), "app_global_del")
+    ctx.ledger.delete(ctx.ledger.app_globals[ctx.app_id], key)
+
+
+def _local_state(ctx, account, app_id, op):
+    address = ctx.resolve_account(account)
+    state = ctx.ledger.app_locals.get((address, app_id))
+    if state is None:
+        raise TealError(f"{op}: account is not opted in to app {app_id}")
+    return state
+
+
+def op_app_local_get(ctx, _):
+    stack = ctx.stack
+    key = _bytes(stack.pop(), "app_local_get")
+    stack[-1] = _local_state(ctx, stack[-1], ctx.app_id, "app_local_get").get(key, 0)
+
+
+def op_app_local_get_ex(ctx, _):
+    stack = ctx.stack
+    key = _bytes(stack.pop(), "app_local_get_ex")
+    app_id = ctx.resolve_app(stack.pop())
+    address = ctx.resolve_account(stack.pop())
+    state = ctx.ledger.app_locals.get((address, app_id), {})
+    if key in state:
+        stack.extend((state[key], 1))
+    else:
+        stack.extend((0, 0))
+
+
+def op_app_local_put(ctx, _):
+    stack = ctx.stack
+    value = stack.pop()
+    key = _bytes(stack.pop(), "app_local_put")
+    state = _local_state(ctx, stack.pop(), ctx.app_id, "app_local_put")
+    if len(key) > 64 or len(key) + (len(value) if type(value) is bytes else 0) > 128:
+        raise TealError("app_local_put key/value too long")
+    ctx.ledger.put(state, key, value)
+
+
+def op_app_local_del(ctx, _):
+    stack = ctx.stack
+    key = _bytes(stack.pop(), "app_local_del")
+    state = _local_state(ctx, stack.pop(), ctx.app_id, "app_local_del")
+    ctx.ledger.delete(state, key)
+
+
+def op_app_opted_in(ctx, _):
+    stack = ctx.stack
+    app_id = ctx.resolve_app(stack.pop())
+    address = ctx.resolve_account(stack[-1])
+    stack[-1] = 1 if (address, app_id) in ctx.ledger.app_locals else 0
+
+
+def op_balance(ctx, _):
+    address = ctx.resolve_account(ctx.stack[-1])
+    ctx.stack[-1] = ctx.ledger.balances.get(address, 0)
+
+
+def op_min_balance(ctx, _):
+    address = ctx.resolve_account(ctx.stack[-1])
+    ctx.stack[-1] = ctx.ledger.min_balance(address)
+
+
+def op_asset_holding_get(ctx, field):
+    stack = ctx.stack
+    asset_id = ctx.resolve_asset(stack.pop())
+    address = ctx.resolve_account(stack[-1])
+    holding = ctx.ledger.holdings.get((address, asset_id))
+    if holding is None:
+        stack[-1] = 0
+        stack.append(0)
+        return
+    if field == "AssetBalance":
+        stack[-1] = holding
+    elif field == "AssetFrozen":
+        stack[-1] = 0
+    else:
+        raise TealError(f"unsupported asset_holding_get field {field}")
+    stack.append(1)
+
+
+def op_app_params_get(ctx, field):
+    stack = ctx.stack
+    app_id = ctx.resolve_app(stack[-1])
+    app = ctx.ledger.apps.get(app_id)
+    if app is None:
+        stack[-1] = 0
+        stack.append(0)
+        return
+    values = {
+        "AppCreator": app.creator,
+        "AppAddress": app_address(app_id),
+        "AppGlobalNumUint": app.global_schema[0],
+        "AppGlobalNumByteSlice": app.global_schema[1],
+        "AppLocalNumUint": app.local_schema[0],
+        "AppLocalNumByteSlice": app.local_schema[1],
+        "AppApprovalProgram": app.approval.source.encode(),
+        "AppClearStateProgram": app.clear.source.encode(),
+        "AppExtraProgramPages": app.extra_pages,
+    }
+    stack[-1] = values[field]
+    stack.append(1)
+
+
+# Boxes ------------------------------------------------------------------
+
+def _box_key(ctx, name, op):
+    name = _bytes(name, op)
+    if not 0 < len(name) <= 64:
+        raise TealError(f"{op}: invalid box name length")
+    if not ctx.box_available(name):
+        raise TealError(f"{op}: box {name!r} is not referenced by the group")
+    return (ctx.app_id, name)
+
+
+def op_box_create(ctx, _):
+    stack = ctx.stack
+    size = _uint(stack.pop(), "box_create")
+    key = _box_key(ctx, stack[-1], "box_create")
+    if size > MAX_BOX_SIZE:
+        raise TealError("box_create: box size too large")
+    boxes = ctx.ledger.boxes
+    if key in boxes:
+        if len(boxes[key]) != size:
+            raise TealError("box_create: existing box has a different size")
+        stack[-1] = 0
+        return
+    ctx.ledger.put(boxes, key, bytes(size))
+    stack[-1] = 1
+
+
+def op_box_del(ctx, _):
+    key = _box_key(ctx, ctx.stack[-1], "box_del")
+    if key in ctx.ledger.boxes:
+        ctx.ledger.delete(ctx.ledger.boxes, key)
+        ctx.stack[-1] = 1
+    else:
+        ctx.stack[-1] = 0
+
+
+def op_box_len(ctx, _):
+    key = _box_key(ctx, ctx.stack[-1], "box_len")
+    box = ctx.ledger.boxes.get(key)
+    ctx.stack[-1] = 0 if box is None else len(box)
+    ctx.stack.append(0 if box is None else 1)
+
+
+def op_box_get(ctx, _):
+    key = _box_key(ctx, ctx.stack[-1], "box_get")
+    box = ctx.ledger.boxes.get(key)
+    ctx.stack[-1] = b"" if box is None else box
+    ctx.stack.append(0 if box is None else 1)
+
+
+def op_box_put(ctx, _):
+    stack = ctx.stack
+    value = _bytes(stack.pop(), "box_put")
+    key = _box_key(ctx, stack.pop(), "box_put")
+    box = ctx.ledger.boxes.get(key)
+    if box is not None and len(box) != len(value):
+        raise TealError("box_put: size mismatch with existing box")
+    ctx.ledger.put(ctx.ledger.boxes, key, value)
+
+
+def op_box_extract(ctx, _):
+    stack = ctx.stack
+    length = _uint(stack.pop(), "box_extract")
+    start = _uint(stack.pop(), "box_extract")
+    key = _box_key(ctx, stack[-1], "box_extract")
+    box = ctx.ledger.boxes.get(key)
+    if box is None:
+        raise TealError("box_extract: no such box")
+    stack[-1] = _substring(box, start, start + length, "box_extract")
+
+
+def op_box_replace(ctx, _):
+    stack = ctx.stack
+    patch = _bytes(stack.pop(), "box_replace")
+    start = _uint(stack.pop(), "box_replace")
+    key = _box_key(ctx, stack.pop(), "box_replace")
+    box = ctx.ledger.boxes.get(key)
+    if box is None:
+        raise TealError("box_replace: no such box")
+    _substring(box, start, start + len(patch), "box_replace")
+    ctx.ledger.put(ctx.ledger.boxes, key, box[:start] + patch + box[start + len(patch):])
+
+
+# Inner transactions -----------------------------------------------------
+
+def op_itxn_begin(ctx, _):
+    if ctx.inner_building is not None:
+        raise TealError("itxn_begin without itxn_submit")
+    ctx.inner_building = [ctx.new_inner_txn()]
+
+
+def op_itxn_next(ctx, _):
+    if ctx.inner_building is None:
+        raise TealError("itxn_next without itxn_begin")
+    ctx.inner_building.append(ctx.new_inner_txn())
+
+
+def op_itxn_field(ctx, field):
+    if ctx.inner_building is None:
+        raise TealError("itxn_field without itxn_begin")
+    txn = ctx.inner_building[-1]
+    value = ctx.stack.pop()
+    if field == "TypeEnum":
+        txn.type = TXN_TYPE_NAMES[_uint(value, "itxn_field TypeEnum")]
+    elif field == "Type":
+        txn.type = _bytes(value, "itxn_field Type").decode()
+    elif field in ITXN_ARRAY_FIELDS:
+        if field == "Accounts":
+            value = ctx.resolve_account(value)
+        elif field == "Applications" and not ctx.app_available(_uint(value, "itxn_field Applications")):
+            raise TealError(f"itxn_field Applications: unavailable app {value}")
+        elif field == "Assets" and not ctx.asset_available(_uint(value, "itxn_field Assets")):
+            raise TealError(f"itxn_field Assets: unavailable asset {value}")
+        getattr(txn, ITXN_ARRAY_FIELDS[field]).append(value)
+    elif field in ("ApprovalProgram", "ClearStateProgram"):
+        program = Program(_bytes(value, f"itxn_field {field}").decode())
+        setattr(txn, "approval_program" if field == "ApprovalProgram" else "clear_program", program)
+    elif field in ("GlobalNumUint", "GlobalNumByteSlice", "LocalNumUint", "LocalNumByteSlice"):
+        attr = "global_schema" if field.startswith("Global") else "local_schema"
+        schema = list(getattr(txn, attr))
+        schema[0 if field.endswith("Uint") else 1] = _uint(value, f"itxn_field {field}")
+        setattr(txn, attr, tuple(schema))
+    elif field in ITXN_SCALAR_FIELDS:
+        if field in ("Receiver", "CloseRemainderTo", "AssetReceiver", "AssetSender",
+                     "AssetCloseTo", "Sender", "RekeyTo"):
+            value = ctx.resolve_account(value)
+        elif field == "XferAsset" and not ctx.asset_available(_uint(value, "itxn_field XferAsset")):
+            raise TealError(f"itxn_field XferAsset: unavailable asset {value}")
+        elif field == "ApplicationID" and value and not ctx.app_available(_uint(value, "itxn_field ApplicationID")):
+            raise TealError(f"itxn_field ApplicationID: unavailable app {value}")
+        setattr(txn, ITXN_SCALAR_FIELDS[field], value)
+    else:
+        raise TealError(f"unsupported itxn_field {field}")
+
+
+def op_itxn_submit(ctx, _):
+    if ctx.inner_building is None:
+        raise TealError("itxn_submit without itxn_begin")
+    group, ctx.inner_building = ctx.inner_building, None
+    ctx.ledger.execute_inner_group(ctx, group)
+    ctx.last_inner = group
+
+
+def op_itxn(ctx, field):
+    if not ctx.last_inner:
+        raise TealError("itxn: no inner transaction submitted")
+    ctx.stack.append(TXN_FIELDS[field](ctx.last_inner[-1]))
+
+
+def op_itxna(ctx, operand):
+    if not ctx.last_inner:
+        raise TealError("itxna: no inner transaction submitted")
+    field, index = operand
+    ctx.stack.append(TXN_ARRAY_FIELDS[field](ctx.last_inner[-1], index))
+
+
+BINARY_UINT_OPS = {
+    "+": _add, "-": _sub, "*": _mul, "/": _div, "%": _mod, "exp": _exp,
+    "<": lambda a, b: 1 if a < b else 0,
+    ">": lambda a, b: 1 if a > b else 0,
+    "<=": lambda a, b: 1 if a <= b else 0,
+    ">=": lambda a, b: 1 if a >= b else 0,
+    "&&": lambda a, b: 1 if a and b else 0,
+    "||": lambda a, b: 1 if a or b else 0,
+    "&": lambda a, b: a & b,
+    "|": lambda a, b: a | b,
+    "^": lambda a, b: a ^ b,
+    "shl": _shl,
+    "shr": _shr,
+}
+
+SIMPLE_OPS = {
+    "==": op_eq, "!=": op_neq, "!": op_not, "~": op_bitnot, "sqrt": op_sqrt,
+    "btoi": op_btoi, "itob": op_itob, "len": op_len, "concat": op_concat,
+    "substring3": op_substring3, "extract3": op_extract3,
+    "extract_uint16": _extract_uint(2), "extract_uint32": _extract_uint(4),
+    "extract_uint64": _extract_uint(8), "replace3": op_replace3,
+    "getbyte": op_getbyte, "setbyte": op_setbyte, "bzero": op_bzero,
+    "sha256": _hash("sha256", 35), "sha512_256": _hash("sha512_256", 45),
+    "sha3_256": _hash("sha3_256", 130),
+    "b==": _bytes_compare("b==", lambda a, b: a == b),
+    "b!=": _bytes_compare("b!=", lambda a, b: a != b),
+    "b<": _bytes_compare("b<", lambda a, b: a < b),
+    "b>": _bytes_compare("b>", lambda a, b: a > b),
+    "b<=": _bytes_compare("b<=", lambda a, b: a <= b),
+    "b>=": _bytes_compare("b>=", lambda a, b: a >= b),
+    "b+": _bytes_arith("b+", lambda a, b: a + b),
+    "b-": _bytes_arith("b-", lambda a, b: a - b),
+    "b*": _bytes_arith("b*", lambda a, b: a * b),
+    "pop": op_pop, "dup": op_dup, "dup2": op_dup2, "swap": op_swap, "select": op_select,
+    "stores": op_stores, "loads": op_loads,
+    "err": op_err, "assert": op_assert, "return": op_return, "retsub": op_retsub,
+    "log": op_log,
+    "app_global_get": op_app_global_get, "app_global_get_ex": op_app_global_get_ex,
+    "app_global_put": op_app_global_put, "app_global_del": op_app_global_del,
+    "app_local_get": op_app_local_get, "app_local_get_ex": op_app_local_get_ex,
+    "app_local_put": op_app_local_put, "app_local_del": op_app_local_del,
+    "app_opted_in": op_app_opted_in, "balance": op_balance, "min_balance": op_min_balance,
+    "box_create": op_box_create, "box_del": op_box_del, "box_len": op_box_len,
+    "box_get": op_box_get, "box_put": op_box_put, "box_extract": op_box_extract,
+    "box_replace": op_box_replace,
+    "itxn_begin": op_itxn_begin, "itxn_next": op_itxn_next, "itxn_submit": op_itxn_submit,
+}
+for _name, _fn in BINARY_UINT_OPS.items():
+    SIMPLE_OPS[_name] = _binary_uint(_name, _fn)
+
+
+def _assemble(op, args):
+    """Return (handler, operand, branch_label) for one TEAL line"""
+    if op in SIMPLE_OPS:
+        return SIMPLE_OPS[op], None, None
+    if op in ("int", "pushint"):
+        return op_push, _parse_int(args[0]), None
+    if op in ("byte", "pushbytes"):
+        return op_push, _parse_bytes(args), None
+    if op == "addr":
+        return op_push, decode_address(args[0]), None
+    if op == "method":
+        return op_push, method_selector(_parse_string(args[0]).decode()), None
+    if op == "intcblock":
+        return op_intcblock, [_parse_int(a) for a in args], None
+    if op == "bytecblock":
+        return op_bytecblock, [_parse_bytes([a]) for a in args], None
+    if op in ("intc", "bytec"):
+        return (op_intc if op == "intc" else op_bytec), int(args[0]), None
+    if op in ("intc_0", "intc_1", "intc_2", "intc_3"):
+        return op_intc, int(op[-1]), None
+    if op in ("bytec_0", "bytec_1", "bytec_2", "bytec_3"):
+        return op_bytec, int(op[-1]), None
+    if op in ("b", "bnz", "bz", "callsub"):
+        handler = {"b": op_b, "bnz": op_bnz, "bz": op_bz, "callsub": op_callsub}[op]
+        return handler, None, args[0]
+    if op == "proto":
+        return op_proto, (int(args[0]), int(args[1])), None
+    if op in ("frame_dig", "frame_bury"):
+        return (op_frame_dig if op == "frame_dig" else op_frame_bury), int(args[0]), None
+    if op in ("dig", "bury", "cover", "uncover", "popn", "dupn"):
+        handler = {"dig": op_dig, "bury": op_bury, "cover": op_cover,
+                   "uncover": op_uncover, "popn": op_popn, "dupn": op_dupn}[op]
+        return handler, int(args[0]), None
+    if op in ("store", "load"):
+        return (op_store if op == "store" else op_load), int(args[0]), None
+    if op == "substring":
+        return op_substring, (int(args[0]), int(args[1])), None
+    if op == "extract":
+        return op_extract, (int(args[0]), int(args[1])), None
+    if op == "replace2":
+        return op_replace2, int(args[0]), None
+    if op == "txn":
+        if len(args) == 2:
+            return op_txna, (args[0], int(args[1])), None
+        return op_txn, args[0], None
+    if op == "txna":
+        return op_txna, (args[0], int(args[1])), None
+    if op == "txnas":
+        return op_txnas, args[0], None
+    if op == "gtxn":
+        if len(args) == 3:
+            return op_gtxna, (int(args[0]), args[1], int(args[2])), None
+        return op_gtxn, (int(args[0]), args[1]), None
+    if op == "gtxna":
+        return op_gtxna, (int(args[0]), args[1], int(args[2])), None
+    if op == "gtxns":
+        return op_gtxns, args[0], None
+    if op == "gtxnsa":
+        return op_gtxnsa, (args[0], int(args[1])), None
+    if op == "global":
+        return op_global, args[0], None
+    if op == "asset_holding_get":
+        return op_asset_holding_get, args[0], None
+    if op == "app_params_get":
+        return op_app_params_get, args[0], None
+    if op == "itxn_field":
+        return op_itxn_field, args[0], None
+    if op == "itxn":
+        if len(args) == 2:
+            return op_itxna, (args[0], int(args[1])), None
+        return op_itxn, args[0], None
+    if op == "itxna":
+        return op_itxna, (args[0], int(args[1])), None
+    raise TealError(f"unsupported opcode {op}")
+
+
+# ---------------------------------------------------------------------------
+# Ledger and evaluation
+# ---------------------------------------------------------------------------
+
+class Application:
+    """An application's immutable-ish parameters"""
+
+    def __init__(self, app_id, creator, approval, clear, global_schema, local_schema, extra_pages=0):
+        self.app_id = app_id
+        self.creator = creator
+        self.approval = approval
+        self.clear = clear
+        self.global_schema = tuple(global_schema)
+        self.local_schema = tuple(local_schema)
+        self.extra_pages = extra_pages
+
+
+class EvalContext:
+    """Execution state of one approval/clear program run"""
+
+    def __init__(self, ledger, program, group, index, app_id, caller_app_id=0, budget=None):
+        self.ledger = ledger
+        self.program = program
+        self.group = group
+        self.txn = group[index]
+        self.app_id = app_id
+        self.caller_app_id = caller_app_id
+        self.stack = []
+        self.scratch = [0] * 256
+        self.frames = []
+        self.int_constants = []
+        self.byte_constants = []
+        self.logs = self.txn.logs
+        self.inner_building = None
+        self.last_inner = None
+        self.pc = 0
+        self.cost = 0
+        self.budget = budget if budget is not None else [APP_BUDGET]
+
+    def global_field(self, field):
+        ledger = self.ledger
+        if field == "LatestTimestamp":
+            return ledger.timestamp
+        if field == "Round":
+            return ledger.round
+        if field == "CurrentApplicationID":
+            return self.app_id
+        if field == "CurrentApplicationAddress":
+            return app_address(self.app_id)
+        if field == "CreatorAddress":
+            return ledger.apps[self.app_id].creator
+        if field == "GroupSize":
+            return len(self.group)
+        if field == "MinTxnFee":
+            return MIN_TXN_FEE
+        if field == "MinBalance":
+            return MIN_BALANCE
+        if field == "MaxTxnLife":
+            return 1000
+        if field == "ZeroAddress":
+            return ZERO_ADDRESS
+        if field == "LogicSigVersion":
+            return 10
+        if field == "CallerApplicationID":
+            return self.caller_app_id
+        if field == "CallerApplicationAddress":
+            return app_address(self.caller_app_id) if self.caller_app_id else ZERO_ADDRESS
+        if field == "OpcodeBudget":
+            return self.budget[0] - self.cost
+        if field == "GroupID":
+            return ledger.group_id
+        raise TealError(f"unsupported global field {field}")
+
+    def _created_in_group(self, attr):
+        """IDs created by earlier transactions of the top-level group (available since v6)"""
+        group = self.ledger.top_group or self.group
+        return {getattr(txn, attr) for txn in group if getattr(txn, attr)}
+
+    def account_available(self, address):
+        txn = self.txn
+        if address == txn.sender or address in txn.accounts or address == app_address(self.app_id):
+            return True
+        if any(address == app_address(app_id) for app_id in txn.foreign_apps):
+            return True
+        return any(address == app_address(app_id) for app_id in self._created_in_group("created_app_id"))
+
+    def app_available(self, app_id):
+        return (app_id == self.app_id or app_id in self.txn.foreign_apps
+                or app_id in self._created_in_group("created_app_id"))
+
+    def asset_available(self, asset_id):
+        return (asset_id in self.txn.foreign_assets
+                or asset_id in self._created_in_group("created_asset_id"))
+
+    def resolve_account(self, value):
+        if type(value) is bytes:
+            if len(value) != 32:
+                raise TealError("invalid account reference")
+            if not self.account_available(value):
+                raise TealError(f"unavailable account {value[:4].hex()}")
+            return value
+        if value == 0:
+            return self.txn.sender
+        if value <= len(self.txn.accounts):
+            return self.txn.accounts[value - 1]
+        raise TealError(f"invalid account index {value}")
+
+    def resolve_app(self, value):
+        value = _uint(value, "app reference")
+        if value == 0:
+            return self.app_id
+        if value <= len(self.txn.foreign_apps):
+            return self.txn.foreign_apps[value - 1]
+        if not self.app_available(value):
+            raise TealError(f"unavailable app {value}")
+        return value
+
+    def resolve_asset(self, value):
+        value = _uint(value, "asset reference")
+        if value < len(self.txn.foreign_assets):
+            return self.txn.foreign_assets[value]
+        if not self.asset_available(value):
+            raise TealError(f"unavailable asset {value}")
+        return value
+
+    def box_available(self, name):
+        """
+        Whether a box of this app is referenced by an app call of the
+        top-level group (box references are shared across the group)
+        """
+        for txn in self.ledger.top_group or self.group:
+            if txn.type != "appl":
+                continue
+            called = txn.app_id or txn.created_app_id
+            for app_index, box_name in txn.boxes:
+                if box_name != name:
+                    continue
+                target = called if app_index == 0 else (
+                    txn.foreign_apps[app_index - 1] if app_index <= len(txn.foreign_apps) else None)
+                if target == self.app_id:
+                    return True
+        return False
+
+    def new_inner_txn(self):
+        txn = Txn(sender=app_address(self.app_id), fee=None)
+        txn.type = "pay"
+        return txn
+
+    def run(self):
+        """Execute the program; returns True if it approves"""
+        code = self.program.code
+        end = len(code)
+        stack = self.stack
+        pc = 0
+        try:
+            while pc < end:
+                handler, operand = code[pc]
+                target = handler(self, operand)
+                pc = pc + 1 if target is None else target
+                self.cost += 1
+                if len(stack) > MAX_STACK:
+                    raise TealError("stack overflow")
+        except _AssertFailed:
+            self.pc = pc
+            raise TealError(f"assert failed at pc={pc}") from None
+        except IndexError as e:
+            self.pc = pc
+            raise TealError(f"stack underflow or index error at pc={pc}: {e}")
+
+        self.budget[0] -= self.cost
+        if self.budget[0] < 0:
+            raise TealError("dynamic cost budget exceeded")
+        if self.inner_building is not None:
+            raise TealError("program ended with an unsubmitted inner transaction")
+        if len(stack) != 1:
+            raise TealError(f"stack must contain exactly one value at end, has {len(stack)}")
+        result = stack[0]
+        if type(result) is not int:
+            raise TealError("program ended with bytes on the stack")
+        return result != 0
+
+
+class Ledger:
+    """
+    In-memory ledger with journaled, atomic group application
+
+    Every mutation goes through put/delete so a failing group can be rolled
+    back by replaying the journal in reverse.
+    """
+
+    def __init__(self, round=1, timestamp=1700000000, enforce_min_balance=True,
+                 fee_sink=b"\xfe" * 32):
+        self.round = round
+        self.timestamp = timestamp
+        self.enforce_min_balance = enforce_min_balance
+        self.fee_sink = fee_sink
+        self.balances = {}
+        self.holdings = {}
+        self.assets = {}
+        self.apps = {}
+        self.app_globals = {}
+        self.app_locals = {}
+        self.boxes = {}
+        self.next_id = 1000
+        self.txn_counter = 0
+        self.group_id = bytes(32)
+        self.top_group = None
+        self._journal = None
+
+    # Journaled mutation ---------------------------------------------------
+
+    def put(self, container, key, value):
+        if self._journal is not None:
+            self._journal.append((container, key, container.get(key, _MISSING)))
+        container[key] = value
+
+    def delete(self, container, key):
+        if key not in container:
+            return
+        if self._journal is not None:
+            self._journal.append((container, key, container[key]))
+        del container[key]
+
+    def _rollback(self, mark):
+        journal = self._journal
+        while len(journal) > mark:
+            container, key, old = journal.pop()
+            if old is _MISSING:
+                container.pop(key, None)
+            else:
+                container[key] = old
+
+    def checkpoint(self):
+        """Start (or extend) journaling and return a mark to revert to"""
+        if self._journal is None:
+            self._journal = []
+        return len(self._journal)
+
+    def revert(self, mark):
+        """Undo every change made since `checkpoint` returned `mark`"""
+        self._rollback(mark)
+        if mark == 0:
+            self._journal = None
+
+    # Convenience -----------------------------------------------------------
+
+    def fund(self, address, amount):
+        """Credit an account outside of any transaction (genesis funding)"""
+        self.balances[address] = self.balances.get(address, 0) + amount
+
+    def advance(self, rounds=1, seconds=None):
+        """Move the chain forward"""
+        self.round += rounds
+        self.timestamp += seconds if seconds is not None else rounds * 3
+
+    def balance(self, address):
+        return self.balances.get(address, 0)
+
+    def global_state(self, app_id):
+        return dict(self.app_globals.get(app_id, {}))
+
+    def local_state(self, address, app_id):
+        state = self.app_locals.get((address, app_id))
+        return None if state is None else dict(state)
+
+    def create_asset(self, creator, total, decimals=0, unit_name="", asset_id=None):
+        """Create an ASA held entirely by its creator"""
+        if asset_id is None:
+            asset_id = self._next_id()
+        self.assets[asset_id] = {"creator": creator, "total": total, "decimals": decimals,
+                                 "unit_name": unit_name}
+        self.holdings[(creator, asset_id)] = total
+        return asset_id
+
+    def _next_id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def min_balance(self, address):
+        """Minimum balance an account must keep, following mainnet rules"""
+        required = MIN_BALANCE
+        for (holder, _asset_id) in self.holdings:
+            if holder == address:
+                required += ASSET_MIN_BALANCE
+        for (holder, app_id) in self.app_locals:
+            if holder == address:
+                uints, byte_slices = self.apps[app_id].local_schema
+                required += (OPT_IN_MIN_BALANCE + SCHEMA_UINT_MIN_BALANCE * uints +
+                             SCHEMA_BYTES_MIN_BALANCE * byte_slices)
+        for app in self.apps.values():
+            if app.creator == address:
+                uints, byte_slices = app.global_schema
+                required += (APP_PAGE_MIN_BALANCE * (1 + app.extra_pages) +
+                             SCHEMA_UINT_MIN_BALANCE * uints +
+                             SCHEMA_BYTES_MIN_BALANCE * byte_slices)
+        for (app_id, name), box in self.boxes.items():
+            if app_address(app_id) == address:
+                required += BOX_FLAT_MIN_BALANCE + BOX_BYTE_MIN_BALANCE * (len(name) + len(box))
+        return required
+
+    # Transfers -------------------------------------------------------------
+
+    def _debit(self, address, amount):
+        balance = self.balances.get(address, 0)
+        if amount > balance:
+            raise TealError(f"overspend: {address[:4].hex()} has {balance}, needs {amount}")
+        self.put(self.balances, address, balance - amount)
+
+    def _credit(self, address, amount):
+        self.put(self.balances, address, self.balances.get(address, 0) + amount)
+
+    def _apply_payment(self, txn):
+        self._debit(txn.sender, txn.amount)
+        self._credit(txn.receiver, txn.amount)
+        if txn.close_remainder_to != ZERO_ADDRESS:
+            remainder = self.balances.get(txn.sender, 0)
+            self._debit(txn.sender, remainder)
+            self._credit(txn.close_remainder_to, remainder)
+
+    def _apply_asset_transfer(self, txn):
+        asset_id = txn.xfer_asset
+        if asset_id not in self.assets:
+            raise TealError(f"asset {asset_id} does not exist")
+        sender = txn.asset_sender if txn.asset_sender != ZERO_ADDRESS else txn.sender
+        receiver_key = (txn.asset_receiver, asset_id)
+
+        # Zero-amount self transfer is an opt-in
+        if txn.asset_receiver == sender and txn.asset_amount == 0 and receiver_key not in self.holdings:
+            self.put(self.holdings, receiver_key, 0)
+            return
+
+        sender_key = (sender, asset_id)
+        if sender_key not in self.holdings:
+            raise TealError("asset sender is not opted in")
+        if receiver_key not in self.holdings:
+            raise TealError("asset receiver is not opted in")
+        if txn.asset_amount > self.holdings[sender_key]:
+            raise TealError("asset overspend")
+        self.put(self.holdings, sender_key, self.holdings[sender_key] - txn.asset_amount)
+        self.put(self.holdings, receiver_key, self.holdings[receiver_key] + txn.asset_amount)
+
+        if txn.asset_close_to != ZERO_ADDRESS:
+            close_key = (txn.asset_close_to, asset_id)
+            if close_key not in self.holdings:
+                raise TealError("asset close-to account is not opted in")
+            self.put(self.holdings, close_key, self.holdings[close_key] + self.holdings[sender_key])
+            self.delete(self.holdings, sender_key)
+
+    # Application calls ------------------------------------------------------
+
+    def _apply_app_call(self, group, index, caller_app_id=0, budget=None):
+        txn = group[index]
+        app_id = txn.app_id
+
+        if app_id == 0:
+            app_id = self._next_id()
+            approval = txn.approval_program
+            clear = txn.clear_program
+            if isinstance(approval, str):
+                approval = Program(approval)
+            if isinstance(clear, str):
+                clear = Program(clear)
+            app = Application(app_id, txn.sender, approval, clear,
+                              txn.global_schema, txn.local_schema, txn.extra_pages)
+            self.put(self.apps, app_id, app)
+            self.put(self.app_globals, app_id, {})
+            txn.created_app_id = app_id
+        elif app_id not in self.apps:
+            raise TealError(f"application {app_id} does not exist")
+
+        app = self.apps[app_id]
+        local_key = (txn.sender, app_id)
+
+        if txn.on_completion == CLEAR_STATE:
+            if local_key not in self.app_locals:
+                raise TealError("clear state: account is not opted in")
+            mark = len(self._journal)
+            try:
+                ctx = EvalContext(self, app.clear, group, index, app_id, caller_app_id, budget)
+                ctx.run()
+            except TealError:
+                # Clear state always succeeds; only its state changes are discarded
+                self._rollback(mark)
+            self.delete(self.app_locals, local_key)
+            return
+
+        if txn.on_completion == OPT_IN:
+            if local_key in self.app_locals:
+                raise TealError("account already opted in")
+            self.put(self.app_locals, local_key, {})
+
+        ctx = EvalContext(self, app.approval, group, index, app_id, caller_app_id, budget)
+        if not ctx.run():
+            raise TealError(f"app {app_id} rejected {txn.app_args[:1]}")
+
+        self._check_schema(app)
+
+        if txn.on_completion == CLOSE_OUT:
+            self.delete(self.app_locals, local_key)
+        elif txn.on_completion == UPDATE_APPLICATION:
+            approval, clear = txn.approval_program, txn.clear_program
+            if isinstance(approval, str):
+                approval = Program(approval)
+            if isinstance(clear, str):
+                clear = Program(clear)
+            updated = Application(app_id, app.creator, approval, clear,
+                                  app.global_schema, app.local_schema, app.extra_pages)
+            self.put(self.apps, app_id, updated)
+        elif txn.on_completion == DELETE_APPLICATION:
+            self.delete(self.apps, app_id)
+            self.delete(self.app_globals, app_id)
+
+    def _check_schema(self, app):
+        state = self.app_globals.get(app.app_id, {})
+        uints = sum(1 for v in state.values() if type(v) is int)
+        if uints > app.global_schema[0] or len(state) - uints > app.global_schema[1]:
+            raise TealError(f"app {app.app_id} global state exceeds its schema")
+
+    def execute_inner_group(self, ctx, group):
+        """Apply transactions submitted by a program with itxn_submit"""
+        if len(ctx.txn.inner_txns) + len(group) > 256:
+            raise TealError("too many inner transactions")
+
+        for txn in group:
+            if txn.sender != app_address(ctx.app_id):
+                raise TealError("inner transaction sender must be the app account")
+            if txn.fee is None:
+                # Unset fees are covered by the group's pooled surplus when possible
+                if self._fee_credit >= MIN_TXN_FEE:
+                    self._fee_credit -= MIN_TXN_FEE
+                    txn.fee = 0
+                else:
+                    txn.fee = MIN_TXN_FEE
+            else:
+                self._fee_credit += txn.fee - MIN_TXN_FEE
+                if self._fee_credit < 0:
+                    raise TealError("inner transaction fee below the minimum")
+
+        for index, txn in enumerate(group):
+            txn.group_index = index
+            txn.txid = self._txid()
+            self._charge_fee(txn)
+            self._apply(group, index, caller_app_id=ctx.app_id, budget=ctx.budget)
+            if txn.type == "appl":
+                ctx.budget[0] += APP_BUDGET
+        ctx.txn.inner_txns.extend(group)
+
+    def _charge_fee(self, txn):
+        if txn.fee:
+            self._debit(txn.sender, txn.fee)
+            self._credit(self.fee_sink, txn.fee)
+
+    def _apply(self, group, index, caller_app_id=0, budget=None):
+        txn = group[index]
+        if txn.type == "pay":
+            self._apply_payment(txn)
+        elif txn.type == "axfer":
+            self._apply_asset_transfer(txn)
+        elif txn.type == "appl":
+            self._apply_app_call(group, index, caller_app_id, budget)
+        else:
+            raise TealError(f"unsupported transaction type {txn.type}")
+
+    def _txid(self):
+        self.txn_counter += 1
+        return hashlib.sha256(b"ellora-txn" + self.txn_counter.to_bytes(8, "big")).digest()
+
+    def _touched(self, txns):
+        touched = set()
+        for txn in txns:
+            touched.update((txn.sender, txn.receiver, txn.close_remainder_to,
+                            txn.asset_receiver, txn.asset_close_to))
+            if txn.type == "appl":
+                app_id = txn.app_id or txn.created_app_id
+                touched.add(app_address(app_id))
+                touched.update(txn.accounts)
+            touched.update(self._touched(txn.inner_txns))
+        touched.discard(ZERO_ADDRESS)
+        return touched
+
+    def submit(self, group):
+        """
+        Apply a transaction group atomically
+
+        Returns the group's transactions (with created IDs, logs and inner
+        transactions filled in). On failure every change is rolled back and
+        TealError is raised.
+        """
+        if not 0 < len(group) <= 16:
+            raise TealError("group size must be between 1 and 16")
+
+        # Checked before journaling starts, so a rejected group leaves no journal behind
+        fees = sum(txn.fee or 0 for txn in group)
+        if fees < MIN_TXN_FEE * len(group):
+            raise TealError("group fees are below the minimum")
+        self._fee_credit = fees - MIN_TXN_FEE * len(group)
+
+        outer = self._journal is None
+        if outer:
+            self._journal = []
+        mark = len(self._journal)
+        self.top_group = group
+        self.group_id = hashlib.sha256(b"group" + self.txn_counter.to_bytes(8, "big")).digest()
+
+        budget = [APP_BUDGET * sum(1 for txn in group if txn.type == "appl")]
+        try:
+            for index, txn in enumerate(group):
+                txn.group_index = index
+                txn.txid = self._txid()
+                txn.logs = []
+                txn.inner_txns = []
+                self._charge_fee(txn)
+                self._apply(group, index, budget=budget)
+
+            if self.enforce_min_balance:
+                for address in self._touched(group):
+                    balance = self.balances.get(address, 0)
+                    if balance and balance < self.min_balance(address):
+                        raise TealError(f"{address[:4].hex()} below min balance "
+                                        f"({balance} < {self.min_balance(address)})")
+        except TealError:
+            self._rollback(mark)
+            raise
+        finally:
+            self.top_group = None
+            if outer:
+                self._journal = None
+
+        return group
@@ -0,0 +1,8 @@
+"""The scripts import each other as top-level modules, as when run from scripts/"""
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+for directory in ("scripts", "contracts"):
+    sys.path.insert(0, os.path.abspath(os.path.join(ROOT, directory)))
@@ -0,0 +1,56 @@
+import base64
+
+import pytest
+
+from deploy_contracts_fixed import ContractDeployer
+from manifest import DeploymentManifest, program_hash
+
+APPROVAL, CLEAR = b"\x08\x81\x01", b"\x08\x81\x01\x43"
+
+
+class FakeAlgod:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def application_info(self, app_id):
+        if self.fail:
+            raise ConnectionError("algod unreachable")
+        return {"params": {
+            "approval-program": base64.b64encode(APPROVAL).decode(),
+            "clear-state-program": base64.b64encode(CLEAR).decode(),
+            "global-state-schema": {"num-uint": 10, "num-byte-slice": 10},
+            "local-state-schema": {"num-uint": 5, "num-byte-slice": 5},
+        }}
+
+
+@pytest.fixture
+def legacy_manifest(tmp_path):
+    manifest = DeploymentManifest(str(tmp_path / "deployments.json"))
+    manifest.environment("testnet")["apps"]["escrow"] = {
+        "app_id": 742004772, "app_address": None, "approval_hash": None, "clear_hash": None,
+        "global_schema": None, "local_schema": None, "updated_at": None,
+    }
+    return manifest
+
+
+def deployer(algod):
+    planner = ContractDeployer(read_only=True)
+    planner.algod_client = algod
+    return planner
+
+
+def test_backfill_error_aborts_instead_of_leaving_a_partial_entry(legacy_manifest):
+    with pytest.raises(RuntimeError, match="742004772"):
+        deployer(FakeAlgod(fail=True)).backfill_manifest_entry(legacy_manifest, "testnet", "escrow")
+    with pytest.raises(ValueError, match="backfill"):
+        legacy_manifest.diff("testnet", "escrow", program_hash(APPROVAL), program_hash(CLEAR),
+                             {"num_uints": 10, "num_byte_slices": 10}, {"num_uints": 5, "num_byte_slices": 5})
+
+
+def test_backfilled_entry_diffs_against_the_chain(legacy_manifest):
+    deployer(FakeAlgod()).backfill_manifest_entry(legacy_manifest, "testnet", "escrow")
+    schemas = ({"num_uints": 10, "num_byte_slices": 10}, {"num_uints": 5, "num_byte_slices": 5})
+    assert legacy_manifest.diff("testnet", "escrow", program_hash(APPROVAL), program_hash(CLEAR),
+                                *schemas) == "unchanged"
+    assert legacy_manifest.diff("testnet", "escrow", program_hash(b"new"), program_hash(CLEAR),
+                                *schemas) == "update"
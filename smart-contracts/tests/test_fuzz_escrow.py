@@ -0,0 +1,31 @@
+import pytest
+
+from fuzz_escrow import STEPS, EscrowOracle, compile_escrow, compile_reputation, fuzz
+
+# Enough to reach every status while keeping the suite fast
+SEQUENCES = 3000
+
+
+@pytest.fixture(scope="module")
+def oracle():
+    return EscrowOracle(*compile_escrow(), *compile_reputation())
+
+
+def test_invariants_hold(oracle):
+    stats, failures = fuzz(oracle, SEQUENCES, max_length=16, seed=1, stop_on_failure=False)
+    assert failures == []
+    assert stats["statuses"] == ["completed", "created", "disputed", "in_progress", "resolved"]
+
+
+def test_runs_are_reproducible(oracle):
+    first, _ = fuzz(oracle, 200, max_length=16, seed=7)
+    second, _ = fuzz(oracle, 200, max_length=16, seed=7)
+    assert first["steps"] == second["steps"]
+
+
+def test_linked_settlements_are_reached(oracle):
+    fuzz(oracle, SEQUENCES, max_length=16, seed=1)
+    # Mints the platform (actor 0) did not send itself
+    minted = [result[4] for state, transitions in enumerate(oracle.transitions) if oracle.views[state]["sbt_app"]
+              for step, result in transitions.items() if result[0] and result[4] and STEPS[step][0] != 0]
+    assert minted and all(len(recipients) == 1 for recipients in minted)
@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+import time
+from urllib.request import urlopen
+
+import pytest
+
+from job_index import make_server, synthetic_records, write_index
+
+
+@pytest.fixture
+def served(tmp_path):
+    path = str(tmp_path / "index")
+    write_index(path, synthetic_records(50), round_num=7)
+    server = make_server(path, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    yield path, f"http://{host}:{port}"
+    server.shutdown()
+
+
+def get_jobs(url):
+    with urlopen(url + "/jobs?limit=5") as response:
+        return response.status, json.loads(response.read())
+
+
+def touch_meta(path, text):
+    meta_path = os.path.join(path, "meta.json")
+    with open(meta_path, "w") as f:
+        f.write(text)
+    # Make the rewrite visible to is_stale() even on coarse mtime clocks
+    os.utime(meta_path, ns=(time.time_ns(), os.stat(meta_path).st_mtime_ns + 10**9))
+
+
+def test_jobs_served_from_previous_index_while_meta_is_corrupt(served):
+    path, url = served
+    assert get_jobs(url)[1]["total"] == 50
+
+    touch_meta(path, '{"round": ')
+    status, response = get_jobs(url)
+    assert status == 200
+    assert (response["round"], response["total"]) == (7, 50)
+
+
+def test_jobs_served_from_previous_index_mid_swap(served):
+    path, url = served
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = f.read()
+    os.remove(os.path.join(path, "amount.npy"))
+    touch_meta(path, meta)
+
+    status, response = get_jobs(url)
+    assert status == 200
+    assert response["total"] == 50
+
+
+def test_jobs_reloaded_once_rebuild_completes(served):
+    path, url = served
+    touch_meta(path, "")
+    assert get_jobs(url)[1]["round"] == 7
+
+    write_index(path, synthetic_records(20), round_num=8)
+    status, response = get_jobs(url)
+    assert (status, response["round"], response["total"]) == (200, 8, 20)
@@ -0,0 +1,77 @@
+from algosdk import account
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+from algosdk.transaction import (ApplicationNoOpTxn, ApplicationOptInTxn, PaymentTxn,
+                                 assign_group_id, wait_for_confirmation)
+import pytest
+
+from app_state import STATUS_RESOLVED, pack_milestones, read_escrow_job, read_sbt_state
+from deploy_contracts_fixed import CONTRACTS, ContractDeployer
+from escrow_jobs import build_payout_txns
+from local_algod import serve_in_thread
+import migrate_state
+
+
+def arg(value):
+    return value.to_bytes(8, "big")
+
+
+@pytest.fixture
+def chain():
+    server, node, url = serve_in_thread()
+    keys = dict(zip("pcf", (account.generate_account() for _ in range(3))))
+    for _, address in keys.values():
+        node.fund(address, 10**12)
+    deployer = ContractDeployer(private_key=keys["p"][0], algod_address=url, algod_token="a" * 64)
+    yield deployer, keys
+    server.shutdown()
+
+
+def send(algod, txns, keys):
+    if len(txns) > 1:
+        txns = assign_group_id(txns)
+    algod.send_transactions([txn.sign(key) for txn, key in zip(txns, keys)])
+    wait_for_confirmation(algod, txns[-1].get_txid(), 4)
+
+
+def create_app(deployer, name, platform):
+    approval, clear = deployer.compile_contract(name)
+    spec = CONTRACTS[name]
+    app_id = deployer.create_application(approval, clear, spec["global_schema"], spec["local_schema"])
+    send(deployer.algod_client, [PaymentTxn(platform[1], deployer.algod_client.suggested_params(),
+                                            get_application_address(app_id), 10**6)], [platform[0]])
+    return app_id
+
+
+def test_migrated_job_settles_into_new_sbt_app(chain, tmp_path):
+    deployer, keys = chain
+    algod = deployer.algod_client
+    (pk, platform), (ck, client), (fk, freelancer) = keys["p"], keys["c"], keys["f"]
+    params = algod.suggested_params()
+
+    old_sbt = create_app(deployer, "reputation", keys["p"])
+    escrow = create_app(deployer, "escrow", keys["p"])
+    send(algod, [ApplicationNoOpTxn(platform, params, escrow, [b"link_sbt"], foreign_apps=[old_sbt])], [pk])
+    send(algod, [ApplicationNoOpTxn(client, params, escrow,
+                                    [b"create_job", arg(5000), arg(2**40), pack_milestones([2000, 3000])]),
+                 PaymentTxn(client, params, get_application_address(escrow), 5000)], [ck, ck])
+    send(algod, [ApplicationNoOpTxn(freelancer, params, escrow, [b"accept_job"])], [fk])
+
+    new_sbt = create_app(deployer, "reputation", keys["p"])
+    plan = migrate_state.MigrationPlan.create(str(tmp_path / "plan.json"),
+                                              migrate_state.capture(algod, old_sbt, [escrow]))
+    migrate_state.Migrator(plan, algod, pk, platform, deployer.compile_contract("escrow")).run(new_sbt)
+
+    new_escrow = migrate_state.MigrationPlan(str(tmp_path / "plan.json")).escrows[str(escrow)]["new_app"]
+    assert read_escrow_job(algod, new_escrow)["sbt_app"] == new_sbt
+
+    send(algod, [ApplicationOptInTxn(freelancer, params, new_sbt)], [fk])
+    for index in range(2):
+        send(algod, [ApplicationNoOpTxn(freelancer, params, new_escrow,
+                                        [b"submit_milestone", arg(index)])], [fk])
+        job = read_escrow_job(algod, new_escrow)
+        txns = build_payout_txns(params, client, job, "approve_milestone", index)
+        send(algod, txns, [ck] * len(txns))
+
+    assert read_escrow_job(algod, new_escrow)["status"] == STATUS_RESOLVED
+    assert read_sbt_state(algod, decode_address(freelancer), new_sbt)["sbt_count"] == 1
@@ -0,0 +1,57 @@
+import argparse
+import json
+
+from algosdk import account, mnemonic
+from algosdk.encoding import decode_address
+import pytest
+
+from reputation_attestation import AttestationError, cmd_issue, verify_attestation
+from state_snapshot import write_snapshot
+
+SBT_APP = 742004783
+
+
+@pytest.fixture
+def issuer(monkeypatch):
+    private_key, address = account.generate_account()
+    monkeypatch.setenv("ELLORA_ATTESTATION_MNEMONIC", mnemonic.from_private_key(private_key))
+    monkeypatch.delenv("ELLORA_DEPLOYER_MNEMONIC", raising=False)
+    return address
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    platform_key, platform = account.generate_account()
+    state = {"address": decode_address(account.generate_account()[1]), "sbt_count": 3, "positive": 3,
+             "negative": 0, "last_earned": 1700000000, "juror_eligible": 1}
+    path = str(tmp_path / "state.snap")
+    write_snapshot(path, 1234, SBT_APP, [], [state], platform_key)
+    return path, platform
+
+
+def issue_args(snapshot_path, verify, output):
+    return argparse.Namespace(snapshot=snapshot_path, verify=verify, output=output, ttl=100,
+                              address=[], env="testnet", sbt_app_id=None)
+
+
+def test_issue_signs_a_snapshot_from_the_platform(issuer, snapshot, tmp_path):
+    path, platform = snapshot
+    output = str(tmp_path / "attestations.jsonl")
+    assert cmd_issue(issue_args(path, platform, output)) == 0
+
+    with open(output) as f:
+        [line] = f.readlines()
+    attested = verify_attestation(json.loads(line)["attestation"], issuer, SBT_APP)
+    assert (attested["round"], attested["sbt_count"]) == (1234, 3)
+
+
+def test_issue_requires_verify(issuer, snapshot, tmp_path):
+    with pytest.raises(AttestationError, match="--verify"):
+        cmd_issue(issue_args(snapshot[0], None, str(tmp_path / "out.jsonl")))
+
+
+def test_issue_refuses_a_snapshot_signed_by_another_key(issuer, snapshot, tmp_path):
+    output = tmp_path / "out.jsonl"
+    with pytest.raises(AttestationError, match="unexpected key"):
+        cmd_issue(issue_args(snapshot[0], account.generate_account()[1], str(output)))
+    assert not output.exists()
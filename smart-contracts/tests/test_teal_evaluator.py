@@ -0,0 +1,204 @@
+import pytest
+
+from teal_evaluator import (
+    Ledger, Program, TealError, Txn, app_address, APP_BUDGET, MIN_BALANCE, MIN_TXN_FEE, UINT64_MAX,
+)
+
+ALICE, BOB, CAROL = (bytes([i]) * 32 for i in (1, 2, 3))
+FUNDS = 10 ** 9
+
+
+@pytest.fixture
+def ledger():
+    ledger = Ledger()
+    for account in (ALICE, BOB, CAROL):
+        ledger.fund(account, FUNDS)
+    return ledger
+
+
+def program(body):
+    return Program("#pragma version 8\n" + body)
+
+
+def create_app(ledger, body="int 1", **kwargs):
+    txn = Txn(ALICE, app_id=0, approval_program=program(body), clear_program=program("int 1"),
+              global_schema=(4, 4), **kwargs)
+    ledger.submit([txn])
+    ledger.submit([Txn(ALICE, "pay", receiver=app_address(txn.created_app_id), amount=10 ** 6)])
+    return txn.created_app_id
+
+
+def call(ledger, app_id, **kwargs):
+    txn = Txn(BOB, app_id=app_id, **kwargs)
+    ledger.submit([txn])
+    return txn
+
+
+def evaluate(ledger, body, **kwargs):
+    """Run `body` as the approval program of a NoOp call"""
+    # The body only runs on calls, so creation always approves
+    app_id = create_app(ledger, "txn ApplicationID\nbnz run\nint 1\nreturn\nrun:\n" + body)
+    return call(ledger, app_id, **kwargs)
+
+
+# Opcodes --------------------------------------------------------------------
+
+@pytest.mark.parametrize("body", [
+    "int 2\nint 3\n+\nint 5\n==",
+    "int 7\nint 2\n/\nint 3\n==",
+    "int 7\nint 2\n%\nint 1\n==",
+    "int 2\nint 10\nexp\nint 1024\n==",
+    "byte 0x0102\nbyte 0x03\nconcat\nbyte 0x010203\n==",
+    "byte 0x0102030405\nextract 1 2\nbyte 0x0203\n==",
+    "int 258\nitob\nbtoi\nint 258\n==",
+    "int 1\nint 2\nswap\n-",
+    "int 0\nint 9\nint 1\nselect\nint 9\n==",
+    "int 4\nstore 3\nload 3\nint 4\n==",
+])
+def test_opcodes_compute_expected_values(ledger, body):
+    evaluate(ledger, body)
+
+
+@pytest.mark.parametrize("body, message", [
+    (f"int {UINT64_MAX}\nint 1\n+", "overflowed"),
+    ("int 1\nint 2\n-", "would result negative"),
+    ("int 1\nint 0\n/", "by zero"),
+    ("int 1\nbyte 0x01\n==", "same type"),
+    ("int 1\nbtoi", "expects bytes"),
+    ("+", "stack underflow"),
+    ("err", "err opcode"),
+])
+def test_opcodes_panic_on_invalid_operands(ledger, body, message):
+    with pytest.raises(TealError, match=message):
+        evaluate(ledger, body)
+
+
+def test_assert_reports_failing_pc():
+    source = "#pragma version 8\nint 1\nint 0\nassert\nint 1"
+    ledger = Ledger()
+    ledger.fund(ALICE, FUNDS)
+    with pytest.raises(TealError, match=r"assert failed at pc=2"):
+        ledger.submit([Txn(ALICE, app_id=0, approval_program=source, clear_program=program("int 1"))])
+
+
+def test_callsub_returns_after_call_site(ledger):
+    evaluate(ledger, "int 5\ncallsub double\nint 10\n==\nreturn\n"
+                     "double:\nint 2\n*\nretsub")
+
+
+def test_frame_pointers(ledger):
+    evaluate(ledger, "int 3\nint 4\ncallsub add\nint 7\n==\nreturn\n"
+                     "add:\nproto 2 1\nframe_dig -2\nframe_dig -1\n+\nretsub")
+
+
+def test_program_must_end_with_a_single_uint(ledger):
+    with pytest.raises(TealError, match="exactly one value"):
+        evaluate(ledger, "int 1\nint 1")
+    with pytest.raises(TealError, match="bytes on the stack"):
+        evaluate(ledger, "byte 0x01")
+    with pytest.raises(TealError, match="rejected"):
+        evaluate(ledger, "int 0")
+
+
+def test_opcode_budget_is_enforced_and_pooled(ledger):
+    # Six opcodes per iteration: just over one call's budget
+    loop = f"int {APP_BUDGET // 6 + 1}\nstore 0\nloop:\nload 0\nint 1\n-\ndup\nstore 0\nbnz loop\nint 1"
+    app_id = create_app(ledger, "txn ApplicationID\nbnz run\nint 1\nreturn\nrun:\n" + loop)
+    with pytest.raises(TealError, match="budget exceeded"):
+        call(ledger, app_id)
+
+    # A second app call in the group adds its budget to the pool
+    noop = create_app(ledger)
+    ledger.submit([Txn(BOB, app_id=app_id), Txn(BOB, app_id=noop)])
+
+
+def test_state_and_logs(ledger):
+    app_id = create_app(ledger, "byte \"n\"\nint 7\napp_global_put\nbyte \"hi\"\nlog\nint 1")
+    txn = call(ledger, app_id)
+    assert ledger.global_state(app_id) == {b"n": 7}
+    assert txn.logs == [b"hi"]
+
+
+def test_global_state_schema(ledger):
+    body = "".join(f"byte \"k{i}\"\nint {i}\napp_global_put\n" for i in range(5)) + "int 1"
+    with pytest.raises(TealError, match="exceeds its schema"):
+        create_app(ledger, body)
+
+
+# Rules ----------------------------------------------------------------------
+
+def test_group_is_atomic(ledger):
+    app_id = create_app(ledger, "txn ApplicationID\nbz ok\nint 0\nreturn\nok:\nint 1")
+    with pytest.raises(TealError):
+        ledger.submit([Txn(BOB, "pay", receiver=CAROL, amount=5000), Txn(BOB, app_id=app_id)])
+    assert ledger.balance(CAROL) == FUNDS
+    assert ledger.balance(BOB) == FUNDS
+
+
+def test_fees_are_pooled_across_the_group(ledger):
+    with pytest.raises(TealError, match="below the minimum"):
+        ledger.submit([Txn(BOB, "pay", receiver=CAROL, amount=1),
+                       Txn(BOB, "pay", receiver=CAROL, amount=1, fee=0)])
+    ledger.submit([Txn(BOB, "pay", receiver=CAROL, amount=1, fee=2 * MIN_TXN_FEE),
+                   Txn(BOB, "pay", receiver=CAROL, amount=1, fee=0)])
+    assert ledger.balance(BOB) == FUNDS - 2 - 2 * MIN_TXN_FEE
+
+
+def test_inner_payment_fee_is_covered_by_the_outer_fee(ledger):
+    pay = ("itxn_begin\nint pay\nitxn_field TypeEnum\ntxna Accounts 1\nitxn_field Receiver\n"
+           "int 1000\nitxn_field Amount\nitxn_submit\nint 1")
+    app_id = create_app(ledger, "txn ApplicationID\nbnz run\nint 1\nreturn\nrun:\n" + pay)
+    before = ledger.balance(app_address(app_id))
+    call(ledger, app_id, accounts=[CAROL], fee=2 * MIN_TXN_FEE)
+    assert ledger.balance(app_address(app_id)) == before - 1000
+
+    # Without the surplus the app pays the inner fee itself
+    call(ledger, app_id, accounts=[CAROL])
+    assert ledger.balance(app_address(app_id)) == before - 2000 - MIN_TXN_FEE
+
+
+def test_minimum_balance(ledger):
+    with pytest.raises(TealError, match="below min balance"):
+        ledger.submit([Txn(BOB, "pay", receiver=CAROL, amount=FUNDS - MIN_TXN_FEE - MIN_BALANCE + 1)])
+    with pytest.raises(TealError, match="overspend"):
+        ledger.submit([Txn(BOB, "pay", receiver=CAROL, amount=FUNDS)])
+
+
+def test_accounts_must_be_referenced(ledger):
+    body = "{account}\nbalance\nint 0\n>"
+    with pytest.raises(TealError, match="unavailable account"):
+        evaluate(ledger, body.format(account=f"byte 0x{CAROL.hex()}"))
+    evaluate(ledger, body.format(account=f"byte 0x{CAROL.hex()}"), accounts=[CAROL])
+    evaluate(ledger, body.format(account="txn Sender"))
+
+
+def test_apps_must_be_referenced(ledger):
+    other = create_app(ledger, "byte \"n\"\nint 1\napp_global_put\nint 1")
+    body = f"int {other}\nbyte \"n\"\napp_global_get_ex\nassert"
+    with pytest.raises(TealError, match="unavailable app"):
+        evaluate(ledger, body)
+    evaluate(ledger, body, foreign_apps=[other])
+
+
+def test_assets_must_be_referenced(ledger):
+    asset_id = ledger.create_asset(ALICE, total=100)
+    body = f"txn Sender\nint {asset_id}\nasset_holding_get AssetBalance\nswap\npop\n!"
+    with pytest.raises(TealError, match="unavailable asset"):
+        evaluate(ledger, body)
+    evaluate(ledger, body, foreign_assets=[asset_id])
+
+
+def test_boxes_must_be_referenced(ledger):
+    body = "byte \"b\"\nint 8\nbox_create"
+    with pytest.raises(TealError, match="not referenced"):
+        evaluate(ledger, body)
+    txn = evaluate(ledger, body, boxes=[(0, b"b")])
+    assert (txn.app_id, b"b") in ledger.boxes
+
+
+def test_checkpoint_and_revert(ledger):
+    mark = ledger.checkpoint()
+    ledger.submit([Txn(BOB, "pay", receiver=CAROL, amount=5000)])
+    assert ledger.balance(CAROL) == FUNDS + 5000
+    ledger.revert(mark)
+    assert (ledger.balance(BOB), ledger.balance(CAROL)) == (FUNDS, FUNDS)